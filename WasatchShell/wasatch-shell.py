@@ -167,6 +167,11 @@ class WasatchShell:
         get_spectrum_save                      - save spectrum to filename as CSV
         get_config_json                        - return EEPROM as JSON string
         get_all                                - calls all gettors
+
+        opcode_profiler_enable                 - takes bool argument, optional sample_every (time every Nth transfer)
+        opcode_profiler_reset                  - zero the opcode profiler
+        get_opcode_profile                     - print per-opcode EP0 timing table
+        get_opcode_profile_json                - print per-opcode EP0 timing as JSON
         """)
         print("The following gettors are also available:")
         for k in sorted(self.gettors.keys()):
@@ -288,6 +293,22 @@ class WasatchShell:
                         elif command == "get_all":
                             self.get_all()
 
+                        elif command == "opcode_profiler_enable":
+                            flag = self.read_bool()
+                            sample_every = self.read_int() if self.has_input() else 1
+                            self.device.hardware.set_opcode_profiler_enable(flag, sample_every)
+                            self.display(1)
+
+                        elif command == "opcode_profiler_reset":
+                            self.device.hardware.reset_opcode_profiler()
+                            self.display(1)
+
+                        elif command == "get_opcode_profile":
+                            self.get_opcode_profile(as_json=False)
+
+                        elif command == "get_opcode_profile_json":
+                            self.get_opcode_profile(as_json=True)
+
                         elif command == "connection_check":
                             self.run_gettor("get_integration_time_ms")
 
@@ -717,6 +738,12 @@ class WasatchShell:
         else:
             self.display(0)
 
+    def get_opcode_profile(self, as_json=False):
+        profiler = self.device.hardware.opcode_profiler
+        if profiler is None:
+            return self.display("ERROR: opcode profiler not enabled")
+        self.display(profiler.to_json() if as_json else profiler.to_table())
+
     def get_all(self):
         for command in sorted(self.gettors):
             func_name = self.gettors[command]
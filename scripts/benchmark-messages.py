@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+################################################################################
+#                             benchmark-messages.py                            #
+################################################################################
+#                                                                              #
+#  DESCRIPTION:  Measures per-instance allocation size and construction time  #
+#                of the hot-path message classes (Reading,                     #
+#                SpectrometerResponse, SpectrometerRequest, ControlObject),    #
+#                compared against equivalent dict-backed objects carrying the #
+#                same attributes (i.e. how these classes used to be stored).   #
+#                                                                              #
+#  EXAMPLE:      $ python scripts/benchmark-messages.py --count 100000         #
+#                                                                              #
+################################################################################
+
+import sys
+import timeit
+import argparse
+import tracemalloc
+
+from wasatch.Reading              import Reading
+from wasatch.ControlObject        import ControlObject
+from wasatch.SpectrometerRequest  import SpectrometerRequest
+from wasatch.SpectrometerResponse import SpectrometerResponse
+
+class DictBacked:
+    """ baseline: an ordinary __dict__ object """
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+def reading_fields():
+    """ every attribute the dict-backed Reading used to set in clear() """
+    r = Reading()
+    names = [ name for name in Reading.__slots__ if not name.startswith("_") ]
+    names.extend([ "area_scan_row_count", "area_scan_image", "battery_raw", "battery_percentage",
+                   "battery_charging", "power_connection_state", "take_one_request",
+                   "elapsed_from_request", "elapsed_since_last", "image_format",
+                   "new_integration_time_ms", "new_gain_db", "dark" ])
+    return { name: getattr(r, name) for name in names }
+
+def bytes_per_instance(factory, count):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    keep = [ factory() for _ in range(count) ]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del keep
+    return total / count
+
+def usec_per_instance(factory, count):
+    return 1e6 * min(timeit.repeat(factory, number=count, repeat=5)) / count
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=50000, help="instances per measurement")
+    args = parser.parse_args(argv[1:])
+
+    fields = reading_fields()
+    cases = [
+        ("Reading",              lambda: Reading("USB:0x24aa:0x4000:1:2"),
+                                 lambda: DictBacked(**fields)),
+        ("SpectrometerResponse", lambda: SpectrometerResponse(data=None),
+                                 lambda: DictBacked(data=None, error_msg='', error_lvl=0, poison_pill=False,
+                                                    keep_alive=False, incomplete=False, progress=0)),
+        ("SpectrometerRequest",  lambda: SpectrometerRequest("acquire_data"),
+                                 lambda: DictBacked(cmd="acquire_data", args=[], kwargs={})),
+        ("ControlObject",        lambda: ControlObject("integration_time_ms", 100),
+                                 lambda: DictBacked(setting="integration_time_ms", value=100)),
+    ]
+
+    print(f"{'class':<22} {'bytes':>8} {'dict bytes':>11} {'usec':>8} {'dict usec':>10}")
+    for name, slotted, baseline in cases:
+        print("%-22s %8.0f %11.0f %8.2f %10.2f" % (
+            name,
+            bytes_per_instance(slotted,  args.count),
+            bytes_per_instance(baseline, args.count),
+            usec_per_instance (slotted,  args.count),
+            usec_per_instance (baseline, args.count)))
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,66 @@
+# Shared pytest configuration and fixtures for the Wasatch.PY unit tests.
+
+import os
+import sys
+import pytest
+
+# import wasatch from this checkout, wherever pytest is run from
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from wasatch.DeviceID                    import DeviceID
+from wasatch.AbstractUSBDevice           import AbstractUSBDevice
+from wasatch.FeatureIdentificationDevice import FeatureIdentificationDevice
+
+##
+# A manually-advanced stand-in for time.monotonic.
+class FakeClock:
+    def __init__(self, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    ## replace module.name (e.g. a "from time import monotonic") with this clock
+    def install(self, module, name="monotonic"):
+        self.monkeypatch.setattr(module, name, self)
+        return self
+
+@pytest.fixture
+def clock(monkeypatch):
+    return FakeClock(monkeypatch)
+
+##
+# A scriptable stand-in for RealUSBDevice, recording each control transfer
+# and "receiving" a ramp on each bulk read.
+class FakeUSBDevice(AbstractUSBDevice):
+    def __init__(self):
+        self.sent = [] # bRequest of each HOST_TO_DEVICE transfer
+        self.read_failures = 0 # number of upcoming bulk reads to time-out
+
+    def ctrl_transfer(self, device, bmRequestType, bRequest, wValue, wIndex, data_or_wLength):
+        if bmRequestType == 0x40:
+            self.sent.append(bRequest)
+            return 0
+        return [0] * data_or_wLength
+
+    def read_into(self, device, endpoint, buffer, timeout=None):
+        if self.read_failures > 0:
+            self.read_failures -= 1
+            raise TimeoutError(f"fake timeout on 0x{endpoint:02x} ({timeout}ms)")
+        memoryview(buffer).cast("B")[:] = bytes(i % 251 for i in range(len(buffer)))
+        return len(buffer)
+
+    def acquires_sent(self):
+        return self.sent.count(0xad)
+
+##
+# A connected FeatureIdentificationDevice over a FakeUSBDevice.
+@pytest.fixture
+def fid():
+    fid = FeatureIdentificationDevice(DeviceID(label="USB:0x1000:0x1000:1:24"))
+    fid.device_type = FakeUSBDevice()
+    fid.connected = True
+    fid.settings.eeprom.detector = "S16011-1106"
+    fid.settings.eeprom.active_pixels_horizontal = 1024
+    return fid
@@ -19,3 +19,66 @@ class utils:
         return numpy.hstack((a[0:half_width], 
                              utils.moving_average(a, half_width * 2 + 1), 
                              a[-half_width:])).ravel()
+
+class fid:
+    # commit 90876bc08d6e17c772b338307e4b972ab06a1e7d (FeatureIdentificationDevice._correct_ingaas_gain_and_offset)
+    def correct_ingaas_gain_and_offset(spectrum, gain, offset, gain_odd, offset_odd):
+        for i in range(1, len(spectrum), 2):
+            old = float(spectrum[i])
+            raw = (old - offset) / gain
+            spectrum[i] = (raw * gain_odd) + offset_odd
+
+    # commit 90876bc08d6e17c772b338307e4b972ab06a1e7d (FeatureIdentificationDevice._correct_bad_pixels)
+    def correct_bad_pixels(spectrum, bad_pixels):
+        pixels = len(spectrum)
+        i = 0
+        while i < len(bad_pixels):
+            bad_pix = bad_pixels[i]
+            if bad_pix == 0:
+                next_good = bad_pix + 1
+                while next_good in bad_pixels and next_good < pixels:
+                    next_good += 1
+                    i += 1
+                if next_good < pixels:
+                    for j in range(next_good):
+                        spectrum[j] = spectrum[next_good]
+            else:
+                prev_good = bad_pix - 1
+                while prev_good in bad_pixels and prev_good >= 0:
+                    prev_good -= 1
+                if prev_good >= 0:
+                    next_good = bad_pix + 1
+                    while next_good in bad_pixels and next_good < pixels:
+                        next_good += 1
+                        i += 1
+                    if next_good < pixels:
+                        delta = float(spectrum[next_good] - spectrum[prev_good])
+                        rng   = next_good - prev_good 
+                        step  = delta / rng
+                        for j in range(rng - 1):
+                            spectrum[prev_good + j + 1] = spectrum[prev_good] + step * (j + 1)
+                    else:
+                        for j in range(bad_pix, pixels):
+                            spectrum[j] = spectrum[prev_good]
+            i += 1
+
+    # commit 90876bc08d6e17c772b338307e4b972ab06a1e7d (FeatureIdentificationDevice._apply_linear_pixel_calibration)
+    def apply_linear_pixel_calibration(spectrum, slopes, offsets):
+        smoothed = []
+        for i, intensity in enumerate(spectrum):
+            smoothed.append(intensity * slopes[i] + offsets[i])
+        return smoothed
+
+    # commit 90876bc08d6e17c772b338307e4b972ab06a1e7d (FeatureIdentificationDevice.get_spectrum)
+    def graph_alternating_pixels(spectrum):
+        smoothed = []
+        for i in range(len(spectrum)):
+            if i % 2 == 0:
+                smoothed.append(spectrum[i])
+            else:
+                if i + 1 < len(spectrum):
+                    averaged = (spectrum[i-1] + spectrum[i+1]) / 2.0
+                else:
+                    averaged = spectrum[i - 1]
+                smoothed.append(averaged)
+        return smoothed
@@ -0,0 +1,71 @@
+# Unit tests for FeatureIdentificationDevice.generate_timeout_ms, over the
+# conftest FakeUSBDevice.
+
+import wasatch.FeatureIdentificationDevice as FIDModule
+
+from wasatch.FeatureIdentificationDevice import ADAPTIVE_TIMEOUT_SCALE, ADAPTIVE_TIMEOUT_MARGIN_MS, XS_IDLE_SLEEP_SEC
+from wasatch.SpectrometerState           import SpectrometerState
+from wasatch.RollingWindow               import RollingWindow
+
+ADAPTIVE_MS = int(40 * ADAPTIVE_TIMEOUT_SCALE + ADAPTIVE_TIMEOUT_MARGIN_MS)
+
+def learn_latency(fid, latency_ms=40, count=RollingWindow.DEFAULT_MIN_SAMPLES):
+    fid.has_received_spectrum = True
+    for i in range(count):
+        fid.latency_window.add(fid._latency_key(), latency_ms)
+
+def test_latency_key(fid):
+    state = fid.settings.state
+
+    state.integration_time_ms = 100
+    state.prev_integration_time_ms = 200 # still changing
+    assert fid._latency_key() == (200, 1)
+
+    state.prev_integration_time_ms = 100
+    state.onboard_scans_to_average = 8
+    assert fid._latency_key() == (100, 1)
+    state.onboard_averaging = True
+    assert fid._latency_key() == (100, 8)
+
+def test_fallback_until_window_fills(fid):
+    fallback_ms = fid.generate_fallback_timeout_ms()
+    learn_latency(fid, count=RollingWindow.DEFAULT_MIN_SAMPLES - 1)
+    assert fid.generate_timeout_ms() == fallback_ms
+
+    learn_latency(fid, count=1)
+    assert fid.generate_timeout_ms() == ADAPTIVE_MS
+
+    # ...and per key
+    fid.settings.state.integration_time_ms += 1
+    fid.settings.state.prev_integration_time_ms += 1
+    assert fid.generate_timeout_ms() == fid.generate_fallback_timeout_ms()
+
+def test_fallback_when_timing_out_of_our_hands(fid):
+    learn_latency(fid)
+    fallback_ms = fid.generate_fallback_timeout_ms()
+    assert fid.generate_timeout_ms(auto_raman=True) == fallback_ms
+
+    fid.settings.state.area_scan_enabled = True
+    assert fid.generate_timeout_ms() == fallback_ms
+    fid.settings.state.area_scan_enabled = False
+
+    fid.settings.state.trigger_source = SpectrometerState.TRIGGER_SOURCE_EXTERNAL
+    assert fid.generate_timeout_ms() == fallback_ms
+
+    fid.settings.state.trigger_source = SpectrometerState.TRIGGER_SOURCE_INTERNAL
+    fid.settings.state.adaptive_timeout_enabled = False
+    assert fid.generate_timeout_ms() == fallback_ms
+
+def test_xs_fallback_after_idle(fid, clock):
+    clock.install(FIDModule)
+    fid.settings.eeprom.model = "WP-785XS"
+    assert fid.settings.is_xs()
+
+    fid.get_spectrum()
+    learn_latency(fid)
+    clock.now += XS_IDLE_SLEEP_SEC / 2
+    assert fid.generate_timeout_ms() == ADAPTIVE_MS
+
+    # the sensor may have gone to sleep
+    clock.now += XS_IDLE_SLEEP_SEC
+    assert fid.generate_timeout_ms() == fid.generate_fallback_timeout_ms()
@@ -0,0 +1,95 @@
+# Unit tests for wasatch.applog's non-blocking queue logging, batched
+# flushing and rotation.
+
+import logging
+
+from queue import Queue
+
+from wasatch import applog
+
+def make_record(msg, level=logging.INFO):
+    return logging.makeLogRecord({ "name": "test", "levelno": level, "levelname": logging.getLevelName(level), "msg": msg })
+
+def drain(q):
+    messages = []
+    while not q.empty():
+        messages.append(q.get_nowait().getMessage())
+    return messages
+
+def test_dropping_queue_handler_drops_and_reports():
+    q = Queue(maxsize=2)
+    handler = applog.DroppingQueueHandler(q)
+    for i in range(5):
+        handler.handle(make_record(f"record {i}"))
+
+    # never blocked: the overflow was counted
+    assert handler.dropped == 3
+    assert drain(q) == [ "record 0", "record 1" ]
+
+    # the next record is preceded by a single report of everything lost
+    handler.handle(make_record("record 5"))
+    assert drain(q) == [ "applog: dropped 3 log records (queue full)", "record 5" ]
+    assert handler.reported == 3
+
+    handler.handle(make_record("record 6"))
+    assert drain(q) == [ "record 6" ]
+
+def test_dropping_queue_handler_retries_report():
+    q = Queue(maxsize=1)
+    handler = applog.DroppingQueueHandler(q)
+    handler.handle(make_record("record 0"))
+    handler.handle(make_record("record 1"))
+    assert handler.dropped == 1
+
+    # room for the report but not the record: the record is dropped (and
+    # reported next time), not the report
+    q.get_nowait()
+    handler.handle(make_record("record 2"))
+    assert drain(q) == [ "applog: dropped 1 log records (queue full)" ]
+    assert handler.dropped == 2
+    assert handler.reported == 1
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def test_batched_flush(tmp_path):
+    path = tmp_path / "batched.txt"
+    handler = applog.BatchedRotatingFileHandler(str(path), flush_interval_sec=3600, encoding="utf-8")
+    try:
+        handler.handle(make_record("info"))
+        assert read(path) == ""
+
+        # errors are written through at once
+        handler.handle(make_record("error", logging.ERROR))
+        assert read(path) == "info\nerror\n"
+    finally:
+        handler.close()
+
+def test_rotation(tmp_path):
+    path = tmp_path / "rotating.txt"
+    handler = applog.BatchedRotatingFileHandler(str(path), flush_interval_sec=0, maxBytes=100, backupCount=1, encoding="utf-8")
+    try:
+        for i in range(30):
+            handler.handle(make_record(f"record {i:04d}"))
+    finally:
+        handler.close()
+
+    backup = tmp_path / "rotating.txt.1"
+    assert backup.exists()
+    assert not (tmp_path / "rotating.txt.2").exists()
+    assert len(read(path)) <= 100
+    assert read(path).endswith("record 0029\n")
+
+def test_main_logger_flushes_on_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(applog, "explicit_path", None)
+    monkeypatch.setattr(logging.getLogger(), "level", logging.getLogger().level)
+    path = tmp_path / "main.txt"
+    main_logger = applog.MainLogger(logging.INFO, enable_stdout=False, logfile=str(path), append_arg="False", flush_interval_sec=3600)
+    try:
+        logging.getLogger("wasatch.test_applog").info("queued")
+    finally:
+        main_logger.close()
+
+    assert "wasatch.test_applog INFO     queued" in read(path)
+    assert main_logger.listener.handlers[0].stream is None # closed
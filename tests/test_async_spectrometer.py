@@ -0,0 +1,56 @@
+# Unit tests for wasatch.AsyncSpectrometer's non-blocking queue policies.
+
+import asyncio
+
+from wasatch.AsyncSpectrometer    import AsyncSpectrometer
+from wasatch.ResponseQueue        import ResponseQueue
+from wasatch.SpectrometerResponse import SpectrometerResponse, ErrorLevel
+from wasatch.Reading              import Reading
+
+def make_response(session_count, averaged=False):
+    reading = Reading()
+    reading.session_count = session_count
+    reading.averaged = averaged
+    return SpectrometerResponse(data=reading)
+
+def make_error(msg):
+    return SpectrometerResponse(error_msg=msg, error_lvl=ErrorLevel.high)
+
+def put_all(policy, responses, queue_size=10):
+    async def run():
+        spec = AsyncSpectrometer("USB:0x1000:0x1000:1:24", policy=policy, queue_size=queue_size)
+        spec.queue = asyncio.Queue(maxsize=queue_size)
+        for response in responses:
+            spec._put_latest(response)
+        queued = []
+        while not spec.queue.empty():
+            queued.append(spec.queue.get_nowait())
+        return (spec, queued)
+    return asyncio.run(run())
+
+def describe(queued):
+    return [ None if r is None else (r.error_msg or r.data.session_count) for r in queued ]
+
+def test_keep_latest_keeps_errors():
+    (spec, queued) = put_all(ResponseQueue.KEEP_LATEST, [ make_response(1), make_error("oops"), make_response(2), make_response(3) ])
+    assert describe(queued) == [ "oops", 3 ]
+    assert spec.dropped == 2
+
+def test_keep_latest_averaged():
+    responses = [ make_response(1, averaged=True), make_response(2), make_error("oops"), make_response(3, averaged=True), make_response(4) ]
+    (spec, queued) = put_all(ResponseQueue.KEEP_LATEST_AVERAGED, responses)
+    assert describe(queued) == [ "oops", 3, 4 ]
+
+def test_full_queue_evicts_readings_not_errors():
+    responses = [ make_error("first"), make_response(1), make_error("second"), make_response(2), make_response(3) ]
+    (spec, queued) = put_all(ResponseQueue.DROP_OLDEST, responses, queue_size=3)
+    assert describe(queued) == [ "first", "second", 3 ]
+    assert spec.dropped == 2
+
+    # with only errors queued, a new Reading is dropped instead
+    (spec, queued) = put_all(ResponseQueue.DROP_OLDEST, [ make_error("a"), make_error("b"), make_response(1) ], queue_size=2)
+    assert describe(queued) == [ "a", "b" ]
+
+    # but stream() is always ended
+    (spec, queued) = put_all(ResponseQueue.DROP_OLDEST, [ make_error("a"), make_error("b"), None ], queue_size=2)
+    assert describe(queued) == [ "b", None ]
@@ -0,0 +1,56 @@
+# Unit tests for WasatchDevice.select_onboard_averaging, over the conftest
+# FakeUSBDevice.
+
+from wasatch.WasatchDevice     import WasatchDevice
+from wasatch.SpectrometerState import SpectrometerState
+from wasatch.TakeOneRequest    import TakeOneRequest
+
+def make_device(fid):
+    fid.supports_onboard_averaging = lambda: True
+    device = WasatchDevice(fid.device_id)
+    device.hardware = fid
+    device.settings = fid.settings
+    device.connected = True
+    return device
+
+def test_host_policy_leaves_firmware_alone(fid):
+    device = make_device(fid)
+    assert fid.settings.state.averaging_policy == SpectrometerState.AVERAGING_POLICY_HOST
+
+    # e.g. left in place after an Auto-Raman measurement
+    device.change_setting("onboard_scans_to_average", 8)
+    device.process_commands()
+    assert fid.settings.state.onboard_scans_to_average == 8
+
+    device.settings.state.scans_to_average = 3
+    for i in range(3):
+        reading = device.take_one_averaged_reading().data
+    assert reading.averaging_path == "host"
+    assert fid.settings.state.onboard_scans_to_average == 8
+
+def test_auto_policy_averages_take_one_onboard(fid):
+    device = make_device(fid)
+    device.change_setting("averaging_policy", SpectrometerState.AVERAGING_POLICY_AUTO)
+
+    device.take_one_request = TakeOneRequest(scans_to_average=4)
+    reading = device.take_one_averaged_reading().data
+    assert reading.averaging_path == "onboard"
+    assert fid.settings.state.onboard_scans_to_average == 4
+    assert fid.device_type.acquires_sent() == 1
+
+    # free-running averages stay on the host (with firmware averaging off)
+    device.take_one_request = None
+    device.settings.state.scans_to_average = 2
+    device.take_one_averaged_reading()
+    assert fid.settings.state.onboard_scans_to_average == 1
+
+def test_switching_to_host_turns_off_onboard_averaging(fid):
+    device = make_device(fid)
+    device.change_setting("averaging_policy", SpectrometerState.AVERAGING_POLICY_ONBOARD)
+    device.settings.state.scans_to_average = 5
+    device.take_one_averaged_reading()
+    assert fid.settings.state.onboard_scans_to_average == 5
+
+    device.change_setting("averaging_policy", SpectrometerState.AVERAGING_POLICY_HOST)
+    assert fid.settings.state.onboard_scans_to_average == 1
+    assert not fid.settings.state.onboard_averaging
@@ -0,0 +1,56 @@
+# Unit tests for wasatch.LatencyMarks, LatencyHistogram and RollingWindow.
+
+from wasatch.LatencyMarks  import LatencyMarks, LatencyHistogram
+from wasatch.RollingWindow import RollingWindow
+
+def make_marks(start, **offsets_ms):
+    marks = LatencyMarks()
+    for name, ms in offsets_ms.items():
+        setattr(marks, name, start + ms / 1000)
+    return marks
+
+def test_segments_only_where_both_marks_exist():
+    marks = make_marks(100.0, trigger_sent=0, first_byte=50, read_complete=52, dequeued=60)
+    segments = marks.get_segments_ms()
+    assert set(segments.keys()) == { "acquire", "read", "total" }
+    assert abs(segments["acquire"] - 50) < 1e-6
+    assert abs(segments["read"] - 2) < 1e-6
+    assert abs(segments["total"] - 60) < 1e-6
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for i in range(1, 101):
+        histogram.add(make_marks(0.0, trigger_sent=0, first_byte=i))
+    histogram.add(None)
+
+    stats = histogram.get_stats()
+    assert list(stats.keys()) == [ "acquire" ]
+    acquire = stats["acquire"]
+    assert acquire["count"] == 100
+    assert abs(acquire["p50"] - 50) <= 1
+    assert abs(acquire["p95"] - 95) <= 1
+    assert abs(acquire["p99"] - 99) <= 1
+
+def test_histogram_window_rolls():
+    histogram = LatencyHistogram(size=10)
+    for i in range(100):
+        histogram.add(make_marks(0.0, enqueued=0, dequeued=i))
+    stats = histogram.get_stats()["pickup"]
+    assert stats["count"] == 10
+    assert abs(stats["p50"] - 94.5) <= 1
+
+    histogram.clear()
+    assert histogram.get_stats() == {}
+
+def test_rolling_window_min_samples_and_keys():
+    window = RollingWindow(size=5, min_samples=3, max_keys=2)
+    window.add("a", 1)
+    window.add("a", 2)
+    assert window.quantile("a", 0.5) is None
+    window.add("a", 3)
+    assert window.quantile("a", 0.5) == 2
+
+    window.add("b", 1)
+    window.add("c", 1) # evicts least-recently-updated "a"
+    assert window.count("a") == 0
+    assert window.count("b") == window.count("c") == 1
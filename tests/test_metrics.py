@@ -0,0 +1,66 @@
+# Unit tests for wasatch.MetricsRegistry and wasatch.MetricsWriter.
+
+import os
+import stat
+
+import wasatch.MetricsRegistry as MetricsRegistryModule
+
+from wasatch.MetricsRegistry import MetricsRegistry, RateMeter
+from wasatch.MetricsWriter   import PrometheusTextfileWriter
+
+def tick_at_rate(meter, clock, hz, sec):
+    for i in range(int(hz * sec)):
+        clock.now += 1.0 / hz
+        meter.tick()
+
+def test_rate_meter_before_window_fills(clock):
+    clock.install(MetricsRegistryModule)
+
+    meter = RateMeter(window_sec=5)
+    assert meter.get() == 0
+
+    meter.tick()
+    assert meter.get() == 0
+
+    tick_at_rate(meter, clock, 88, 1)
+    assert abs(meter.get() - 88) < 0.5
+
+def test_rate_meter_full_window(clock):
+    clock.install(MetricsRegistryModule)
+
+    meter = RateMeter(window_sec=5)
+    tick_at_rate(meter, clock, 16.5, 12)
+    assert abs(meter.get() - 16.5) < 0.5
+
+    # acquisition stops: the rate decays to zero over the window
+    clock.now += 2.5
+    assert abs(meter.get() - 16.5 / 2) < 0.5
+    clock.now += 5
+    assert meter.get() == 0
+
+def test_registry_snapshot_and_unregister():
+    registry = MetricsRegistry()
+    registry.counter("spectra_acquired", "dev1").inc(3)
+    registry.gauge("response_queue_depth", "dev1", fn=lambda: 7)
+    registry.counter("spectra_acquired", "dev2").inc()
+
+    snapshot = registry.snapshot()
+    assert snapshot["dev1"] == { "spectra_acquired": 3, "response_queue_depth": 7 }
+    assert snapshot["dev2"] == { "spectra_acquired": 1 }
+
+    registry.unregister("dev1")
+    assert "dev1" not in registry.snapshot()
+
+def test_prometheus_textfile_is_world_readable(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("spectra_acquired", 'USB:"x"').inc(2)
+
+    path = str(tmp_path / "wasatch.prom")
+    writer = PrometheusTextfileWriter(path, registry=registry)
+    writer.write_once()
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    with open(path) as f:
+        text = f.read()
+    assert "# TYPE wasatch_spectra_acquired_total counter" in text
+    assert 'wasatch_spectra_acquired_total{device_id="USB:\\"x\\""} 2' in text
@@ -0,0 +1,44 @@
+# Unit tests for FeatureIdentificationDevice's pipelined ACQUIRE (see
+# set_pipelined_trigger_enable), over the conftest FakeUSBDevice.
+
+def enable_pipelining(fid):
+    fid.set_pipelined_trigger_enable(True)
+    return fid.device_type
+
+def test_next_acquire_sent_after_read(fid):
+    usb = enable_pipelining(fid)
+    response = fid.get_spectrum()
+    assert response.data is not None
+    assert usb.acquires_sent() == 2 # this spectrum's, and the next one's
+    assert fid.pipelined_acquire_pending
+
+    # the next call reads the pipelined spectrum rather than re-triggering
+    assert fid.get_spectrum().data is not None
+    assert usb.acquires_sent() == 3
+
+def test_stale_acquire_is_drained(fid):
+    usb = enable_pipelining(fid)
+    fid.get_spectrum()
+    fid.set_detector_offset(5) # not PIPELINE_SAFE
+    assert fid.pipelined_acquire_stale
+
+    assert fid.get_spectrum().data is not None
+    assert usb.acquires_sent() == 4 # first, pipelined, fresh, pipelined
+    assert not fid.pipelined_acquire_stale
+
+def test_failed_read_does_not_strand_pipeline(fid):
+    usb = enable_pipelining(fid)
+    fid.get_spectrum()
+    assert usb.acquires_sent() == 2
+
+    # the pipelined ACQUIRE never arrives
+    usb.read_failures = 3
+    response = fid.get_spectrum()
+    assert response.error_msg == "Encountered error on read"
+    assert not fid.pipelined_acquire_pending
+    assert fid.acquire_sent_time is None
+
+    # so the next call must trigger afresh
+    assert fid.get_spectrum().data is not None
+    assert usb.acquires_sent() == 4
+    assert fid.pipelined_acquire_pending
@@ -0,0 +1,65 @@
+# Unit tests for laser / trigger commands applied mid-acquisition (see
+# InterfaceDevice.check_priority_commands), over the conftest FakeUSBDevice.
+
+from wasatch.WasatchDevice     import WasatchDevice
+from wasatch.SpectrometerState import SpectrometerState
+from wasatch.TakeOneRequest    import TakeOneRequest
+
+def test_trigger_change_abandons_external_wait(fid):
+    fid.settings.state.trigger_source = SpectrometerState.TRIGGER_SOURCE_EXTERNAL
+    usb = fid.device_type
+    usb.read_failures = 5
+
+    def priority_callback():
+        fid.set_trigger_source(SpectrometerState.TRIGGER_SOURCE_INTERNAL)
+        return False
+    fid.priority_callback = priority_callback
+
+    response = fid.get_spectrum()
+    assert response.keep_alive
+    assert not response.error_msg
+    assert usb.read_failures == 3 # one wait, then one timeout after the change
+
+    # and the next internally-triggered spectrum is read normally
+    usb.read_failures = 0
+    assert fid.get_spectrum().data is not None
+
+def make_device(fid):
+    device = WasatchDevice(fid.device_id)
+    device.hardware = fid
+    device.settings = fid.settings
+    device.connected = True
+    fid.priority_callback = device.check_priority_commands
+    return device
+
+def test_laser_change_restarts_take_one_average(fid):
+    device = make_device(fid)
+    device.take_one_request = TakeOneRequest(scans_to_average=4)
+
+    # the laser is enabled (by a priority command) once 2 scans are summed
+    pending = [ ("laser_enable", True) ]
+    def priority_callback():
+        if device.averager.count == 2 and pending:
+            device.change_setting(*pending.pop())
+        return False
+    device.priority_callback = priority_callback
+
+    reading = device.take_one_averaged_reading().data
+    assert reading.averaged
+    assert reading.sum_count == 4
+    assert fid.device_type.acquires_sent() == 6 # 2 discarded, 4 averaged
+
+def test_laser_change_restarts_free_running_average(fid):
+    device = make_device(fid)
+    device.settings.state.scans_to_average = 3
+
+    device.take_one_averaged_reading()
+    device.take_one_averaged_reading()
+    assert device.averager.count == 2
+
+    device.change_setting("laser_power_perc", 50)
+    assert device.averager.count == 0
+
+    device.change_setting("laser_watchdog_sec", 10) # doesn't affect the spectrum
+    device.take_one_averaged_reading()
+    assert device.averager.count == 1
@@ -0,0 +1,88 @@
+# Compares wasatch.ProcessingPlan against the per-spectrum post-processing
+# previously performed in FeatureIdentificationDevice.get_spectrum.
+
+import numpy as np
+
+import existing_implementations
+
+from wasatch.SpectrometerSettings import SpectrometerSettings
+from wasatch.SpectrometerState    import SpectrometerState
+from wasatch.ProcessingPlan       import ProcessingPlan
+from wasatch.IMX385               import IMX385
+
+PIXELS = 512
+
+def gen_spectrum(seed=0):
+    rng = np.random.default_rng(seed)
+    return [ float(x) for x in rng.integers(800, 60000, PIXELS) ]
+
+def make_settings():
+    settings = SpectrometerSettings()
+    eeprom = settings.eeprom
+    eeprom.active_pixels_horizontal = PIXELS
+    eeprom.detector = "InGaAs G9214"
+    eeprom.hardware_even_odd = False
+    eeprom.detector_gain = 1.9
+    eeprom.detector_offset = 100
+    eeprom.detector_gain_odd = 2.1
+    eeprom.detector_offset_odd = -40
+    eeprom.invert_x_axis = True
+    eeprom.bad_pixels = [ 0, 1, 10, 11, 12, 200, 500, 510, 511 ]
+    settings.state.bad_pixel_mode = SpectrometerState.BAD_PIXEL_MODE_AVERAGE
+    settings.state.graph_alternating_pixels = True
+
+    slopes  = [ 1.0 + 0.001 * i for i in range(PIXELS) ]
+    offsets = [ 0.5 * i for i in range(PIXELS) ]
+    settings.set_linear_pixel_calibration((slopes, offsets))
+    return settings
+
+## the baseline order-of-operations, one list element at a time
+def process_known(settings, spectrum):
+    eeprom = settings.eeprom
+    known = existing_implementations.fid
+    spectrum = list(spectrum)
+    known.correct_ingaas_gain_and_offset(spectrum, eeprom.detector_gain, eeprom.detector_offset, eeprom.detector_gain_odd, eeprom.detector_offset_odd)
+    spectrum.reverse()
+    known.correct_bad_pixels(spectrum, eeprom.bad_pixels)
+    (slopes, offsets) = settings.linear_pixel_calibration
+    spectrum = known.apply_linear_pixel_calibration(spectrum, slopes, offsets)
+    return known.graph_alternating_pixels(spectrum)
+
+def test_plan_matches_known_implementation():
+    settings = make_settings()
+    plan = ProcessingPlan(settings, IMX385(), PIXELS)
+    assert [ label for label, _ in plan.stages ] == [
+        "ingaas_even_odd", "invert_x_axis", "bad_pixels", "linear_pixel_calibration", "graph_alternating_pixels" ]
+
+    for seed in range(5):
+        spectrum = gen_spectrum(seed)
+        known = process_known(settings, spectrum)
+        actual = plan.apply(np.array(spectrum, dtype=np.float64))
+        assert len(actual) == len(known)
+        assert np.allclose(actual, known)
+
+def test_bad_pixels_match_known_implementation():
+    settings = SpectrometerSettings()
+    for bad_pixels in [ [0], [0, 1, 2], [5], [5, 6, 7], [PIXELS - 1], [PIXELS - 3, PIXELS - 2, PIXELS - 1], [0, 3, 4, 100, PIXELS - 1] ]:
+        settings.eeprom.bad_pixels = bad_pixels
+        plan = ProcessingPlan(settings, IMX385(), PIXELS)
+
+        spectrum = gen_spectrum()
+        known = list(spectrum)
+        existing_implementations.fid.correct_bad_pixels(known, bad_pixels)
+        actual = plan.apply(np.array(spectrum, dtype=np.float64))
+        assert np.allclose(actual, known), f"bad_pixels {bad_pixels}"
+
+def test_area_scan_bypasses_order_of_operations():
+    settings = make_settings()
+    settings.state.area_scan_enabled = True
+    settings.state.graph_alternating_pixels = False
+    plan = ProcessingPlan(settings, IMX385(), PIXELS)
+    assert [ label for label, _ in plan.stages ] == [ "ingaas_even_odd" ]
+
+def test_reject_flat():
+    settings = SpectrometerSettings()
+    settings.eeprom.detector = "IMX385"
+    plan = ProcessingPlan(settings, IMX385(), PIXELS)
+    assert plan.apply(np.full(PIXELS, 1234.0)) is None
+    assert plan.apply(np.array(gen_spectrum(), dtype=np.float64)) is not None
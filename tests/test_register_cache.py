@@ -0,0 +1,143 @@
+# Unit tests for wasatch.RegisterCache.
+
+import wasatch.RegisterCache as RegisterCacheModule
+
+from wasatch.RegisterCache       import RegisterCache
+from wasatch.SpectrometerRequest import SpectrometerRequest
+
+def make_cache(clock):
+    clock.install(RegisterCacheModule.time)
+    return RegisterCache()
+
+def test_static_entries_never_expire(clock):
+    cache = make_cache(clock)
+    assert cache.get(0xc0, 0, 0) is None # GET_CODE_REVISION
+    cache.put(0xc0, 0, 0, [1, 2, 3, 4])
+
+    clock.now += 1e6
+    assert cache.get(0xc0, 0, 0) == [1, 2, 3, 4]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_ttl_expiry(clock):
+    cache = make_cache(clock)
+    cache.put(0xbf, 0, 0, [100, 0, 0]) # GET_INTEGRATION_TIME_MS
+
+    clock.now += RegisterCache.SETTING_TTL_SEC * 0.5
+    assert cache.get(0xbf, 0, 0) == [100, 0, 0]
+
+    clock.now += RegisterCache.SETTING_TTL_SEC
+    assert cache.get(0xbf, 0, 0) is None
+
+def test_second_tier_keyed_by_wValue(clock):
+    cache = make_cache(clock)
+    cache.put(0xff, 0x01, 2, [0xaa]) # GET_MODEL_CONFIG page 2
+    assert cache.get(0xff, 0x01, 2) == [0xaa]
+    assert cache.get(0xff, 0x01, 3) is None
+
+def test_uncacheable_opcodes(clock):
+    cache = make_cache(clock)
+    cache.put(0xd5, 0, 0, [1, 2]) # GET_ADC
+    assert cache.get(0xd5, 0, 0) is None
+    assert not cache.entries
+
+def test_returns_copies(clock):
+    cache = make_cache(clock)
+    result = [1, 2, 3]
+    cache.put(0xc0, 0, 0, result)
+    result[0] = 99
+    cached = cache.get(0xc0, 0, 0)
+    cached[1] = 99
+    assert cache.get(0xc0, 0, 0) == [1, 2, 3]
+
+def test_write_invalidates_readback(clock):
+    cache = make_cache(clock)
+    cache.put(0xbf, 0, 0, [100, 0, 0])
+    cache.put(0xc5, 0, 0, [1, 0])
+
+    cache.invalidate_for_write(0xb2, 200) # SET_INTEGRATION_TIME_MS
+    assert cache.get(0xbf, 0, 0) is None
+    assert cache.get(0xc5, 0, 0) == [1, 0]
+    assert cache.invalidations == 1
+
+def test_reset_clears_everything(clock):
+    cache = make_cache(clock)
+    cache.put(0xc0, 0, 0, [1])
+    cache.invalidate_for_write(0xb5, 0) # RESET_FPGA
+    assert cache.get(0xc0, 0, 0) is None
+
+def test_disabled(clock):
+    cache = make_cache(clock)
+    cache.enabled = False
+    cache.put(0xc0, 0, 0, [1])
+    assert cache.get(0xc0, 0, 0) is None
+
+def test_redundant_writes_are_suppressed(clock):
+    cache = make_cache(clock)
+    assert not cache.is_redundant_write(0xb2, 100, 0, 0) # SET_INTEGRATION_TIME_MS
+    cache.record_write(0xb2, 100, 0, 0)
+
+    assert cache.is_redundant_write(0xb2, 100, 0, 0)
+    assert not cache.is_redundant_write(0xb2, 200, 0, 0)
+    assert cache.suppressed == 1
+
+def test_side_effect_writes_never_suppressed(clock):
+    cache = make_cache(clock)
+    for _ in range(2):
+        cache.record_write(0xbe, 1, 0, 0) # SET_LASER_ENABLE
+        cache.record_write(0xad, 0, 0, 0) # ACQUIRE
+    assert not cache.is_redundant_write(0xbe, 1, 0, 0)
+    assert not cache.is_redundant_write(0xad, 0, 0, 0)
+
+def test_write_suppression_data_payload(clock):
+    cache = make_cache(clock)
+    cache.record_write(0xff, 0x12, 0, [1, 2]) # SET_ANALOG_OUT_VALUE
+    assert cache.is_redundant_write(0xff, 0x12, 0, (1, 2))
+    assert not cache.is_redundant_write(0xff, 0x12, 0, [1, 3])
+
+def test_writes_forgotten(clock):
+    cache = make_cache(clock)
+    cache.record_write(0xbd, 1, 0, 0) # SET_MOD_ENABLE
+    cache.record_write(0xb2, 100, 0, 0)
+
+    cache.record_write(0xbe, 1, 0, 0) # SET_LASER_ENABLE forgets modulation
+    assert not cache.is_redundant_write(0xbd, 1, 0, 0)
+    assert cache.is_redundant_write(0xb2, 100, 0, 0)
+
+    cache.record_write(0xff, 0x25, 0, [0] * 8) # SET_DETECTOR_ROI forgets everything
+    assert not cache.is_redundant_write(0xb2, 100, 0, 0)
+
+def test_write_suppression_disabled(clock):
+    cache = make_cache(clock)
+    cache.suppress_writes = False
+    cache.record_write(0xb2, 100, 0, 0)
+    assert not cache.is_redundant_write(0xb2, 100, 0, 0)
+
+def test_forget_write(clock):
+    cache = make_cache(clock)
+    assert cache.is_suppressible(0xb2) and cache.is_suppressible(0xff, 0x62)
+    assert not cache.is_suppressible(0xad)
+
+    cache.record_write(0xb2, 100, 0, 0)
+    cache.forget_write(0xb2) # e.g. the write failed
+    assert not cache.is_redundant_write(0xb2, 100, 0, 0)
+
+def test_force_next_write(fid):
+    usb = fid.device_type
+    for _ in range(2):
+        fid.set_integration_time_ms(100)
+    assert usb.sent.count(0xb2) == 1
+
+    fid.handle_requests([ SpectrometerRequest("force_next_write", args=[True]) ])
+    fid.set_integration_time_ms(100)
+    fid.set_integration_time_ms(100)
+    assert usb.sent.count(0xb2) == 2 # only the next write is forced
+
+    fid._send_code(0xb2, 100, label="SET_INTEGRATION_TIME_MS", force=True)
+    assert usb.sent.count(0xb2) == 3
+
+def test_failed_write_is_not_remembered(fid):
+    usb = fid.device_type
+    fid._send_code(0xb2, 100, label="SET_INTEGRATION_TIME_MS")
+    usb.ctrl_transfer = lambda *args: [ 1 ] # never matches success_result
+    fid._send_code(0xb2, 200, label="SET_INTEGRATION_TIME_MS", retry_on_error=True, success_result=[ 0 ])
+    assert not fid.register_cache.is_redundant_write(0xb2, 100, 0, 0)
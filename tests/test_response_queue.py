@@ -0,0 +1,104 @@
+# Unit tests for wasatch.ResponseQueue eviction policies and drop accounting.
+
+import logging
+
+from wasatch.ResponseQueue        import ResponseQueue
+from wasatch.SpectrometerResponse import SpectrometerResponse
+from wasatch.Reading              import Reading
+from wasatch.WasatchDeviceWrapper import WasatchDeviceWrapper
+
+def make_response(session_count, averaged=False):
+    reading = Reading()
+    reading.session_count = session_count
+    reading.averaged = averaged
+    return SpectrometerResponse(data=reading)
+
+def drain(q):
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
+
+def test_drop_oldest_evicts_from_head():
+    q = ResponseQueue(ResponseQueue.DROP_OLDEST, maxsize=3)
+    for i in range(10):
+        q.put(make_response(i))
+
+    assert q.qsize() == 3
+    assert q.dropped == 7
+
+    items = drain(q)
+    assert [r.data.session_count for r in items] == [7, 8, 9]
+    assert [r.data.dropped_readings for r in items] == [7, 0, 0]
+
+def test_errors_and_poison_pills_are_never_evicted():
+    q = ResponseQueue(ResponseQueue.DROP_OLDEST, maxsize=3)
+    q.put(SpectrometerResponse(error_msg="oops"))
+    q.put(SpectrometerResponse(poison_pill=True))
+    for i in range(5):
+        q.put(make_response(i))
+
+    items = drain(q)
+    assert items[0].error_msg == "oops"
+    assert items[1].poison_pill
+    assert items[2].data.session_count == 4
+    assert items[2].data.dropped_readings == 4
+    assert q.dropped == 4
+
+def test_keep_latest():
+    q = ResponseQueue(ResponseQueue.KEEP_LATEST, maxsize=10)
+    for i in range(5):
+        q.put(make_response(i))
+
+    items = drain(q)
+    assert len(items) == 1
+    assert items[0].data.session_count == 4
+    assert items[0].data.dropped_readings == 4
+
+def test_keep_latest_averaged():
+    q = ResponseQueue(ResponseQueue.KEEP_LATEST_AVERAGED, maxsize=10)
+    q.put(make_response(0))
+    q.put(make_response(1, averaged=True))
+    q.put(make_response(2))
+    q.put(make_response(3))
+
+    # newest averaged Reading survives the partials that followed it
+    assert [r.data.session_count for r in drain(q)] == [1, 3]
+
+    q.put(make_response(4, averaged=True))
+    q.put(make_response(5, averaged=True))
+    assert [r.data.session_count for r in drain(q)] == [5]
+
+def test_keep_all_blocking_raises_full():
+    q = ResponseQueue(ResponseQueue.KEEP_ALL_BLOCKING, maxsize=2)
+    q.put(make_response(0))
+    q.put(make_response(1))
+    try:
+        q.put(make_response(2), timeout=0.01)
+        assert False, "expected Full"
+    except Exception as ex:
+        assert type(ex).__name__ == "Full"
+    assert q.dropped == 0
+
+def test_get_final_item_reports_drops():
+    wrapper = WasatchDeviceWrapper("MOCK", logging.INFO, queue_size=3)
+    for i in range(10):
+        wrapper.response_queue.put(make_response(i))
+
+    response = wrapper.get_final_item(keep_averaged=True)
+    assert response.data.session_count == 9
+    assert response.data.dropped_readings == wrapper.response_queue.dropped == 7
+
+def test_get_final_item_keeps_drops_when_returning_keepalive():
+    wrapper = WasatchDeviceWrapper("MOCK", logging.INFO, queue_size=3)
+    for i in range(5):
+        wrapper.response_queue.put(make_response(i))
+    wrapper.response_queue.put(SpectrometerResponse(keep_alive=True, error_msg="hiccup"))
+
+    # the error is floated up first; the drops are reported on the next Reading
+    response = wrapper.get_final_item(keep_averaged=True)
+    assert response.error_msg == "hiccup"
+
+    wrapper.response_queue.put(make_response(5))
+    response = wrapper.get_final_item(keep_averaged=True)
+    assert response.data.dropped_readings == 3
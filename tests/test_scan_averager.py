@@ -0,0 +1,71 @@
+# Compares wasatch.ScanAverager's running statistics with NumPy's batch ones.
+
+import numpy as np
+
+from wasatch.ScanAverager import ScanAverager
+from wasatch.Reading      import Reading
+
+def gen_scans(count, pixels=1024, seed=0):
+    rng = np.random.default_rng(seed)
+    signal = rng.uniform(1000, 50000, pixels)
+    return signal + rng.normal(0, 25, (count, pixels))
+
+def test_matches_numpy():
+    scans = gen_scans(50)
+    averager = ScanAverager()
+    for i, scan in enumerate(scans):
+        assert averager.add(list(scan) if i % 2 else scan) == i + 1
+
+    assert np.allclose(averager.get_mean(),   scans.mean(axis=0))
+    assert np.allclose(averager.get_stddev(), scans.std(axis=0, ddof=1))
+    assert np.array_equal(averager.get_min(), scans.min(axis=0))
+    assert np.array_equal(averager.get_max(), scans.max(axis=0))
+
+    stddev = scans.std(axis=0, ddof=1)
+    assert np.allclose(averager.get_snr(), scans.mean(axis=0) / stddev)
+
+def test_single_scan():
+    scans = gen_scans(1)
+    averager = ScanAverager()
+    averager.add(scans[0])
+    assert np.array_equal(averager.get_mean(), scans[0])
+    assert np.array_equal(averager.get_stddev(), np.zeros(len(scans[0])))
+    assert averager.get_snr() is None
+
+def test_reset_reuses_buffers():
+    averager = ScanAverager()
+    for scan in gen_scans(5, seed=1):
+        averager.add(scan)
+    mean_buffer = averager.mean
+
+    averager.reset()
+    assert averager.get_mean() is None
+
+    scans = gen_scans(3, seed=2)
+    for scan in scans:
+        averager.add(scan)
+    assert averager.mean is mean_buffer
+    assert np.allclose(averager.get_mean(), scans.mean(axis=0))
+
+def test_length_change_restarts():
+    averager = ScanAverager()
+    for scan in gen_scans(3, pixels=512):
+        averager.add(scan)
+    scans = gen_scans(2, pixels=1024)
+    for scan in scans:
+        averager.add(scan)
+    assert averager.count == 2
+    assert np.allclose(averager.get_mean(), scans.mean(axis=0))
+
+def test_apply():
+    scans = gen_scans(10)
+    averager = ScanAverager()
+    for scan in scans:
+        averager.add(scan)
+
+    reading = Reading()
+    averager.apply(reading, decimals=2)
+    assert reading.averaged
+    assert reading.sum_count == 10
+    assert np.allclose(reading.spectrum, scans.mean(axis=0), atol=0.005)
+    assert np.allclose(reading.stddev, scans.std(axis=0, ddof=1))
@@ -0,0 +1,115 @@
+# Unit tests for wasatch.SharedSpectrumRing (write / read / overwrite, and
+# re-attachment from another process).
+
+import pickle
+import pytest
+import numpy as np
+import multiprocessing
+
+from wasatch.SharedSpectrumRing import SharedSpectrumRing
+from wasatch.Reading            import Reading
+
+def make_reading(value, pixels=8):
+    reading = Reading()
+    reading.session_count = value
+    reading.spectrum = np.full(pixels, float(value))
+    return reading
+
+@pytest.fixture
+def ring():
+    ring = SharedSpectrumRing(slots=4, max_pixels=16)
+    yield ring
+    ring.close()
+
+def test_write_read(ring):
+    header = ring.write(make_reading(7, pixels=10))
+    assert header.pixels == 10
+    assert header.reading.spectrum is None
+    assert ring.is_current(header)
+
+    reading = ring.get_reading(header)
+    assert reading.session_count == 7
+    assert np.array_equal(reading.spectrum, np.full(10, 7.0))
+
+def test_overwrite(ring):
+    headers = [ ring.write(make_reading(i)) for i in range(ring.slots) ]
+    assert all(ring.is_current(header) for header in headers)
+
+    # wrapping around reuses the oldest slot
+    newest = ring.write(make_reading(ring.slots))
+    assert newest.slot == headers[0].slot
+    assert not ring.is_current(headers[0])
+    assert ring.read(headers[0]) is None
+    assert ring.get_reading(headers[0]) is None
+
+    assert ring.read(headers[1])[0] == 1
+    assert ring.read(newest)[0] == ring.slots
+
+def test_copy_survives_overwrite(ring):
+    header = ring.write(make_reading(1))
+    view = ring.read(header)
+    copied = ring.read(header, copy=True)
+
+    for i in range(ring.slots):
+        ring.write(make_reading(100 + i))
+
+    assert not ring.is_current(header)
+    assert view[0] == 100 + ring.slots - 1 # zero-copy view of the reused slot
+    assert copied[0] == 1
+    del view
+
+def test_oversized_spectrum_rejected(ring):
+    assert ring.write(make_reading(1, pixels=ring.max_pixels + 1)) is None
+    assert ring.next_sequence == 0
+
+def test_closed_ring(ring):
+    header = ring.write(make_reading(1))
+    ring.close()
+    assert not ring.is_current(header)
+    assert ring.read(header) is None
+    assert ring.write(make_reading(2)) is None
+
+def test_unpickled_ring_attaches(ring):
+    header = ring.write(make_reading(3))
+
+    # (the header_queue itself only pickles while spawning a Process)
+    state = pickle.loads(pickle.dumps({ **ring.__getstate__(), "header_queue": None }))
+    attached = SharedSpectrumRing.__new__(SharedSpectrumRing)
+    attached.__setstate__(state)
+    try:
+        assert not attached.owner
+        assert attached.name == ring.name
+        assert attached.read(header, copy=True)[0] == 3
+
+        ring.write(make_reading(4))
+        assert attached.next_sequence == 0 # only the writer tracks sequence
+        assert attached.sequences[1] == 1
+    finally:
+        attached.close()
+
+    # closing an attached ring doesn't unlink the owner's block
+    assert ring.read(header)[0] == 3
+
+def consume(ring, count, results):
+    for i in range(count):
+        header = ring.header_queue.get(timeout=10)
+        reading = ring.get_reading(header, copy=True)
+        results.put((reading.session_count, float(reading.spectrum.sum())))
+    ring.close()
+
+def test_consumer_process():
+    context = multiprocessing.get_context("spawn")
+    ring = SharedSpectrumRing(slots=4, max_pixels=16, context=context)
+    results = context.Queue()
+    try:
+        consumer = context.Process(target=consume, args=(ring, 2, results))
+        consumer.start()
+        for i in range(2):
+            ring.header_queue.put(ring.write(make_reading(i + 1)))
+
+        assert results.get(timeout=30) == (1, 8.0)
+        assert results.get(timeout=30) == (2, 16.0)
+        consumer.join(timeout=30)
+        assert consumer.exitcode == 0
+    finally:
+        ring.close()
@@ -0,0 +1,98 @@
+# Unit tests for wasatch.SpectrometerFleet, over stand-in wrappers.
+
+import pytest
+
+import wasatch.SpectrometerFleet as SpectrometerFleetModule
+
+from wasatch.SpectrometerFleet    import SpectrometerFleet
+from wasatch.SpectrometerResponse import SpectrometerResponse
+from wasatch.ResponseQueue        import ResponseQueue
+from wasatch.Reading              import Reading
+
+##
+# Just enough of WasatchDeviceWrapper for the fleet: connect() "succeeds"
+# (or fails) on the first poll_settings, or never if connect_result is None.
+class FakeWrapper:
+    connect_results = {}
+    instances = {}
+
+    def __init__(self, device_id, log_level, streaming=False, queue_size=None, queue_policy=None):
+        self.device_id = device_id
+        self.response_queue = ResponseQueue(ResponseQueue.KEEP_ALL_BLOCKING, 10)
+        self.connected = False
+        self.settings = f"settings of {device_id}"
+        self.changes = []
+        FakeWrapper.instances[device_id] = self
+
+    def connect(self):
+        self.connected = True
+
+    def poll_settings(self, timeout_sec):
+        return self.connect_results[self.device_id]
+
+    def disconnect(self):
+        self.connected = False
+
+    def change_setting(self, setting, value):
+        self.changes.append((setting, value))
+
+@pytest.fixture
+def fleet(monkeypatch):
+    monkeypatch.setattr(SpectrometerFleetModule, "WasatchDeviceWrapper", FakeWrapper)
+    monkeypatch.setattr(SpectrometerFleet, "RELAY_POLL_SEC", 0.01)
+    FakeWrapper.connect_results = {}
+    FakeWrapper.instances = {}
+    fleet = SpectrometerFleet()
+    yield fleet
+    fleet.disconnect()
+
+def make_response(session_count):
+    reading = Reading()
+    reading.session_count = session_count
+    return SpectrometerResponse(data=reading)
+
+def test_connect_in_parallel(fleet):
+    FakeWrapper.connect_results = {
+        "a": SpectrometerResponse(data=True),
+        "b": SpectrometerResponse(error_msg="no EEPROM"),
+        "c": None,
+        "d": SpectrometerResponse(data=True) }
+
+    assert fleet.connect([ "a", "b", "c", "d" ], timeout_sec=0.2) == [ "a", "d" ]
+    assert set(fleet.get_settings().keys()) == { "a", "d" }
+
+    # every worker was started, and the failures disconnected
+    assert all(wrapper.connected == (key in ("a", "d")) for key, wrapper in FakeWrapper.instances.items())
+
+def test_merged_stream(fleet):
+    FakeWrapper.connect_results = { "a": SpectrometerResponse(data=True), "b": SpectrometerResponse(data=True) }
+    fleet.connect([ "a", "b" ])
+
+    FakeWrapper.instances["a"].response_queue.put(make_response(1))
+    FakeWrapper.instances["b"].response_queue.put(make_response(2))
+    FakeWrapper.instances["a"].response_queue.put(make_response(3))
+
+    received = [ fleet.get_next(timeout_sec=5) for i in range(3) ]
+    assert sorted((key, response.data.session_count) for (key, response) in received) == [ ("a", 1), ("a", 3), ("b", 2) ]
+    assert [ response.data.session_count for (key, response) in received if key == "a" ] == [ 1, 3 ] # per-device order kept
+    assert fleet.get_next() is None
+
+def test_change_setting(fleet):
+    FakeWrapper.connect_results = { "a": SpectrometerResponse(data=True), "b": SpectrometerResponse(data=True) }
+    fleet.connect([ "a", "b" ])
+
+    fleet.change_setting("integration_time_ms", 10)
+    fleet.change_setting("laser_enable", True, device_ids=[ "b", "unknown" ])
+    assert FakeWrapper.instances["a"].changes == [ ("integration_time_ms", 10) ]
+    assert FakeWrapper.instances["b"].changes == [ ("integration_time_ms", 10), ("laser_enable", True) ]
+
+def test_disconnect_stops_relays(fleet):
+    FakeWrapper.connect_results = { "a": SpectrometerResponse(data=True) }
+    fleet.connect([ "a" ])
+    relay = fleet.relays["a"]
+
+    fleet.disconnect()
+    relay.join(timeout=5)
+    assert not relay.is_alive()
+    assert fleet.stop_event.is_set()
+    assert not fleet.wrappers
@@ -0,0 +1,95 @@
+# Unit tests for wasatch.TraceRing.
+
+import threading
+
+from wasatch.TraceRing import TraceRing
+
+EV_TEST = TraceRing.event("test", "a {a} b {b} c {c}")
+
+def test_size_must_be_power_of_2():
+    try:
+        TraceRing(size=100)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+def test_records_in_order():
+    ring = TraceRing(size=8)
+    for i in range(5):
+        ring.record(EV_TEST, i, i * 2, i * 3)
+
+    records = ring.get_records()
+    assert [ (event_id, a, b, c) for (event_id, t, a, b, c) in records ] == \
+           [ (EV_TEST, i, i * 2, i * 3) for i in range(5) ]
+    timestamps = [ t for (_, t, _, _, _) in records ]
+    assert timestamps == sorted(timestamps)
+
+def test_wraparound_keeps_newest():
+    ring = TraceRing(size=8)
+    for i in range(21):
+        ring.record(EV_TEST, i)
+
+    records = ring.get_records()
+    assert len(records) == 8
+    assert [ a for (_, _, a, _, _) in records ] == list(range(13, 21))
+
+    ring.clear()
+    assert ring.get_records() == []
+
+def test_bad_arguments_never_raise():
+    ring = TraceRing(size=8)
+    ring.record(EV_TEST, None, 1.5, 2**70)
+    (event_id, _, a, b, c) = ring.get_records()[0]
+    assert (event_id, a, b, c) == (EV_TEST, -1, -1, -1)
+
+def test_render_merges_threads():
+    TraceRing.clear_all()
+
+    def worker(n):
+        for i in range(3):
+            TraceRing.trace(EV_TEST, n, i)
+
+    threads = [ threading.Thread(target=worker, args=(n,), name=f"tracer-{n}") for n in range(2) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    records = [ r for r in TraceRing.collect() if r[1].startswith("tracer-") ]
+    assert len(records) == 6
+    assert [ r[0] for r in records ] == sorted(r[0] for r in records)
+
+    text = TraceRing.render()
+    assert "[tracer-0] test: a 0 b 2 c 0" in text
+    assert "[tracer-1] test: a 1 b 0 c 0" in text
+
+def test_live_threads_never_evicted(monkeypatch):
+    monkeypatch.setattr(TraceRing, "MAX_RINGS", 4)
+    monkeypatch.setattr(TraceRing, "rings", list(TraceRing.rings))
+
+    # a long-lived thread traces first...
+    started = threading.Event()
+    done = threading.Event()
+    def acquisition():
+        TraceRing.trace(EV_TEST, 1)
+        started.set()
+        done.wait()
+    long_lived = threading.Thread(target=acquisition, name="acquisition", daemon=True)
+    long_lived.start()
+    started.wait()
+
+    try:
+        # ...followed by many short-lived ones
+        for n in range(10):
+            thread = threading.Thread(target=TraceRing.trace, args=(EV_TEST, n), name=f"short-{n}")
+            thread.start()
+            thread.join()
+
+        names = [ ring.thread_name for ring in TraceRing.rings ]
+        assert "acquisition" in names
+        assert names[-1] == "short-9"
+        assert len(names) <= max(4, sum(ring.is_alive() for ring in TraceRing.rings))
+        assert "[acquisition] test: a 1" in TraceRing.render()
+    finally:
+        done.set()
+        long_lived.join()
@@ -0,0 +1,143 @@
+# Unit tests for the plumbing behind WasatchDeviceWrapper(process=True): the
+# tagged upstream queue, the parent's relay_upstream thread, shutdown of
+# blocked KEEP_ALL_BLOCKING puts, and forwarding of the child's log records.
+
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+
+from wasatch.WorkerProcess        import TaggedQueue
+from wasatch.WrapperWorker        import WrapperWorker
+from wasatch.WasatchDeviceWrapper import WasatchDeviceWrapper
+from wasatch.ResponseQueue        import ResponseQueue
+from wasatch.SpectrometerResponse import SpectrometerResponse
+from wasatch.DeviceID             import DeviceID
+from wasatch.Reading              import Reading
+from wasatch                      import applog
+
+DEVICE_ID = DeviceID(label="USB:0x1000:0x1000:1:24")
+
+# long enough for a blocked put to poll stop_event several times
+JOIN_TIMEOUT_SEC = WrapperWorker.BLOCKED_PUT_TIMEOUT_SEC * 20
+
+def make_response(session_count):
+    reading = Reading()
+    reading.session_count = session_count
+    return SpectrometerResponse(data=reading)
+
+class FakeProcess:
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+def test_tagged_queue():
+    upstream = queue.Queue()
+    TaggedQueue(upstream, "settings").put("a")
+    TaggedQueue(upstream, "response").put_nowait("b")
+    assert upstream.get_nowait() == ("settings", "a")
+    assert upstream.get_nowait() == ("response", "b")
+
+def test_blocked_enqueue_unblocks_on_shutdown():
+    response_queue = ResponseQueue(ResponseQueue.KEEP_ALL_BLOCKING, 1)
+    worker = WrapperWorker(
+        device_id      = DEVICE_ID,
+        command_queue  = queue.Queue(),
+        response_queue = response_queue,
+        settings_queue = queue.Queue(),
+        message_queue  = queue.Queue(),
+        class_name     = "WasatchDevice",
+        log_level      = "DEBUG",
+        streaming      = True)
+
+    worker.enqueue(make_response(0))
+    producer = threading.Thread(target=worker.enqueue, args=(make_response(1),), daemon=True)
+    producer.start()
+
+    # nothing is dropped while the consumer is merely slow...
+    producer.join(timeout=WrapperWorker.BLOCKED_PUT_TIMEOUT_SEC * 3)
+    assert producer.is_alive()
+
+    # ...but disconnect mustn't wait on a consumer which has gone away
+    worker.stop_event.set()
+    producer.join(timeout=JOIN_TIMEOUT_SEC)
+    assert not producer.is_alive()
+    assert response_queue.qsize() == 1
+    assert response_queue.dropped == 0
+
+def make_wrapper():
+    wrapper = WasatchDeviceWrapper(DEVICE_ID, "DEBUG", streaming=True, queue_size=1)
+    wrapper.upstream = queue.Queue()
+    wrapper.worker_process = FakeProcess()
+    return wrapper
+
+def test_relay_upstream_routes_tags():
+    wrapper = make_wrapper()
+    for (tag, item) in [ ("settings", "s"), ("message", "m"), ("response", make_response(5)) ]:
+        wrapper.upstream.put((tag, item))
+    wrapper.worker_process.alive = False
+
+    wrapper.relay_upstream() # returns once the process has exited and upstream is drained
+    assert wrapper.settings_queue.get_nowait() == "s"
+    assert wrapper.message_queue.get_nowait() == "m"
+    assert wrapper.response_queue.get_nowait().data.session_count == 5
+
+def test_relay_upstream_unblocks_on_shutdown():
+    wrapper = make_wrapper()
+    for i in range(3):
+        wrapper.upstream.put(("response", make_response(i)))
+
+    relay = threading.Thread(target=wrapper.relay_upstream, daemon=True)
+    relay.start()
+    relay.join(timeout=WrapperWorker.BLOCKED_PUT_TIMEOUT_SEC * 3)
+    assert relay.is_alive() # blocked on the full KEEP_ALL_BLOCKING queue
+
+    wrapper.stop_event.set()
+    wrapper.worker_process.alive = False
+    relay.join(timeout=JOIN_TIMEOUT_SEC)
+    assert not relay.is_alive()
+    assert wrapper.response_queue.get_nowait().data.session_count == 0
+
+# ##############################################################################
+# child-process logging
+# ##############################################################################
+
+CHILD_LOGGER = "wasatch.test_worker_process.child"
+
+def log_from_child(log_queue):
+    applog.configure_child_process(log_queue, logging.INFO)
+    logging.getLogger(CHILD_LOGGER).info("hello from %s", "child")
+    logging.getLogger(CHILD_LOGGER).debug("below log_level")
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def test_child_log_records_forwarded():
+    context = multiprocessing.get_context("spawn")
+    log_queue = context.Queue(maxsize=100)
+    handler = ListHandler()
+    logger = logging.getLogger(CHILD_LOGGER)
+    logger.addHandler(handler)
+    listener = applog.start_child_listener(log_queue)
+    try:
+        child = context.Process(target=log_from_child, args=(log_queue,))
+        child.start()
+        child.join(timeout=30)
+        assert child.exitcode == 0
+
+        deadline = time.monotonic() + 10
+        while not handler.records and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+
+    assert [ record.getMessage() for record in handler.records ] == [ "hello from child" ]
@@ -25,5 +25,19 @@ class AbstractUSBDevice:
     def read(self):
         pass
 
+    ##
+    # Read from a bulk endpoint into a caller-supplied (preallocated) buffer.
+    #
+    # This default implementation simply copies the result of read() into the
+    # buffer; subclasses with a genuine zero-copy path should override it.
+    #
+    # @returns number of bytes received (which may exceed len(buffer), in 
+    #          which case the excess was discarded)
+    def read_into(self, device, endpoint, buffer, timeout=None):
+        data = self.read(device, endpoint, len(buffer), timeout=timeout)
+        count = min(len(data), len(buffer))
+        memoryview(buffer).cast("B")[:count] = bytes(data[:count])
+        return len(data)
+
     def send_code(self):
         pass
\ No newline at end of file
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+from .WasatchDeviceWrapper import WasatchDeviceWrapper
+from .ResponseQueue        import ResponseQueue
+
+log = logging.getLogger(__name__)
+
+##
+# An asyncio facade over WasatchDeviceWrapper.
+#
+# @verbatim
+#   async with AsyncSpectrometer(device_id) as spec:
+#       await spec.set("integration_time_ms", 100)
+#       async for reading in spec.stream():
+#           ...
+# @endverbatim
+#
+# The wrapper is created in callback mode, so its WrapperWorker thread hands
+# each SpectrometerResponse straight to us; we schedule it onto an
+# asyncio.Queue in the event loop (call_soon_threadsafe /
+# run_coroutine_threadsafe), so nothing polls.
+#
+# Under the default KEEP_ALL_BLOCKING policy the worker thread waits until
+# the consumer has room, so a slow "async for" applies backpressure all the
+# way to the acquisition loop.  Under the other ResponseQueue policies the
+# worker never waits, and queued Readings are evicted as that policy
+# describes instead (counted in self.dropped).
+#
+# close() (or leaving the "async with") releases any blocked worker,
+# disconnects the spectrometer and ends any active stream().
+class AsyncSpectrometer:
+
+    DEFAULT_QUEUE_SIZE = 100
+
+    def __init__(self, device_id, log_level="INFO", policy=ResponseQueue.KEEP_ALL_BLOCKING, queue_size=DEFAULT_QUEUE_SIZE, **wrapper_kwargs):
+        if policy not in ResponseQueue.POLICIES:
+            raise ValueError(f"unsupported policy {policy}")
+
+        self.device_id = device_id
+        self.log_level = log_level
+        self.policy = policy
+        self.queue_size = queue_size
+        self.wrapper_kwargs = wrapper_kwargs
+
+        self.loop = None
+        self.queue = None
+        self.wrapper = None
+        self.closing = False
+        self.dropped = 0
+
+        self.pending = set() # futures on which the worker thread is blocked
+        self.pending_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"AsyncSpectrometer <{self.device_id}, policy {self.policy}, dropped {self.dropped}>"
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def settings(self):
+        return None if self.wrapper is None else self.wrapper.settings
+
+    async def connect(self):
+        """ @returns True once SpectrometerSettings have been received (raises on failure) """
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.closing = False
+
+        self.wrapper = WasatchDeviceWrapper(self.device_id, self.log_level, callback=self._on_response, **self.wrapper_kwargs)
+
+        # blocks (in an executor thread) until the worker reports settings
+        await self.loop.run_in_executor(None, self.wrapper.connect)
+        return self.wrapper.connected
+
+    async def set(self, setting, value=None):
+        """ queue a setting for the worker (see README_SETTINGS.md) """
+        self.wrapper.change_setting(setting, value)
+
+    ##
+    # Yield each Reading as it arrives, until close() or the device fails.
+    #
+    # @param policy (Input) optionally change the ResponseQueue policy
+    # @param averaged_only (Input) skip partial (not-yet-averaged) Readings
+    async def stream(self, policy=None, averaged_only=False):
+        if policy is not None:
+            if policy not in ResponseQueue.POLICIES:
+                raise ValueError(f"unsupported policy {policy}")
+            self.policy = policy
+
+        while True:
+            response = await self.queue.get()
+            if response is None:
+                return # closed
+
+            if response.poison_pill:
+                log.critical(f"stream: {self.device_id} sent poison-pill ({response.error_msg})")
+                return
+
+            if response.error_msg:
+                log.error(f"stream: {self.device_id} reported {response.error_msg}")
+                continue
+
+            reading = response.data
+            if response.keep_alive or reading is None or reading.spectrum is None:
+                continue
+
+            if averaged_only and not reading.averaged:
+                continue
+
+            yield reading
+
+    async def close(self):
+        if self.wrapper is None or self.closing:
+            return
+
+        # release a worker waiting for queue space (under the lock, so it 
+        # can't add a new put between our setting closing and cancelling)
+        with self.pending_lock:
+            self.closing = True
+            for future in self.pending:
+                future.cancel()
+
+        await self.loop.run_in_executor(None, self.wrapper.disconnect)
+
+        # end any active stream()
+        self._put_latest(None)
+
+    # ##########################################################################
+    # worker-thread side
+    # ##########################################################################
+
+    ## called by WrapperWorker (in its own thread) with every response
+    def _on_response(self, response):
+        if self.closing or self.loop is None:
+            return
+
+        if self.policy != ResponseQueue.KEEP_ALL_BLOCKING and not response.poison_pill:
+            self.loop.call_soon_threadsafe(self._put_latest, response)
+            return
+
+        with self.pending_lock:
+            if self.closing:
+                return
+            future = asyncio.run_coroutine_threadsafe(self.queue.put(response), self.loop)
+            self.pending.add(future)
+        try:
+            future.result()
+        except (concurrent.futures.CancelledError, RuntimeError):
+            log.debug("_on_response: abandoned put during shutdown")
+        finally:
+            with self.pending_lock:
+                self.pending.discard(future)
+
+    ## 
+    # (in the event loop) enqueue without waiting, evicting per self.policy 
+    # with the same rules as ResponseQueue: poison-pills and error responses 
+    # (and the None which ends stream()) are never evicted.
+    def _put_latest(self, response):
+        queued = []
+        while not self.queue.empty():
+            queued.append(self.queue.get_nowait())
+
+        if ResponseQueue.is_evictable(response):
+            if self.policy == ResponseQueue.KEEP_LATEST or \
+                    (self.policy == ResponseQueue.KEEP_LATEST_AVERAGED and self._is_averaged(response)):
+                queued = self._evict(queued, lambda old: True)
+            elif self.policy == ResponseQueue.KEEP_LATEST_AVERAGED:
+                queued = self._evict(queued, lambda old: not self._is_averaged(old))
+
+        # applies to every non-blocking policy, as a backstop
+        while 0 < self.queue.maxsize <= len(queued):
+            oldest = next((i for i, old in enumerate(queued) if ResponseQueue.is_evictable(old)), None)
+            if oldest is None:
+                if ResponseQueue.is_evictable(response):
+                    # nothing evictable is queued, so drop the newcomer instead
+                    self.dropped += 1
+                    break
+
+                # unlike ResponseQueue, asyncio.Queue can't exceed its maxsize
+                oldest = 0
+                log.error(f"_put_latest: queue full of errors, discarding {queued[0]}")
+            del queued[oldest]
+            self.dropped += 1
+        else:
+            queued.append(response)
+
+        for item in queued:
+            self.queue.put_nowait(item)
+
+    def _evict(self, queued, predicate):
+        kept = [ old for old in queued if not (ResponseQueue.is_evictable(old) and predicate(old)) ]
+        self.dropped += len(queued) - len(kept)
+        return kept
+
+    @staticmethod
+    def _is_averaged(response):
+        return response.data is not None and getattr(response.data, "averaged", False)
@@ -9,6 +9,8 @@ class ControlObject:
 
     These are also used by the alert_queue.
     """
+    __slots__ = ("setting", "value")
+
     def __init__(self, setting, value):
         self.setting = setting
         self.value = value
@@ -7,9 +7,11 @@ import copy
 import math
 import os
 import re
+import threading
 
-from random import randint
-from time   import sleep
+from random             import randint
+from time               import sleep, monotonic, monotonic_ns
+from concurrent.futures import ThreadPoolExecutor
 
 from . import utils
 
@@ -29,20 +31,75 @@ from .PollStatus           import PollStatus
 from .Reading              import Reading
 from .EEPROM               import EEPROM
 from .IMX385               import IMX385
+from .ProcessingPlan       import ProcessingPlan
+from .LatencyMarks         import LatencyMarks
+from .RegisterCache        import RegisterCache
+from .OpcodeProfiler       import OpcodeProfiler
+from .MetricsRegistry      import MetricsRegistry
+from .TraceRing            import TraceRing
+from .RollingWindow        import RollingWindow
+from .SpectrumRing         import SpectrumRing
 from .ROI                  import ROI
 
 log = logging.getLogger(__name__)
 
 MICROSEC_TO_SEC = 0.000001
+
+##
+# Hot-path trace events (see TraceRing), recorded instead of logged so that
+# DEBUG logging doesn't cost a string per transfer or spectrum.
+trace = TraceRing.trace
+EV_SEND_CODE            = TraceRing.event("_send_code",            "request 0x{a:02x} value 0x{b:04x} index 0x{c:04x}")
+EV_SEND_CODE_SUPPRESSED = TraceRing.event("_send_code suppressed", "request 0x{a:02x} value 0x{b:04x} index 0x{c:04x}")
+EV_SEND_CODE_RESULT     = TraceRing.event("_send_code result",     "request 0x{a:02x} result {b} retry {c}")
+EV_GET_CODE             = TraceRing.event("_get_code",             "request 0x{a:02x} value 0x{b:04x} index 0x{c:04x}")
+EV_GET_CODE_CACHED      = TraceRing.event("_get_code cached",      "request 0x{a:02x} value 0x{b:04x} index 0x{c:04x}")
+EV_GET_CODE_RESULT      = TraceRing.event("_get_code result",      "request 0x{a:02x} length {b} first bytes 0x{c:08x}")
+EV_ACQUIRE              = TraceRing.event("get_spectrum ACQUIRE",  "request 0x{a:02x} pipelined {b}")
+EV_READ_WAIT            = TraceRing.event("bulk read",             "endpoint 0x{a:02x} bytes {b} timeout {c}ms")
+EV_READ_DONE            = TraceRing.event("bulk read done",        "endpoint 0x{a:02x} bytes {b}")
+EV_READ_ERROR           = TraceRing.event("bulk read error",       "endpoint 0x{a:02x} error {b}")
+EV_SPECTRUM             = TraceRing.event("get_spectrum complete", "pixels {a} in {b}us (integration {c}ms)")
+
+##
+# Opcodes which can be sent while a pipelined ACQUIRE is in flight without
+# invalidating the spectrum being integrated. Any other write marks the
+# in-flight acquisition as stale (see set_pipelined_trigger_enable).
+PIPELINE_SAFE_OPCODES = {
+    0xad, # ACQUIRE_SPECTRUM
+    0x84, # SET_LASER_TEC_MODE
+    0x8a, # SET_LASER_WARNING_DELAY_SEC
+    0xd6, # SET_DETECTOR_TEC_ENABLE
+    0xd8, # SET_DETECTOR_TEC_SETPOINT
+    0xe7, # SET_LASER_TEC_SETPOINT
+    0xed, # SELECT_ADC
+}
 UNINITIALIZED_TEMPERATURE_DEG_C = -999
 
+##
+# Adaptive bulk-read timeouts (see generate_timeout_ms): once enough spectra
+# have been read at the current settings, the timeout is the observed
+# ADAPTIVE_TIMEOUT_QUANTILE of acquire-to-data latency, scaled by
+# ADAPTIVE_TIMEOUT_SCALE plus ADAPTIVE_TIMEOUT_MARGIN_MS.  Only spectra whose
+# ACQUIRE was sent immediately before the read are sampled; a pipelined 
+# ACQUIRE's latency would include however long the caller took to ask for it.
+ADAPTIVE_TIMEOUT_QUANTILE = 0.99
+ADAPTIVE_TIMEOUT_SCALE = 1.5
+ADAPTIVE_TIMEOUT_MARGIN_MS = 250
+
+# Series-XS sensors may go to sleep when idle this long, and need up to 8 frames
+# to wake (see WasatchDevice.perform_optional_throwaways), so the next read uses
+# the fallback timeout
+XS_IDLE_SLEEP_SEC = 1
+
 class SpectrumAndRow:
-    def __init__(self, spectrum=None, row=-1):
+    def __init__(self, spectrum=None, row=-1, copy=True, marks=None):
         self.spectrum = None
         self.row = row
+        self.marks = marks
 
         if spectrum is not None:
-            self.spectrum = spectrum.copy()
+            self.spectrum = spectrum.copy() if copy else spectrum
 
 class FeatureIdentificationDevice(InterfaceDevice):
     """
@@ -77,6 +134,8 @@ class FeatureIdentificationDevice(InterfaceDevice):
     ############################################################################
     """
 
+    TRACE_DUMP_EVENTS = 200 # logged by _schedule_disconnect
+
     # ##########################################################################
     # Lifecycle
     # ##########################################################################
@@ -145,6 +204,46 @@ class FeatureIdentificationDevice(InterfaceDevice):
         self.process_f = self._init_process_funcs()
         self.imx385 = IMX385()
 
+        # compiled post-processing pipeline (see ProcessingPlan)
+        self.processing_plan = None
+
+        # preallocated bulk-read buffers (see SpectrumRing)
+        self.spectrum_ring = None
+
+        # pipelined trigger (see set_pipelined_trigger_enable)
+        self.pipelined_acquire_pending = False
+        self.pipelined_acquire_stale = False
+
+        # helper thread for reading the second bulk endpoint (see _read_endpoint_pair)
+        self.endpoint_reader = None
+        self.endpoint_pair_cancelled = False
+
+        # read errors so far on the current spectrum, across all its endpoints
+        self.spectrum_read_errors = 0
+        self.spectrum_read_errors_lock = threading.Lock()
+
+        # read-through cache of control-transfer getters
+        self.register_cache = RegisterCache()
+        self.force_next_write = False # see set_force_next_write
+
+        # per-opcode EP0 timing (None unless enabled; see set_opcode_profiler_enable)
+        self.opcode_profiler = None
+
+        # operational metrics (see MetricsRegistry)
+        metrics = MetricsRegistry.get_default()
+        self.metric_spectra_acquired       = metrics.counter("spectra_acquired",       device_id)
+        self.metric_bulk_read_timeouts     = metrics.counter("bulk_read_timeouts",     device_id)
+        self.metric_disconnects_scheduled  = metrics.counter("disconnects_scheduled",  device_id)
+        self.metric_random_errors_injected = metrics.counter("random_errors_injected", device_id)
+        self.metric_throwaways_consumed    = metrics.counter("throwaways_consumed",    device_id)
+        self.metric_acquisition_rate_hz    = metrics.rate("acquisition_rate_hz",       device_id)
+
+        # observed acquire-to-data latency (see generate_timeout_ms)
+        self.latency_window = RollingWindow()
+        self.acquire_sent_time = None
+        self.last_read_complete = None # monotonic time of the last successful read
+        self.latency_marks = None # of the spectrum being read
+
     def handle_requests(self, requests: list[SpectrometerRequest]):
         """
         @todo consider making 'requests' an object, and dynamically checking to 
@@ -261,6 +360,12 @@ class FeatureIdentificationDevice(InterfaceDevice):
         Split-out from physical / bus connect() to simplify MockSpectrometer.
         """
 
+        # anything compiled against a previous connection is stale
+        self.invalidate_processing_plan()
+        self.register_cache.clear()
+        self.pipelined_acquire_pending = False
+        self.pipelined_acquire_stale = False
+
         # grab firmware versions early (and capture in debug log)
         self.get_microcontroller_firmware_version()
         log.debug(f"Microcontroller firmware version {self.settings.microcontroller_firmware_version}")
@@ -474,6 +579,11 @@ class FeatureIdentificationDevice(InterfaceDevice):
             self._set_laser_enable_immediate(False)
 
         self.connected = False
+        self.register_cache.clear()
+
+        if self.endpoint_reader is not None:
+            self.endpoint_reader.shutdown(wait=False)
+            self.endpoint_reader = None
 
         log.debug("fid.disconnect: releasing interface")
         try:
@@ -496,6 +606,8 @@ class FeatureIdentificationDevice(InterfaceDevice):
         Alternately, non-ENLIGHTEN callers can set "raise_exceptions" -> True for
         in-process exception-handling.
         """
+        self.metric_disconnects_scheduled.inc()
+        log.critical("_schedule_disconnect: recent trace:\n%s", TraceRing.render(last=self.TRACE_DUMP_EVENTS))
         if self.raise_exceptions:
             log.critical("_schedule_disconnect: raising exception %s", exc)
             raise exc
@@ -505,6 +617,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
     def reset(self, *args):
         log.debug("FID performing device reset")
+        self.register_cache.clear()
         #self.device_type.release_interface(self.device, 0)
         self.device_type.reset(self.device)
         log.debug(f"freed interface")
@@ -580,155 +693,32 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         if random.random() <= self.random_error_perc:
             log.critical("Randomly-injected error")
+            self.metric_random_errors_injected.inc()
             self._schedule_disconnect(Exception("Randomly-injected error"))
             return True
         return False
 
-    ##
-    # Until support for even/odd InGaAs gain and offset have been added to the
-    # firmware, apply the correction in software.
-    def _correct_ingaas_gain_and_offset(self, spectrum: list[float]):
-        if not self.settings.is_ingaas() or self.settings.eeprom.hardware_even_odd:
-            return False
-
-        # if even and odd pixels have the same settings, there's no point in doing anything
-        if self.settings.eeprom.detector_gain_odd   == self.settings.eeprom.detector_gain and \
-           self.settings.eeprom.detector_offset_odd == self.settings.eeprom.detector_offset:
-            return False
-
-        if 0 == self.settings.eeprom.detector_gain:
-            log.debug("declining to attempt division by zero")
-            return
-
-        log.debug("rescaling InGaAs odd pixels from even gain %.4f, offset %d to odd gain %.4f, offset %d",
-            self.settings.eeprom.detector_gain,
-            self.settings.eeprom.detector_offset,
-            self.settings.eeprom.detector_gain_odd,
-            self.settings.eeprom.detector_offset_odd)
-
-        log.debug("before: %d, %d, %d, %d, %d", spectrum[0], spectrum[1], spectrum[2], spectrum[3], spectrum[4])
-
-        # iterate over the ODD pixels of the spectrum
-        for i in range(1, len(spectrum), 2):
-
-            # back-out the incorrectly applied "even" gain and offset
-            old = float(spectrum[i])
-            raw = (old - self.settings.eeprom.detector_offset) / self.settings.eeprom.detector_gain
-
-            # apply the correct "odd" gain and offset
-            spectrum[i] = (raw * self.settings.eeprom.detector_gain_odd) + self.settings.eeprom.detector_offset_odd
-
-            if i < 5 or i > len(spectrum) - 5:
-                log.debug("  pixel %4d: old %.2f raw %.2f new %.2f", i, old, raw, spectrum[i])
-
-        log.debug("after: %d, %d, %d, %d, %d", spectrum[0], spectrum[1], spectrum[2], spectrum[3], spectrum[4])
-
-        return True
-
-    def _apply_linear_pixel_calibration(self, spectrum):
-        if not self.settings.linear_pixel_calibration:
-            return
-
-        (slopes, offsets) = self.settings.linear_pixel_calibration
-        smoothed = [] # could be faster in Numpy
-        for i, intensity in enumerate(spectrum):
-            smoothed.append(intensity * slopes[i] + offsets[i])
-        return smoothed
-
-    def _apply_horizontal_binning(self, spectrum):
-        if not self.settings.eeprom.horiz_binning_enabled:
-            return spectrum
-
-        mode = self.settings.eeprom.multi_wavelength_calibration.get("horiz_binning_mode")
-        if mode == IMX385.BIN_2X2:
-            return self.imx385.bin_2x2(spectrum)
-        elif mode == IMX385.CORRECT_SSC:
-            return self.imx385.correct_ssc(spectrum, self.settings.wavelengths)
-        elif mode == IMX385.CORRECT_SSC_BIN_2X2:
-            spectrum = self.imx385.correct_ssc(spectrum, self.settings.wavelengths)
-            return self.imx385.bin_2x2(spectrum)
-        elif mode == IMX385.BIN_4X2:
-            return self.imx385.bin_4x2(spectrum)
-        elif mode == IMX385.BIN_4X2_INTERP:
-            return self.imx385.bin_4x2_interp(spectrum, self.settings.wavelengths)
-        elif mode == IMX385.BIN_4X2_AVG:
-            return self.imx385.bin_4x2_avg(spectrum)
-        else:
-            # there may be legacy units in the field where this byte is 
-            # uninitialized to 0xff...treat as 0x00 for now
-            log.error("invalid horizontal binning mode {mode}...defaulting to bin_2x2")
-            return self.imx385.bin_2x2(spectrum)
-
-    def _correct_bad_pixels(self, spectrum):
+    def invalidate_processing_plan(self):
         """
-        If a spectrometer has bad_pixels configured in the EEPROM, then average
-        over them in the driver.
-        Note this function modifies the passed array in-place, rather than
-        returning a modified copy.
-        @note assumes bad_pixels is previously sorted
+        Discard the compiled ProcessingPlan, so that it will be re-compiled
+        (from current settings) on the next acquisition.  Call this from any
+        setter which changes inputs to the post-processing order of operations.
         """
+        self.processing_plan = None
 
-        if self.settings is None or \
-                self.settings.eeprom is None or \
-                self.settings.eeprom.bad_pixels is None or \
-                len(self.settings.eeprom.bad_pixels) == 0 or \
-                self.settings.state.detector_regions is not None:
-            return False
+    def _get_processing_plan(self, pixels):
+        if self.processing_plan is None or self.processing_plan.pixels != pixels:
+            self.processing_plan = ProcessingPlan(self.settings, self.imx385, pixels)
+        return self.processing_plan
 
-        if spectrum is None or len(spectrum) == 0:
-            return False
+    def set_linear_pixel_calibration(self, data):
+        self.settings.set_linear_pixel_calibration(data)
+        self.invalidate_processing_plan()
 
-        pixels = len(spectrum)
-        bad_pixels = self.settings.eeprom.bad_pixels
-
-        # iterate over each bad pixel
-        i = 0
-        while i < len(bad_pixels):
-
-            bad_pix = bad_pixels[i]
-
-            if bad_pix == 0:
-                # handle the left edge
-                next_good = bad_pix + 1
-                while next_good in bad_pixels and next_good < pixels:
-                    next_good += 1
-                    i += 1
-                if next_good < pixels:
-                    for j in range(next_good):
-                        spectrum[j] = spectrum[next_good]
-            else:
-
-                # find previous good pixel
-                prev_good = bad_pix - 1
-                while prev_good in bad_pixels and prev_good >= 0:
-                    prev_good -= 1
-
-                if prev_good >= 0:
-                    # find next good pixel
-                    next_good = bad_pix + 1
-                    while next_good in bad_pixels and next_good < pixels:
-                        next_good += 1
-                        i += 1
-
-                    if next_good < pixels:
-                        # for now, draw a line between previous and next_good pixels
-                        # TODO: consider some kind of curve-fit
-                        delta = float(spectrum[next_good] - spectrum[prev_good])
-                        rng   = next_good - prev_good 
-                        step  = delta / rng
-                        # log.debug(f"correct_bad_pixels: bad_pix {bad_pix}, prev_good {prev_good} ({spectrum[prev_good]}), next_good {next_good} ({spectrum[next_good]}), delta {delta:.2f}, rng {rng}, step {step:.2f}")
-                        for j in range(rng - 1):
-                            new = spectrum[prev_good] + step * (j + 1)
-                            spectrum[prev_good + j + 1] = new
-                            # log.debug(f"correct_bad_pixels: stomping pix {prev_good + j + 1} with {new}")
-                    else:
-                        # we ran off the high end, so copy-right
-                        for j in range(bad_pix, pixels):
-                            spectrum[j] = spectrum[prev_good]
-
-            # advance to next bad pixel
-            i += 1
-        return True
+    def _set_processing_setting(self, obj, name, value):
+        """ set a SpectrometerState / EEPROM field affecting post-processing """
+        obj.set(name, value)
+        self.invalidate_processing_plan()
 
     def _send_code(self, 
                    bRequest: int, 
@@ -738,7 +728,12 @@ class FeatureIdentificationDevice(InterfaceDevice):
                    label: str = "", 
                    dry_run: bool = False, 
                    retry_on_error: bool = False, 
-                   success_result: int = 0x00) -> SpectrometerResponse:
+                   success_result: int = 0x00,
+                   force: bool = False) -> SpectrometerResponse:
+        """
+        @param force (Input) send even if RegisterCache knows the same value 
+               was already written
+        """
         if self.shutdown_requested or (not self.connected and not self.connecting):
             log.debug("_send_code: not attempting because not connected")
             return SpectrometerResponse(False)
@@ -752,15 +747,31 @@ class FeatureIdentificationDevice(InterfaceDevice):
             else:
                 data_or_wLength = 0
 
-        log.debug("%s_send_code: request 0x%02x value 0x%04x index 0x%04x data/len %s",
-            prefix, bRequest, wValue, wIndex, data_or_wLength)
+        trace(EV_SEND_CODE, bRequest, wValue, wIndex)
 
         if dry_run:
             return SpectrometerResponse(keep_alive=True)
 
+        if self.force_next_write and self.register_cache.is_suppressible(bRequest, wValue):
+            self.force_next_write = False
+            force = True
+
+        if not force and self.register_cache.is_redundant_write(bRequest, wValue, wIndex, data_or_wLength):
+            trace(EV_SEND_CODE_SUPPRESSED, bRequest, wValue, wIndex)
+            return SpectrometerResponse(keep_alive=True)
+
+        self.register_cache.invalidate_for_write(bRequest, wValue)
+
+        if self.pipelined_acquire_pending and bRequest not in PIPELINE_SAFE_OPCODES:
+            log.debug("%s_send_code: pipelined acquisition now stale", prefix)
+            self.pipelined_acquire_stale = True
+
         if self._check_for_random_error():
             return SpectrometerResponse(poison_pill=False)
 
+        profiler = self.opcode_profiler
+        start = profiler.start() if profiler is not None else None
+
         retry_count = 0
         while True:
             try:
@@ -773,13 +784,18 @@ class FeatureIdentificationDevice(InterfaceDevice):
                                                         data_or_wLength) # add TIMEOUT_MS parameter?
             except Exception as exc:
                 log.critical("Hardware Failure FID Send Code Problem with ctrl transfer", exc_info=1)
+                self.register_cache.forget_write(bRequest, wValue)
+                if profiler is not None:
+                    profiler.record(bRequest, wValue, label, start, error=True, retries=retry_count)
                 self._schedule_disconnect(exc)
                 return SpectrometerResponse(poison_pill=True)
 
-            log.debug("%s_send_code: request 0x%02x value 0x%04x index 0x%04x data/len %s: result %s",
-                prefix, bRequest, wValue, wIndex, data_or_wLength, result)
+            trace(EV_SEND_CODE_RESULT, bRequest, result if isinstance(result, int) else -1, retry_count)
 
             if not retry_on_error:
+                if profiler is not None:
+                    profiler.record(bRequest, wValue, label, start)
+                self.register_cache.record_write(bRequest, wValue, wIndex, data_or_wLength)
                 return SpectrometerResponse(keep_alive=True)
 
             # retry logic enabled, so compare result to expected
@@ -793,12 +809,18 @@ class FeatureIdentificationDevice(InterfaceDevice):
                         break
 
             if matched_expected:
+                if profiler is not None:
+                    profiler.record(bRequest, wValue, label, start, retries=retry_count)
+                self.register_cache.record_write(bRequest, wValue, wIndex, data_or_wLength)
                 return SpectrometerResponse(keep_alive=True)
 
             # apparently it didn't match expected
             retry_count += 1
             if retry_count > self.retry_max:
                 log.error("giving up after %d retries", retry_count)
+                self.register_cache.forget_write(bRequest, wValue)
+                if profiler is not None:
+                    profiler.record(bRequest, wValue, label, start, error=True, retries=retry_count - 1)
                 return SpectrometerResponse(poison_pill=True)
 
             # try again
@@ -815,7 +837,6 @@ class FeatureIdentificationDevice(InterfaceDevice):
                   label: str = "", 
                   msb_len: int = None, 
                   lsb_len: int = None) -> SpectrometerResponse:
-        prefix = "" if not label else ("%s: " % label)
         result = None
 
         if self.shutdown_requested or (not self.connected and not self.connecting):
@@ -826,28 +847,39 @@ class FeatureIdentificationDevice(InterfaceDevice):
             log.debug("random error")
             return SpectrometerResponse(poison_pill=True)
 
-        try:
-            self._wait_for_usb_available()
-            log.debug("%s_get_code: request 0x%02x value 0x%04x index 0x%04x length %d", prefix, bRequest, wValue, wIndex, wLength)
-            result = self.device_type.ctrl_transfer(self.device,
-                                               0xc0,        # DEVICE_TO_HOST
-                                               bRequest,
-                                               wValue,
-                                               wIndex,
-                                               wLength)     # add TIMEOUT_MS?
-        except Exception as exc:
-            log.critical(f"Hardware Failure FID Get Code Problem with ctrl transfer (bRequest 0x{bRequest:02x}, wValue 0x{wValue:04x}, wIndex 0x{wIndex:04x}, label {label})", exc_info=1)
-            self._schedule_disconnect(exc)
-            return SpectrometerResponse(poison_pill=True)
+        result = self.register_cache.get(bRequest, wValue, wIndex)
+        if result is not None:
+            trace(EV_GET_CODE_CACHED, bRequest, wValue, wIndex)
+        else:
+            profiler = self.opcode_profiler
+            start = profiler.start() if profiler is not None else None
+            try:
+                self._wait_for_usb_available()
+                trace(EV_GET_CODE, bRequest, wValue, wIndex)
+                result = self.device_type.ctrl_transfer(self.device,
+                                                   0xc0,        # DEVICE_TO_HOST
+                                                   bRequest,
+                                                   wValue,
+                                                   wIndex,
+                                                   wLength)     # add TIMEOUT_MS?
+            except Exception as exc:
+                log.critical(f"Hardware Failure FID Get Code Problem with ctrl transfer (bRequest 0x{bRequest:02x}, wValue 0x{wValue:04x}, wIndex 0x{wIndex:04x}, label {label})", exc_info=1)
+                if profiler is not None:
+                    profiler.record(bRequest, wValue, label, start, error=True)
+                self._schedule_disconnect(exc)
+                return SpectrometerResponse(poison_pill=True)
 
-        result_hex = " ".join([f"{v:02x}" for v in result])
-        log.debug("%s_get_code: request 0x%02x value 0x%04x index 0x%04x length %d = [%s]",
-            prefix, bRequest, wValue, wIndex, wLength, result_hex)
+            if profiler is not None:
+                profiler.record(bRequest, wValue, label, start, error=result is None)
 
-        if result is None:
-            log.critical("_get_code[%s, %s]: received null", label, self.device_id)
-            self._schedule_disconnect(f"_get_code[{label}] received NULL")
-            return SpectrometerResponse(keep_alive=True)
+            if result is None:
+                log.critical("_get_code[%s, %s]: received null", label, self.device_id)
+                self._schedule_disconnect(f"_get_code[{label}] received NULL")
+                return SpectrometerResponse(keep_alive=True)
+
+            trace(EV_GET_CODE_RESULT, bRequest, len(result), int.from_bytes(bytes(result[:4]), "big"))
+
+            self.register_cache.put(bRequest, wValue, wIndex, result)
 
         # demarshall or return raw array
         value = 0
@@ -940,16 +972,14 @@ class FeatureIdentificationDevice(InterfaceDevice):
         return self.get_upper_code(0x14, wIndex=reg, label="GET_BATTERY_REG", msb_len=2)
 
     def get_battery_state_raw(self):
-        """Retrieves the raw battery reading and then caches it for 1 sec"""
-        now = datetime.datetime.now()
-        if self.settings.state.battery_timestamp is None or \
-                self.settings.state.battery_raw is None or \
-                (now - self.settings.state.battery_timestamp).total_seconds() > 1:
-            self.settings.state.battery_timestamp = now
-            response = self.get_upper_code(0x13, label="GET_BATTERY_STATE", msb_len=3)
-            self.settings.state.battery_raw = response.data
-            log.debug(f"battery_state_raw: 0x{self.settings.state.battery_raw:06x}")
+        """Retrieves the raw battery reading (cached for 1 sec by RegisterCache)"""
+        response = self.get_upper_code(0x13, label="GET_BATTERY_STATE", msb_len=3)
+        if response.data is None:
+            return response
 
+        self.settings.state.battery_timestamp = datetime.datetime.now()
+        self.settings.state.battery_raw = response.data
+        log.debug(f"battery_state_raw: 0x{self.settings.state.battery_raw:06x}")
         return SpectrometerResponse(data=self.settings.state.battery_raw)
 
     def get_battery_percentage(self):
@@ -1000,6 +1030,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
     def set_detector_offset(self, value: int):
         word = utils.clamp_to_int16(value)
         self.settings.eeprom.detector_offset = word
+        self.invalidate_processing_plan()
         # log.debug("value %d (%s) = 0x%04x (%s)", value, format(value, 'b'), word, format(word, 'b'))
         return self._send_code(0xb6, word, label="SET_DETECTOR_OFFSET")
 
@@ -1010,6 +1041,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         word = utils.clamp_to_int16(value)
         self.settings.eeprom.detector_offset_odd = word
+        self.invalidate_processing_plan()
 
         return self._send_code(0x9c, word, label="SET_DETECTOR_OFFSET_ODD")
 
@@ -1040,6 +1072,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         if update_session_eeprom:
             self.settings.eeprom.detector_gain = gain
+            self.invalidate_processing_plan()
 
         if self.settings.is_micro():
             self.settings.state.gain_db = gain
@@ -1063,6 +1096,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
             gain, raw, self.settings.eeprom.detector_gain_odd))
         if update_session_eeprom:
             self.settings.eeprom.detector_gain_odd = gain
+            self.invalidate_processing_plan()
         return SpectrometerResponse(data=gain)
 
     ##
@@ -1102,6 +1136,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         self.require_throwaway(gain != self.settings.eeprom.detector_gain)
         self.settings.eeprom.detector_gain = gain
+        self.invalidate_processing_plan()
 
         if self.settings.is_xs():
             # self.queue_message("marquee_info", "sensor is stabilizing (gain)")
@@ -1119,6 +1154,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
         # MZ: note that we SEND gain MSB-LSB, but we READ gain LSB-MSB?!
         log.debug("Send Detector Gain Odd: 0x%04x (%s)", raw, gain)
         self.settings.eeprom.detector_gain_odd = gain
+        self.invalidate_processing_plan()
         return self._send_code(0x9d, raw, label="SET_DETECTOR_GAIN_ODD")
 
     def set_detector_timeout_sec(self, sec):
@@ -1145,6 +1181,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         value = 1 if flag else 0
         self.settings.state.area_scan_enabled = flag
+        self.invalidate_processing_plan()
         self.settings.state.area_scan_first_trigger_sent = False
         result = self._send_code(0xeb, value, label="SET_AREA_SCAN_ENABLE")
 
@@ -1273,56 +1310,57 @@ class FeatureIdentificationDevice(InterfaceDevice):
         self.settings.ble_firmware_version = s
         return SpectrometerResponse(data=s)
 
-    def apply_edc(self, spectrum):
-        """
-        Use optically black pixels for electrical dark correction (EDC).
-
-        @par IMX385LQR-C datasheet (p8)
-
-        @verbatim
-        Pixels    Count Description
-        0-3       4     OB side ignored area                <-- using this
-        4-7       4     Effective pixel side ignored area
-        8-15      8     Effective margin for color processing
-        16-1935   1920  Recording pixel area
-        1936-1944 9     Effective margin for color processing
-        1945-1948 4     Effective pixel side ignored area
-        1949-1951 3     Dummy
-        @endverbatim
-
-        @note that this is called BEFORE horizontal binning, so should still work
-              even with BIN_4X2
-
-        @todo we might want to make buffer length configurable, either in spectra
-              or by time (consider 10ms vs 1sec integration time)
-        """            
-        if not self.settings.state.edc_enabled:
-            return spectrum
-
-        if not self.settings.is_imx():
-            return spectrum
+    def get_line(self, trigger=True, auto_raman_params=None):
+        """ legacy alias """
+        return self.get_spectrum(trigger, auto_raman_params)
 
-        if len(spectrum) != 1952:
-            log.error("IMX EDC hard-coded to expect 1952px")
-            return spectrum
+    def generate_timeout_ms(self, auto_raman=False):
+        """
+        How long to wait on the bulk endpoint(s) for the current acquisition.
+
+        Normally this is a high quantile of the acquire-to-data latency 
+        actually observed at the current integration time and onboard 
+        averaging (plus margin), so a hung spectrometer is noticed within a 
+        few multiples of a normal acquisition.  Until enough spectra have been
+        read at these settings (and whenever timing is out of our hands, e.g.
+        external triggering, area scan, Auto-Raman or an XS sensor which may
+        have gone to sleep), fall back to the conservative 
+        generate_fallback_timeout_ms.
+
+        @param auto_raman (Input) whether the read follows ACQUIRE_AUTO_RAMAN
+        """
+        timeout_ms = None if auto_raman else self._generate_adaptive_timeout_ms()
+        if timeout_ms is None:
+            timeout_ms = self.generate_fallback_timeout_ms()
+        return timeout_ms
 
-        # this averages electrical dark over SPACE
-        dark_pixels = spectrum[0:4]
-        avg_dark = round(sum(dark_pixels) / len(dark_pixels), 2)
+    def _latency_key(self):
+        max_integ_ms = max(self.settings.state.integration_time_ms, self.settings.state.prev_integration_time_ms)
+        onboard_scans = self.settings.state.onboard_scans_to_average if self.settings.state.onboard_averaging else 1
+        return (max_integ_ms, onboard_scans)
 
-        return [ v - avg_dark for v in spectrum ]
+    def _generate_adaptive_timeout_ms(self):
+        state = self.settings.state
+        if not state.adaptive_timeout_enabled or not self.has_received_spectrum:
+            return None
+        if state.trigger_source != SpectrometerState.TRIGGER_SOURCE_INTERNAL or state.area_scan_enabled:
+            return None
+        if self.settings.is_xs() and (self.last_read_complete is None or monotonic() - self.last_read_complete > XS_IDLE_SLEEP_SEC):
+            return None # sensor may need to wake up
 
-    def get_line(self, trigger=True, auto_raman_params=None):
-        """ legacy alias """
-        return self.get_spectrum(trigger, auto_raman_params)
+        latency_ms = self.latency_window.quantile(self._latency_key(), ADAPTIVE_TIMEOUT_QUANTILE)
+        if latency_ms is None:
+            return None
+        return int(latency_ms * ADAPTIVE_TIMEOUT_SCALE + ADAPTIVE_TIMEOUT_MARGIN_MS)
 
-    def generate_timeout_ms(self):
+    def generate_fallback_timeout_ms(self):
+        """ worst-case timeout used before any latency has been observed """
         max_integ_ms = max(self.settings.state.integration_time_ms, self.settings.state.prev_integration_time_ms)
         if self.settings.is_xs():
             # we have no idea if Series-XS has to "wake up" the sensor, so wait
             # long enough for 20ms + 8 throwaway frames if need be (IMX385 datasheet p69)
             if self.settings.state.onboard_averaging:
-                timeout_ms = max_integ_ms * (self.settings.state.scans_to_average + 7) + 500 * self.settings.num_connected_devices + 20
+                timeout_ms = max_integ_ms * (self.settings.state.onboard_scans_to_average + 7) + 500 * self.settings.num_connected_devices + 20
             else:
                 timeout_ms = max_integ_ms * 8 + 500 * self.settings.num_connected_devices + 20
             if not self.has_received_spectrum:
@@ -1331,7 +1369,9 @@ class FeatureIdentificationDevice(InterfaceDevice):
             # kludge while testing Auto-Raman oddities
             timeout_ms *= 5
         else:
-            timeout_ms = max_integ_ms * 2 + 1_000 * self.settings.num_connected_devices
+            # one integration per onboard-averaged scan, plus the usual margin
+            onboard_scans = self.settings.state.onboard_scans_to_average if self.settings.state.onboard_averaging else 1
+            timeout_ms = max_integ_ms * (onboard_scans + 1) + 1_000 * self.settings.num_connected_devices
         return int(timeout_ms)
 
     def get_spectrum(self, trigger=True, auto_raman_params=None):
@@ -1370,7 +1410,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
         # main use-case for NOT sending a trigger would be when reading
         # subsequent lines of data from area scan "fast" mode
 
-        acquisition_timestamp = datetime.datetime.now()
+        acquisition_start_ns = monotonic_ns()
 
         # should we send a trigger?
         if self.settings.state.trigger_source != SpectrometerState.TRIGGER_SOURCE_INTERNAL:
@@ -1383,9 +1423,21 @@ class FeatureIdentificationDevice(InterfaceDevice):
                 log.debug("get_spectrum: skipping trigger during area scan")
                 trigger = False
 
+        # Pipelining only applies to plain internally-triggered acquisitions.
+        # If an ACQUIRE is already in flight from a previous call, use it unless
+        # it was invalidated by a subsequent setting change (or we're no longer
+        # pipelining), in which case its spectrum must be read and discarded.
+        pipelined = trigger and not auto_raman_params and self.settings.state.pipelined_trigger_enabled
+        if self.pipelined_acquire_pending:
+            if pipelined and not self.pipelined_acquire_stale:
+                trace(EV_ACQUIRE, 0xad, 1)
+                trigger = False
+            else:
+                self._drain_pipelined_acquire()
+
         if trigger:
             # send an internal SW trigger
-            log.debug("get_spectrum: requesting spectrum")
+            trace(EV_ACQUIRE, 0xfd if auto_raman_params else 0xad, 0)
 
             # should that trigger be an ACQUIRE or ACQUIRE_AUTO_RAMAN?
             if auto_raman_params:
@@ -1393,6 +1445,24 @@ class FeatureIdentificationDevice(InterfaceDevice):
             else:
                 self._send_code(0xad, label="ACQUIRE_SPECTRUM")
 
+        # only time spectra whose ACQUIRE we sent (a pipelined one keeps its own time)
+        if trigger and not auto_raman_params:
+            self.acquire_sent_time = monotonic()
+        elif not self.pipelined_acquire_pending:
+            self.acquire_sent_time = None
+
+        # whatever ACQUIRE is in flight is consumed by the read below, whether
+        # or not that read succeeds (else a failed read would leave every
+        # later call waiting on a pipelined ACQUIRE which was never re-sent)
+        self.pipelined_acquire_pending = False
+
+        # a pipelined ACQUIRE's latency includes the caller's own delay, so 
+        # only sample reads immediately following their ACQUIRE
+        sample_latency = trigger and not auto_raman_params and not self.settings.state.area_scan_enabled
+
+        marks = self.latency_marks = LatencyMarks()
+        marks.trigger_sent = self.acquire_sent_time
+
         ########################################################################
         # prepare to read spectrum
         ########################################################################
@@ -1419,7 +1489,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
             endpoints = [0x82, 0x86]
             block_len_bytes = 2048 # 1024 pixels apiece from two endpoints
 
-        timeout_ms = self.generate_timeout_ms()
+        timeout_ms = self.generate_timeout_ms(auto_raman=bool(auto_raman_params))
 
         self._wait_for_usb_available()
 
@@ -1427,73 +1497,73 @@ class FeatureIdentificationDevice(InterfaceDevice):
         # read the data from bulk endpoint(s)
         ########################################################################
 
-        spectrum = []
-        errors = 0
-        for endpoint in endpoints:
-            data = None
-            while data is None:
-                try:
-                    log.debug("waiting for %d bytes (timeout %s ms)", block_len_bytes, timeout_ms)
-                    data = self.device_type.read(self.device, endpoint, block_len_bytes, timeout=timeout_ms)
-                    log.debug("read %d bytes", len(data))
-                except Exception as exc:
-                    if self.device_type is None:
-                        log.error(f"No device_type")
-                        response.error_msg = f"Encountered error on read"
-                        response.error_lvl = ErrorLevel.high
-                        response.poison_pill = True # unrecoverable
-                        return response
-                    elif self.settings.state.trigger_source == SpectrometerState.TRIGGER_SOURCE_EXTERNAL or auto_raman_params:
-                        # we don't know how long we'll have to wait for the response, so
-                        # just loop and hope
-                        # log.debug("still waiting for spectrum")
-                        pass
-                    else:
-                        errors += 1
-                        log.error(f"Encountered error {errors} on read of {exc}", exc_info=1)
-
-                        # Don't loop on errors on XS, so we can experimentally 
-                        # use an XS board as a detector-less laser/TEC driver 
-                        # board. 
-                        if not self.settings.has_detector():
-                            pass
-                        elif errors < 3:
-                            log.error(f"ignoring error number {errors}")
-                        else:
-                            response.error_msg = "Encountered error on read"
-                            response.error_lvl = ErrorLevel.high
-                            return response
-
-            # This is a convoluted way to iterate across the received bytes in 'data' as
-            # two interleaved arrays, both only processing alternating bytes, but one (i)
-            # starting at zero (even bytes) and the other (j) starting at 1 (odd bytes).
-            subspectrum = [int(i | (j << 8)) for i, j in zip(data[::2], data[1::2])] # LSB-MSB
-
-            spectrum.extend(subspectrum)
-
-            # empirically determined need for 5ms delay when switching endpoints
-            # on 2048px detectors during area scan
-            if self.settings.state.area_scan_enabled and pixels == 2048: # and endpoint == 0x82:
-                log.debug("sleeping 5ms between endpoints")
-                sleep(0.005)
+        # each endpoint is read directly into a preallocated buffer
+        slot = self._get_spectrum_ring(endpoints, block_len_bytes).next_slot()
+        self.spectrum_read_errors = 0
+
+        if len(endpoints) > 1 and self.settings.state.concurrent_endpoint_reads_enabled:
+            # keep both transfers outstanding at once, rather than waiting a full
+            # round-trip on 0x82 before even requesting 0x86
+            results = self._read_endpoint_pair(
+                lambda: self._read_endpoint_into(endpoints[0], slot.buffers[0], block_len_bytes, timeout_ms, auto_raman_params),
+                lambda: self._read_endpoint_into(endpoints[1], slot.buffers[1], block_len_bytes, timeout_ms, auto_raman_params, interruptible=False),
+                first_failed = lambda result: result[1] is not None)
+        else:
+            results = []
+            for ep_index, endpoint in enumerate(endpoints):
+                results.append(self._read_endpoint_into(endpoint, slot.buffers[ep_index], block_len_bytes, timeout_ms, auto_raman_params))
+                if results[-1][1] is not None:
+                    break
+
+                # empirically determined need for 5ms delay when switching endpoints
+                # on 2048px detectors during area scan
+                if self.settings.state.area_scan_enabled and pixels == 2048: # and endpoint == 0x82:
+                    log.debug("sleeping 5ms between endpoints")
+                    sleep(0.005)
+
+        for ep_index, (bytes_read, error_response) in enumerate(results):
+            if error_response is not None:
+                # distrust what we've learned until these settings prove reliable again
+                self.latency_window.clear(self._latency_key())
+                self.acquire_sent_time = None
+                return error_response
+            slot.bytes_read[ep_index] = bytes_read
+
+        marks.mark("read_complete")
+        self.last_read_complete = monotonic()
+        if sample_latency:
+            self.latency_window.add(self._latency_key(), (marks.read_complete - self.acquire_sent_time) * 1000)
+
+        self.metric_spectra_acquired.inc()
+        self.metric_acquisition_rate_hz.tick()
 
         # received a response, so decrement throwaways
+        if self.remaining_throwaways > 0:
+            self.metric_throwaways_consumed.inc()
         self.remaining_throwaways = max(0, self.remaining_throwaways - 1)
 
+        # The bulk endpoint is now free, so start integrating the NEXT spectrum
+        # while we post-process this one (and our caller reads metadata, builds
+        # the Reading etc).
+        if pipelined:
+            self.pipelined_acquire_stale = False
+            self._send_code(0xad, label="ACQUIRE_SPECTRUM (pipelined)")
+            self.acquire_sent_time = monotonic()
+            self.pipelined_acquire_pending = True
+
+        # demarshal the little-endian uint16 (LSB-MSB) pixels from all 
+        # endpoints into a new float64 spectrum for post-processing
+        spectrum = slot.to_spectrum()
+
         ########################################################################
         # error-check the received spectrum
         ########################################################################
 
-        log.debug("get_spectrum: completed in %d ms (vs integration time %d ms)",
-            round((datetime.datetime.now() - acquisition_timestamp).total_seconds() * 1000, 0),
-            self.settings.state.integration_time_ms)
-
-        log.debug("get_spectrum: pixels %d, endpoints %s, block %d, spectrum %s ...",
-            len(spectrum), endpoints, block_len_bytes, spectrum[0:9])
+        trace(EV_SPECTRUM, len(spectrum), (monotonic_ns() - acquisition_start_ns) // 1000, self.settings.state.integration_time_ms)
 
-        if len(spectrum) != pixels:
-            log.error("get_spectrum read wrong number of pixels (expected %d, read %d)", pixels, len(spectrum))
-            response.error_msg = f"get_spectrum read wrong number of pixels (expected {pixels}, read {len(spectrum)})"
+        if slot.pixels_read() != pixels:
+            log.error("get_spectrum read wrong number of pixels (expected %d, read %d)", pixels, slot.pixels_read())
+            response.error_msg = f"get_spectrum read wrong number of pixels (expected {pixels}, read {slot.pixels_read()})"
             response.error_lvl = ErrorLevel.low
             response.keep_alive = True
             return response
@@ -1511,18 +1581,6 @@ class FeatureIdentificationDevice(InterfaceDevice):
         self.settings.state.prev_integration_time_ms = self.settings.state.integration_time_ms
         self.has_received_spectrum = True
 
-        ########################################################################
-        # Apply InGaAs even/odd gain/offset in software
-        ########################################################################
-
-        # (before x-axis inversion because this is where FPGA will do it)
-
-        # this should be done in the FPGA, but older FW didn't have that
-        # implemented, so fix in SW unless EEPROM indicates "already handled"
-        if self.settings.is_ingaas():
-            if not self.settings.eeprom.hardware_even_odd:
-                self._correct_ingaas_gain_and_offset(spectrum)
-
         ########################################################################
         # Area Scan (rare)
         ########################################################################
@@ -1531,158 +1589,273 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         # If we're in area scan mode, use SECOND pixel as row index (leave pixel 
         # in spectrum).  Do this before any horizontal averaging which might 
-        # corrupt first pixel).
+        # corrupt first pixel).  (InGaAs even/odd correction, which would affect
+        # pixel 1, is inapplicable as area scan isn't supported on InGaAs.)
         area_scan_row_count = -1
         if self.settings.state.area_scan_enabled:
             if spectrum[0] == 0xffff:
-                area_scan_row_count = spectrum[1] 
+                area_scan_row_count = int(spectrum[1])
             else:
-                log.error("first pixel of area scan expected to be 0xffff, read 0x{spectrum[0]:04x}")
+                log.error(f"first pixel of area scan expected to be 0xffff, read 0x{int(spectrum[0]):04x}")
 
         ########################################################################
-        # Stomp array ends
+        # Apply the compiled order of operations
         ########################################################################
 
-        # (before x-axis inversion because optically masked pixels are physical)
+        # InGaAs even/odd, stomping array ends, EDC, x-axis inversion, flat 
+        # spectrum rejection, bad pixel correction, linear pixel calibration, 
+        # horizontal binning and graph-alternating pixels (see ProcessingPlan)
+        spectrum = self._get_processing_plan(len(spectrum)).apply(spectrum)
+        if spectrum is None:
+            response.error_msg = "skipping flat spectrum"
+            response.error_lvl = ErrorLevel.low
+            response.keep_alive = True
+            log.debug(response.error_msg)
+            self.queue_message("marquee_info", "sensor is stabilizing")
+            return response
 
-        # some detectors have "garbage" pixels at the front or end of every
-        # spectrum (sync bytes and what-not)
-        if not self.settings.state.area_scan_enabled:
-            if self.settings.is_imx385() and self.settings.fpga_firmware_version == "01.1.01":
-                utils.stomp_first(spectrum, 3)
-                utils.stomp_last (spectrum, 2)
-            if self.settings.is_imx392() and self.settings.state.detector_regions is None:
-                utils.stomp_first(spectrum, 3)
-                utils.stomp_last (spectrum, 17)
+        # Somewhat oddly, we're currently returning a TUPLE of the spectrum and
+        # the area scan row count.  
+        # (no need to copy, as nothing else references the new spectrum)
+        marks.mark("processed")
+        response.data = SpectrumAndRow(spectrum, area_scan_row_count, copy=False, marks=marks) 
+        return response
 
-        ########################################################################
-        # Electrical Dark Correction (EDC, experimental)
-        ########################################################################
+    def get_register_cache_stats(self):
+        """ @returns dict of RegisterCache hits, misses etc """
+        return SpectrometerResponse(data=self.register_cache.get_stats())
 
-        if not self.settings.state.area_scan_enabled:
-            spectrum = self.apply_edc(spectrum)
+    def get_timeout_stats(self):
+        """ @returns dict of (integration_time_ms, onboard_scans) -> (count, p50 ms, p99 ms) """
+        return SpectrometerResponse(data=self.latency_window.get_stats())
 
-        ########################################################################
-        # Invert X-Axis
-        ########################################################################
+    def set_adaptive_timeout_enable(self, flag):
+        self.settings.state.adaptive_timeout_enabled = flag
+        self.latency_window.clear()
+        return SpectrometerResponse(True)
 
-        # For benches where the detector is essentially rotated 180-deg from our
-        # typical orientation with regard to the grating (e.g. InGaAs OEM
-        # benches, where red wavelengths are diffracted toward pixel 0, and blue
-        # wavelengths toward pixel 511).
-        #
-        # Note this simply performs a horizontal FLIP (mirror) of the vertically-
-        # binned 1-D spectra, and is NOT sufficient to perform a genuine 180-
-        # degree rotation of 2-D imaging mode; if "authentic" area scan is
-        # desired, the caller would likewise need to reverse the display order of
-        # the rows.
-        #
-        #           It is VITALLY IMPORTANT that all drivers agree
-        #            on when to perform X-Axis inversion in the
-        #                        Order of Operations.
-        #
-        if not self.settings.state.area_scan_enabled:
-            if self.settings.eeprom.invert_x_axis:
-                spectrum.reverse()
+    def set_opcode_profiler_enable(self, flag, sample_every=1):
+        """ start (or stop) timing every control transfer (see OpcodeProfiler) """
+        if not flag:
+            self.opcode_profiler = None
+        elif self.opcode_profiler is None:
+            self.opcode_profiler = OpcodeProfiler(sample_every)
+        else:
+            self.opcode_profiler.sample_every = max(1, int(sample_every))
+        return SpectrometerResponse(True)
 
-        ########################################################################
-        # ignore isolated "flat" spectra on SiG
-        ########################################################################
+    def reset_opcode_profiler(self):
+        if self.opcode_profiler is not None:
+            self.opcode_profiler.reset()
+        return SpectrometerResponse(True)
 
-        if not self.settings.state.area_scan_enabled:
-            if self.settings.is_micro() and utils.all_same(spectrum):
-                response.error_msg = "skipping flat spectrum"
-                response.error_lvl = ErrorLevel.low
-                response.keep_alive = True
-                log.debug(response.error_msg)
-                self.queue_message("marquee_info", "sensor is stabilizing")
-                return response
+    def get_opcode_profile(self):
+        """ @returns list of per-opcode dicts (see OpcodeProfiler.get_stats), or None if disabled """
+        if self.opcode_profiler is None:
+            return SpectrometerResponse(data=None)
+        return SpectrometerResponse(data=self.opcode_profiler.get_stats())
 
-        ########################################################################
-        # Bad Pixel Correction
-        ########################################################################
+    def set_register_cache_enable(self, flag):
+        self.register_cache.enabled = flag
+        self.register_cache.clear()
+        return SpectrometerResponse(True)
 
-        # Note these are pre-horizontal binning...
-        if not self.settings.state.area_scan_enabled:
-            if self.settings.state.bad_pixel_mode == SpectrometerState.BAD_PIXEL_MODE_AVERAGE:
-                self._correct_bad_pixels(spectrum)
+    def set_write_suppression_enable(self, flag):
+        """ skip _send_code writes which would re-send an unchanged value """
+        self.register_cache.suppress_writes = flag
+        self.register_cache.last_written = {}
+        return SpectrometerResponse(True)
 
-        ########################################################################
-        # Linear Pixel Calibration (experimental)
-        ########################################################################
+    def set_force_next_write(self, flag=True):
+        """
+        Send the next suppressible write (see RegisterCache.SUPPRESSIBLE_WRITES)
+        even if it repeats the value last written, e.g. to re-assert a setting 
+        which may have been changed behind our back.  Direct callers can 
+        instead pass force=True to _send_code.
+        """
+        self.force_next_write = flag
+        return SpectrometerResponse(True)
 
-        # should be done AFTER detector inversion (because that's how calibration
-        # is generated) and AFTER bad pixel correction
+    def set_pipelined_trigger_enable(self, flag):
+        """
+        When enabled (and using internal triggering), get_spectrum sends the 
+        NEXT ACQUIRE as soon as the current spectrum has been read from the
+        bulk endpoint, so that the sensor integrates while the host performs
+        post-processing, metadata reads, Reading construction and queueing.
+
+        Any setting change which could affect the spectrum in flight (i.e. any
+        opcode not in PIPELINE_SAFE_OPCODES) marks it stale, and it will be 
+        read and discarded by the next get_spectrum before re-triggering.
+        """
+        self.settings.state.pipelined_trigger_enabled = flag
+        log.debug(f"pipelined trigger {'enabled' if flag else 'disabled'}")
+        if not flag and self.pipelined_acquire_pending:
+            self._drain_pipelined_acquire()
+        return SpectrometerResponse(True)
 
-        if not self.settings.state.area_scan_enabled:
-            if self.settings.linear_pixel_calibration:
-                spectrum = self._apply_linear_pixel_calibration(spectrum)
+    def _drain_pipelined_acquire(self):
+        """ read and discard the spectrum from an unwanted in-flight ACQUIRE """
+        log.debug("discarding pipelined acquisition")
+        self.pipelined_acquire_pending = False
+        self.pipelined_acquire_stale = False
 
-        ########################################################################
-        # horizontal binning
-        ########################################################################
+        pixels = self.settings.pixels()
+        endpoints = [0x82]
+        block_len_bytes = pixels * 2
+        if pixels == 2048 and not self.settings.is_arm():
+            endpoints = [0x82, 0x86]
+            block_len_bytes = 2048
 
-        spectrum = self._apply_horizontal_binning(spectrum)
+        slot = self._get_spectrum_ring(endpoints, block_len_bytes).next_slot()
+        timeout_ms = self.generate_timeout_ms()
+        for ep_index, endpoint in enumerate(endpoints):
+            try:
+                self.device_type.read_into(self.device, endpoint, slot.buffers[ep_index], timeout=timeout_ms)
+            except Exception as exc:
+                log.debug(f"_drain_pipelined_acquire: ignoring {exc}")
+                return
 
-        # * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * 
-        # Note: len(spectrum) may no longer == eeprom.actual_pixels_horizontal!
-        # * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * 
+    def _read_endpoint_into(self, endpoint, buffer, block_len_bytes, timeout_ms, auto_raman_params=None, interruptible=True):
+        """
+        Read one bulk endpoint into a preallocated buffer, retrying as 
+        appropriate for the current triggering mode.
 
-        ########################################################################
-        # Graph Alternating Pixels
-        ########################################################################
+        @param interruptible (Input) whether priority commands may be applied
+               between timeouts (only from the acquisition thread)
 
-        # When integrating new sensors, or testing "interleaved" detectors like
-        # the InGaAs, sometimes we want to only look at "every other" pixel to
-        # flatten-out irregularities in Bayer filters or photodiode arrays.
-        # However, we don't want to disrupt the expected pixel-count, so just
-        # average-over the skipped pixels.
-        #
-        # Not important enough to update for DetectorRegions
-        if self.settings.state.graph_alternating_pixels:
-            log.debug("applying graph_alternating_pixels")
-            smoothed = []
-            for i in range(len(spectrum)):
-                if i % 2 == 0:
-                    smoothed.append(spectrum[i])
+        Read errors are counted per spectrum (self.spectrum_read_errors) rather
+        than per endpoint, so the error threshold trips at the same rate 
+        whether or not the endpoints are read concurrently.
+
+        If the trigger source is changed while we wait (e.g. by a priority
+        command applied between timeouts), the wait is abandoned with a 
+        keep-alive rather than an error, as the pending acquisition may 
+        never arrive.
+
+        @returns tuple of (bytes_read, None) on success, or (None, SpectrometerResponse)
+                 on unrecoverable error
+        """
+        trigger_source = self.settings.state.trigger_source
+        while True:
+            try:
+                trace(EV_READ_WAIT, endpoint, block_len_bytes, timeout_ms)
+                bytes_read = self.device_type.read_into(self.device, endpoint, buffer, timeout=timeout_ms)
+                trace(EV_READ_DONE, endpoint, bytes_read)
+                marks = self.latency_marks
+                if marks is not None and marks.first_byte is None:
+                    marks.mark("first_byte")
+                return (bytes_read, None)
+            except Exception as exc:
+                if self.device_type is None:
+                    log.error(f"No device_type")
+                    response = SpectrometerResponse()
+                    response.error_msg = f"Encountered error on read"
+                    response.error_lvl = ErrorLevel.high
+                    response.poison_pill = True # unrecoverable
+                    return (None, response)
+                elif self.settings.state.trigger_source != trigger_source:
+                    log.debug(f"_read_endpoint_into: abandoning wait on 0x{endpoint:02x} after trigger source changed")
+                    return (None, SpectrometerResponse(keep_alive=True))
+                elif self.settings.state.trigger_source == SpectrometerState.TRIGGER_SOURCE_EXTERNAL or auto_raman_params:
+                    # we don't know how long we'll have to wait for the response, so
+                    # just loop and hope (but let laser/trigger commands through)
+                    # log.debug("still waiting for spectrum")
+                    if interruptible and self.check_priority_commands():
+                        log.debug("_read_endpoint_into: abandoning wait per shutdown request")
+                        return (None, SpectrometerResponse(keep_alive=True))
+                    elif not interruptible and self.endpoint_pair_cancelled:
+                        log.debug(f"_read_endpoint_into: abandoning wait on 0x{endpoint:02x}")
+                        return (None, SpectrometerResponse(keep_alive=True))
                 else:
-                    if i + 1 < len(spectrum):
-                        averaged = (spectrum[i-1] + spectrum[i+1]) / 2.0
+                    with self.spectrum_read_errors_lock:
+                        self.spectrum_read_errors += 1
+                        errors = self.spectrum_read_errors
+                    self.metric_bulk_read_timeouts.inc()
+                    trace(EV_READ_ERROR, endpoint, errors)
+                    log.error(f"Encountered error {errors} on read of {exc}", exc_info=1)
+
+                    # Don't loop on errors on XS, so we can experimentally 
+                    # use an XS board as a detector-less laser/TEC driver 
+                    # board. 
+                    if not self.settings.has_detector():
+                        pass
+                    elif errors < 3:
+                        log.error(f"ignoring error number {errors}")
                     else:
-                        averaged = spectrum[i - 1]
-                    smoothed.append(averaged)
-            spectrum = smoothed
+                        response = SpectrometerResponse()
+                        response.error_msg = "Encountered error on read"
+                        response.error_lvl = ErrorLevel.high
+                        return (None, response)
 
-        # Somewhat oddly, we're currently returning a TUPLE of the spectrum and
-        # the area scan row count.  
-        response.data = SpectrumAndRow(spectrum, area_scan_row_count) 
-        return response
+    def _read_endpoint_pair(self, read_first, read_second, first_failed=None):
+        """
+        On 2048-pixel FX2 detectors, the spectrum is split across endpoints 0x82
+        and 0x86. Run the second read on a persistent helper thread while the
+        first proceeds on the calling thread, so both transfers are pending on
+        the bus at once. Each read targets its own buffer, so the halves are
+        reassembled by endpoint regardless of completion order.
+
+        @param first_failed (Input) optional predicate on read_first's result;
+               if the first read fails, a second read still waiting on an 
+               external trigger is abandoned
+        @returns [ read_first(), read_second() ]
+        """
+        if self.endpoint_reader is None:
+            self.endpoint_reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FID.endpoint_reader")
+
+        self.endpoint_pair_cancelled = False
+        future = self.endpoint_reader.submit(read_second)
+        first = None
+        try:
+            first = read_first()
+        finally:
+            if first is None or (first_failed is not None and first_failed(first)):
+                self.endpoint_pair_cancelled = True
+
+            # never return (or raise) while the helper still owns a buffer
+            second = future.result()
+        return [ first, second ]
+
+    def set_concurrent_endpoint_reads_enable(self, flag):
+        self.settings.state.concurrent_endpoint_reads_enabled = flag
+        return SpectrometerResponse(True)
+
+    def _get_spectrum_ring(self, endpoints, block_len_bytes):
+        """ (re)allocate the bulk-read ring whenever the endpoint layout changes """
+        if self.spectrum_ring is None or not self.spectrum_ring.matches(endpoints, block_len_bytes):
+            self.spectrum_ring = SpectrumRing(endpoints, block_len_bytes)
+        return self.spectrum_ring
 
     def require_throwaway(self, flag):
         if flag and self.settings.is_xs() and self.remaining_throwaways < 1 and self.settings.has_detector():
             log.debug("queuing throwaways")
             self.remaining_throwaways += 1
 
+    def supports_onboard_averaging(self):
+        return self.settings.is_xs()
+
     def set_onboard_scans_to_average(self, n):
         """ 
-        This is provided to let ENLIGHTEN *turn off* onboard averaging settings 
-        which might have been generated, and (deliberately) left in place after 
-        an Auto-Raman measurement.
+        Normally called by WasatchDevice.take_one_averaged_reading, per 
+        SpectrometerState.averaging_policy.  Also lets ENLIGHTEN *turn off* 
+        onboard averaging settings which might have been generated, and 
+        (deliberately) left in place after an Auto-Raman measurement.
+
+        Note this does not change SpectrometerState.scans_to_average, which
+        remains the caller's requested (host) averaging.
         """
-        if not self.settings.is_xs():
+        if not self.supports_onboard_averaging():
             return SpectrometerResponse(False)
 
-        # MZ: Kludge, disabling while testing
-        log.debug("disabling internal averaging")
-        return SpectrometerResponse(False)
-
-        retval = self._send_code(0xff, 0x62, n, label="SET_ONBOARD_SCANS_TO_AVERAGE")
-        self.settings.state.scans_to_average = n
-        self.settings.state.onboard_averaging = n > 1
+        n = max(1, int(n))
+        retval = self._send_code(bRequest=0xff, wValue=0x62, wIndex=n, label="SET_ONBOARD_SCANS_TO_AVERAGE")
+        if retval.data is not False and not retval.error_msg:
+            self.settings.state.onboard_scans_to_average = n
+            self.settings.state.onboard_averaging = n > 1
         return retval
 
     def get_scans_to_average(self):
-        return self._get_upper_code(0x63, lsb_len=2)
+        return self.get_upper_code(0x63, lsb_len=2, label="GET_ONBOARD_SCANS_TO_AVERAGE")
 
     def set_integration_time_ms(self, ms: float):
         """
@@ -1942,6 +2115,14 @@ class FeatureIdentificationDevice(InterfaceDevice):
             self.extra_area_scan_data = []
 
             try:
+                if len(data) == 0 and len(endpoints) > 1 and line_len == 2 * block_len_bytes and \
+                        self.settings.state.concurrent_endpoint_reads_enabled:
+                    # request both halves of the line at once
+                    for latest_data in self._read_endpoint_pair(
+                            lambda: self.device_type.read(self.device, endpoints[0], block_len_bytes, timeout=timeout_ms),
+                            lambda: self.device_type.read(self.device, endpoints[1], block_len_bytes, timeout=timeout_ms)):
+                        data.extend(latest_data)
+
                 while len(data) < line_len:
                     bytes_remaining = line_len - len(data)
                     bytes_to_read = min(bytes_remaining, block_len_bytes)
@@ -2265,17 +2446,10 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
     ## @note big-endian, reverse of get_laser_temperature_raw
     def get_detector_temperature_raw(self):
-        # - don't poll detector temperature faster than 10Hz...analyzing performance on FX2
-        last = self.settings.state.detector_temperature_raw_last_refreshed 
-        now = datetime.datetime.now()
-        if last is not None and (now - last).total_seconds() < 0.1:
-            raw = self.settings.state.detector_temperature_raw
-            log.debug("get_detector_temperature_raw: using cached {raw}")
-            return raw
+        # RegisterCache ensures we don't poll detector temperature faster than 
+        # 10Hz...analyzing performance on FX2
         raw = self._get_code(0xd7, wLength=2, label="GET_CCD_TEMP", msb_len=2)
         self.settings.state.detector_temperature_raw = raw
-        self.settings.state.detector_temperature_raw_last_refreshed = now
-        log.debug("get_detector_temperature_raw: storing {raw}")
         return raw
 
     def get_detector_temperature_degC(self, raw: float = None):
@@ -2891,6 +3065,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
     def reset_fpga(self):
         log.debug("reset_Fpga: start")
         result = self._send_code(0xb5, label="RESET_FPGA")
+        self.register_cache.clear()
 
         self.queue_message("marquee_error", "resetting FPGA")
 
@@ -3094,6 +3269,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
         result = self._send_code(bRequest = 0xfd,
                                  wValue   = mode,
                                  label    = "SET_PIXEL_MODE")
+        self.invalidate_processing_plan()
 
         log.debug("waiting 1sec...")
         sleep(1)
@@ -3184,6 +3360,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         # determine previous total pixels
         self.prev_pixels = self.settings.pixels()
+        self.invalidate_processing_plan()
         log.debug(f"prev_pixels = {self.prev_pixels}")
 
         if store:
@@ -3461,6 +3638,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
     def get_detector_offset(self):
         value = self._get_code(0xc4, label="GET_DETECTOR_OFFSET", lsb_len=2)
         self.settings.eeprom.detector_offset = value.data
+        self.invalidate_processing_plan()
         return SpectrometerResponse(data=value)
 
     def get_detector_offset_odd(self):
@@ -3472,6 +3650,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
         if value.error_msg != '':
             return value
         self.settings.eeprom.detector_offset_odd = value.data
+        self.invalidate_processing_plan()
         return SpectrometerResponse(data=value)
 
     def get_ccd_sensing_threshold(self):
@@ -3728,6 +3907,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
             self.eeprom_backup = copy.deepcopy(self.settings.eeprom)
 
         self.settings.eeprom.update_editable(pair[1])
+        self.invalidate_processing_plan()
         return SpectrometerResponse(data=True)
 
     def replace_session_eeprom(self, pair: tuple[str, EEPROM]):
@@ -3742,6 +3922,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         self.settings.eeprom = pair[1]
         self.settings.eeprom.dump()
+        self.invalidate_processing_plan()
         return SpectrometerResponse()
 
     ## Actually store the current session EEPROM fields to the spectrometer.
@@ -3906,6 +4087,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
                 "get_mod_enabled",
                 "get_mod_period_us",
                 "get_mod_width_us",
+                "get_opcode_profile",
                 "get_opt_actual_integration_time",
                 "get_opt_area_scan",
                 "get_opt_cf_select",
@@ -3915,6 +4097,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
                 "get_opt_integration_time_resolution",
                 "get_opt_laser_control",
                 "get_raman_delay_ms",
+                "get_register_cache_stats",
                 "get_secondary_adc_calibrated",
                 "get_secondary_adc_raw",
                 "get_selected_adc",
@@ -3923,6 +4106,7 @@ class FeatureIdentificationDevice(InterfaceDevice):
                 "get_shutter_enabled",
                 "get_strobe_enabled",
                 "get_tec_enabled",
+                "get_timeout_stats",
                 "get_trigger_delay",
                 "get_trigger_source",
                 "get_vr_continuous_ccd",
@@ -4006,12 +4190,21 @@ class FeatureIdentificationDevice(InterfaceDevice):
 
         process_f["high_gain_mode_enable"]              = lambda x: self.set_high_gain_mode_enable(bool(x))
         process_f["trigger_source"]                     = lambda x: self.set_trigger_source(int(x))
+        process_f["pipelined_trigger_enable"]           = lambda x: self.set_pipelined_trigger_enable(bool(x))
+        process_f["concurrent_endpoint_reads_enable"]   = lambda x: self.set_concurrent_endpoint_reads_enable(bool(x))
+        process_f["adaptive_timeout_enable"]            = lambda x: self.set_adaptive_timeout_enable(bool(x))
+        process_f["opcode_profiler_enable"]             = lambda x: self.set_opcode_profiler_enable(bool(x))
+        process_f["opcode_profiler_sample_every"]       = lambda x: self.set_opcode_profiler_enable(int(x) > 0, int(x))
+        process_f["opcode_profiler_reset"]              = lambda x: self.reset_opcode_profiler()
+        process_f["register_cache_enable"]              = lambda x: self.set_register_cache_enable(bool(x))
+        process_f["write_suppression_enable"]           = lambda x: self.set_write_suppression_enable(bool(x))
+        process_f["force_next_write"]                   = lambda x: self.set_force_next_write(bool(x))
         process_f["enable_secondary_adc"]               = lambda x: self.settings.state.set("secondary_adc_enabled", bool(x))
         process_f["area_scan_enable"]                   = lambda x: self.set_area_scan_enable(bool(x))
         process_f["area_scan_line_step"]                = lambda x: self.set_area_scan_line_step(int(x))
         process_f["area_scan_fast"]                     = lambda x: self.settings.state.set("area_scan_fast", bool(x))
 
-        process_f["bad_pixel_mode"]                     = lambda x: self.settings.state.set("bad_pixel_mode", int(x))
+        process_f["bad_pixel_mode"]                     = lambda x: self._set_processing_setting(self.settings.state, "bad_pixel_mode", int(x))
         process_f["min_usb_interval_ms"]                = lambda x: self.settings.state.set("min_usb_interval_ms", int(round(x)))
         process_f["max_usb_interval_ms"]                = lambda x: self.settings.state.set("max_usb_interval_ms", int(round(x)))
 
@@ -4058,13 +4251,13 @@ class FeatureIdentificationDevice(InterfaceDevice):
         # MZ: note that anything calling self.settings.state.set() can probably 
         # now be simplified as ENLIGHTEN has access to the same SpectrometerState object
         # (see firmware_logging_enabled)
-        process_f["graph_alternating_pixels"]           = lambda x: self.settings.state.set("graph_alternating_pixels", bool(x))
+        process_f["graph_alternating_pixels"]           = lambda x: self._set_processing_setting(self.settings.state, "graph_alternating_pixels", bool(x))
         process_f["swap_alternating_pixels"]            = lambda x: self.settings.state.set("swap_alternating_pixels", bool(x))
-        process_f["edc_enable"]                         = lambda x: self.settings.state.set("edc_enabled", bool(x))
-        process_f["invert_x_axis"]                      = lambda x: self.settings.eeprom.set("invert_x_axis", bool(x))
-        process_f["horiz_binning_enable"]               = lambda x: self.settings.eeprom.set("horiz_binning_enabled", bool(x))
+        process_f["edc_enable"]                         = lambda x: self._set_processing_setting(self.settings.state, "edc_enabled", bool(x))
+        process_f["invert_x_axis"]                      = lambda x: self._set_processing_setting(self.settings.eeprom, "invert_x_axis", bool(x))
+        process_f["horiz_binning_enable"]               = lambda x: self._set_processing_setting(self.settings.eeprom, "horiz_binning_enabled", bool(x))
         process_f["wavenumber_correction"]              = lambda x: self.settings.set_wavenumber_correction(float(x))
-        process_f["linear_pixel_calibration"]           = lambda x: self.settings.set_linear_pixel_calibration(x)
+        process_f["linear_pixel_calibration"]           = lambda x: self.set_linear_pixel_calibration(x)
         process_f["onboard_scans_to_average"]           = lambda x: self.set_onboard_scans_to_average(int(x))
 
         # heartbeats & connection data
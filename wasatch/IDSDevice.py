@@ -1,6 +1,5 @@
 import logging
 import json
-import copy
 import os
 
 from .SpectrometerResponse  import SpectrometerResponse, ErrorLevel
@@ -11,6 +10,7 @@ from .DeviceID              import DeviceID
 from .Reading               import Reading
 from .IMX385                import IMX385
 from .ROI                   import ROI
+from .ScanAverager          import ScanAverager
 
 from wasatch import utils
 
@@ -36,7 +36,7 @@ class IDSDevice(InterfaceDevice):
         self.imx385 = IMX385() # re-using existing binning
 
         self.session_reading_count = 0
-        self.reset_averaging()
+        self.averager = ScanAverager()
 
         self.config_dir = config_dir if config_dir else os.path.join(utils.get_default_data_dir(), "config")
 
@@ -273,14 +273,13 @@ class IDSDevice(InterfaceDevice):
 
     def reset_averaging(self):
         log.debug("reset averaging")
-        self.summed_spectra = None
-        self.sum_count = 0
+        self.averager.reset()
 
     def acquire_data(self):
         # pre-process scan averaging
         # log.debug(f"acquire_data: start (scans_to_average {self.settings.state.scans_to_average})")
         if self.settings.state.scans_to_average > 1:
-            if self.sum_count > self.settings.state.scans_to_average:
+            if self.averager.count > self.settings.state.scans_to_average:
                 self.reset_averaging()
 
         reading = Reading(self.device_id)
@@ -298,23 +297,14 @@ class IDSDevice(InterfaceDevice):
 
         # post-process scan averaging
         if self.settings.state.scans_to_average > 1:
-            if self.summed_spectra is None:
-                self.summed_spectra = copy.copy(reading.spectrum)
-            else:
-                for pixel, intensity in enumerate(reading.spectrum):
-                    self.summed_spectra[pixel] += intensity
-
-            self.sum_count += 1
-            reading.sum_count = self.sum_count
+            reading.sum_count = self.averager.add(reading.spectrum)
 
-            if self.sum_count >= self.settings.state.scans_to_average:
+            if self.averager.count >= self.settings.state.scans_to_average:
                 log.debug("acquire_data: averaging complete")
-                for i in range(len(self.summed_spectra)):
-                    self.summed_spectra[i] = round(1.0 * self.summed_spectra[i] / self.sum_count, 2)
-                reading.averaged = True
+                self.averager.apply(reading, decimals=2)
                 self.reset_averaging()
             else:
-                log.debug(f"acquire_data: averaged {self.sum_count}/{self.settings.state.scans_to_average}")
+                log.debug(f"acquire_data: averaged {self.averager.count}/{self.settings.state.scans_to_average}")
 
         # track image format
         reading.image_format = self.camera.output_format_name
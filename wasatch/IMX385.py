@@ -41,27 +41,30 @@ class IMX385:
             log.error("spectrum and wavelengths have different lengths")
             return spectrum
 
-        corrected = []
-        for i in range(len(spectrum)):
-            reported_intensity = spectrum[i]
-            wavelength = wavelengths[i]
+        return np.asarray(spectrum, dtype=np.float64) / self.ssc_divisors(wavelengths, on_red)
 
-            green_factor = np.interp(wavelength, self.ssc_wavelengths, self.ssc_factors["green"])
-            color_factor = np.interp(wavelength, self.ssc_wavelengths, self.ssc_factors["red" if on_red else "blue"])
-
-            true_intensity = reported_intensity / (green_factor + color_factor)
-            corrected.append(true_intensity)
-            on_red = not on_red
+    def ssc_divisors(self, wavelengths, on_red=False):
+        """
+        Per-pixel divisors used by correct_ssc (the summed green and red/blue
+        spectral sensitivity factors), split out so callers can precompute 
+        them once per wavecal.
+        """
+        wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        green_factors = np.interp(wavelengths, self.ssc_wavelengths, self.ssc_factors["green"])
+        red_factors   = np.interp(wavelengths, self.ssc_wavelengths, self.ssc_factors["red"])
+        blue_factors  = np.interp(wavelengths, self.ssc_wavelengths, self.ssc_factors["blue"])
 
-        return corrected
+        # Bayer colors alternate red/blue from pixel to pixel
+        is_red = (np.arange(len(wavelengths)) % 2 == 0) == on_red
+        return green_factors + np.where(is_red, red_factors, blue_factors)
 
     def bin_2x2(self, spectrum):
         if spectrum is None or len(spectrum) == 0:
             return spectrum
-        binned = []
-        for i in range(len(spectrum)-1):
-            binned.append((spectrum[i] + spectrum[i+1]) / 2.0)
-        binned.append(spectrum[-1])
+        spectrum = np.asarray(spectrum, dtype=np.float64)
+        binned = np.empty(len(spectrum))
+        binned[:-1] = (spectrum[:-1] + spectrum[1:]) / 2.0
+        binned[-1] = spectrum[-1]
         return binned
 
     def bin_4x2(self, spectrum, x=None):
@@ -84,15 +87,13 @@ class IMX385:
         4-pixel span will be the bin_2x2'd wavelength of 'start+1' pixel, which 
         will contain the averaged "true pixels" start+1, and start+2.
         """
-        binned, new_x = [], []
-        for start in range(0, len(spectrum) - 4, 2):
-            binned.append(sum(spectrum[start:start+4])/4.0)
-            if x is not None:
-                new_x.append(x[start+1])
+        spectrum = np.asarray(spectrum, dtype=np.float64)
+        starts = np.arange(0, len(spectrum) - 4, 2)
+        binned = (spectrum[starts] + spectrum[starts+1] + spectrum[starts+2] + spectrum[starts+3]) / 4.0
         if x is None:
             return binned 
         else:
-            return binned, new_x
+            return binned, np.asarray(x)[starts+1]
 
     def bin_4x2_interp(self, spectrum, wavelengths):
         # first do the normal bin_4x2, yielding 974 intensities and wavelengths
@@ -106,22 +107,29 @@ class IMX385:
         return y_interp
 
     def bin_4x2_avg(self, spectrum):
-        binned = []
-        for i in range(0, len(spectrum) - 1, 2):
-            # 0, 1, 2, 3, 4, 5
-            # \__/  \__/
-            #  A1    B1         where i == 0
-            # \___AB1__/
-            #
-            #       \__/  \__/  where i == 2
-            #        A2    B2
-            #       \___AB2__/
-            A = (spectrum[i] + spectrum[i+1]) / 2.0
-            binned.append(A)
-            if i + 3 < len(spectrum):
-                B = (spectrum[i+2] + spectrum[i+3]) / 2.0
-                AB = (A + B) / 2.0 # adds no information, maintains number of data points
-                binned.append(AB)
+        # 0, 1, 2, 3, 4, 5
+        # \__/  \__/
+        #  A1    B1         where i == 0
+        # \___AB1__/
+        #
+        #       \__/  \__/  where i == 2
+        #        A2    B2
+        #       \___AB2__/
+        #
+        # B of each pair is the A of the next, so the output is simply the
+        # pairwise averages (A) interleaved with the average of each adjacent
+        # pair of A's (AB, which adds no information but maintains the number
+        # of data points).
+        spectrum = np.asarray(spectrum, dtype=np.float64)
+        pixels = len(spectrum)
+        pairs = pixels // 2
+        if pairs == 0:
+            return spectrum
+
+        A = (spectrum[0:2*pairs:2] + spectrum[1:2*pairs:2]) / 2.0
+        binned = np.empty(pixels)
+        binned[0:2*pairs-1:2] = A
+        binned[1:2*pairs-1:2] = (A[:-1] + A[1:]) / 2.0
 
         # Why is this necessary? Because due to the above logic, when advancing 
         # to the next pair of pixels (to create the new 'A'), we don't yet know
@@ -143,10 +151,10 @@ class IMX385:
         #
         # Long story short, if you are calling this algorithm, then presumably 
         # smoothness is desired, and that is what this ensures.
-        while len(binned) < len(spectrum):
+        if 2*pairs - 1 < pixels:
             log.debug("bin_4x2_avg: filling-out")
-            binned.append(binned[-1])
-        log.debug(f"bin_4x2_avg: given spectrum len {len(spectrum)}, returning len {len(binned)}")
+            binned[2*pairs-1:] = binned[2*pairs-2]
+        log.debug(f"bin_4x2_avg: given spectrum len {pixels}, returning len {len(binned)}")
 
         return binned
 
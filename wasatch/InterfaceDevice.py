@@ -19,6 +19,22 @@ class InterfaceDevice:
         self.process_f = {}
         self.remaining_throwaways = 0
 
+        # if set (by WrapperWorker), applies any pending high-priority commands
+        # (laser, triggering, shutdown) and returns True if shutdown requested
+        self.priority_callback = None
+
+    def check_priority_commands(self):
+        """
+        Long-running operations (scan averaging, waiting on external triggers)
+        should call this periodically so that laser and trigger commands don't
+        have to wait for the end of the current acquisition.
+
+        @returns True if the caller has requested shutdown (abort the operation)
+        """
+        if self.priority_callback is None:
+            return False
+        return self.priority_callback()
+
     def handle_requests(self, requests):
         responses = []
         for request in requests:
@@ -0,0 +1,107 @@
+import logging
+import threading
+
+from time import monotonic
+
+from .RollingWindow import RollingWindow
+
+log = logging.getLogger(__name__)
+
+##
+# time.monotonic() stamps recording where one Reading spent its time, from
+# the ACQUIRE opcode to the caller's dequeue.
+#
+# - trigger_sent:   ACQUIRE sent (for a pipelined trigger, while the previous
+#                   spectrum was being processed)
+# - first_byte:     first bulk transfer returned (pyusb doesn't expose partial
+#                   transfers, so on single-endpoint units this equals
+#                   read_complete)
+# - read_complete:  all endpoints read
+# - processed:      ProcessingPlan applied
+# - telemetry_done: temperatures, laser state etc read and applied
+# - enqueued:       handed to the response queue (or SharedSpectrumRing)
+# - dequeued:       taken by the caller (or passed to its callback)
+#
+# Marks a given path doesn't reach (e.g. non-FID devices, keep-alives) stay
+# None.  CLOCK_MONOTONIC is system-wide, so marks made in a child process
+# (WasatchDeviceWrapper process=True) compare directly with the parent's.
+class LatencyMarks:
+
+    MARKS = ("trigger_sent", "first_byte", "read_complete", "processed", "telemetry_done", "enqueued", "dequeued")
+
+    ## (name, from mark, to mark)
+    SEGMENTS = (
+        ("acquire",   "trigger_sent",   "first_byte"),
+        ("read",      "first_byte",     "read_complete"),
+        ("process",   "read_complete",  "processed"),
+        ("telemetry", "processed",      "telemetry_done"),
+        ("queue",     "telemetry_done", "enqueued"),
+        ("pickup",    "enqueued",       "dequeued"),
+        ("total",     "trigger_sent",   "dequeued"),
+    )
+
+    __slots__ = MARKS
+
+    def __init__(self):
+        for name in self.MARKS:
+            setattr(self, name, None)
+
+    def __repr__(self):
+        return "LatencyMarks <%s>" % ", ".join(f"{name} {ms:.2f}ms" for name, ms in self.get_segments_ms().items())
+
+    def mark(self, name):
+        setattr(self, name, monotonic())
+
+    def get_segments_ms(self):
+        """ @returns dict of segment name -> milliseconds, for segments with both marks """
+        segments = {}
+        for name, start, end in self.SEGMENTS:
+            t0 = getattr(self, start)
+            t1 = getattr(self, end)
+            if t0 is not None and t1 is not None:
+                segments[name] = (t1 - t0) * 1000
+        return segments
+
+##
+# Rolling per-segment latency distribution over a device's recent Readings.
+#
+# ResponseQueue adds each Reading's marks as it is dequeued;
+# WasatchDeviceWrapper.get_latency_stats() reports the percentiles.
+class LatencyHistogram:
+
+    DEFAULT_SIZE = 1000
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.window = RollingWindow(size=size, min_samples=1, max_keys=len(LatencyMarks.SEGMENTS))
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"LatencyHistogram <{self.window}>"
+
+    def add(self, marks):
+        if marks is None:
+            return
+        segments = marks.get_segments_ms()
+        with self.lock:
+            for name, ms in segments.items():
+                self.window.add(name, ms)
+
+    def clear(self):
+        with self.lock:
+            self.window.clear()
+
+    ##
+    # @returns dict of segment name -> { "count", "p50", "p95", "p99" } in ms,
+    #          in pipeline order
+    def get_stats(self):
+        stats = {}
+        with self.lock:
+            for name, _, _ in LatencyMarks.SEGMENTS:
+                count = self.window.count(name)
+                if not count:
+                    continue
+                stats[name] = { "count": count }
+                for p in self.PERCENTILES:
+                    stats[name][f"p{p}"] = self.window.quantile(name, p / 100)
+        return stats
@@ -0,0 +1,182 @@
+import logging
+import threading
+
+from collections import deque
+from time        import monotonic
+
+log = logging.getLogger(__name__)
+
+##
+# A monotonically-increasing count.  Each counter has a single writer (the
+# thread owning the device), so inc() is an unlocked add.
+class Counter:
+
+    KIND = "counter"
+
+    __slots__ = ("value", "fn")
+
+    def __init__(self, fn=None):
+        self.value = 0
+        self.fn = fn # optional callable, read at collection time
+
+    def inc(self, n=1):
+        self.value += n
+
+    def get(self):
+        return self.fn() if self.fn is not None else self.value
+
+##
+# A value which can go up or down (queue depth, memory etc).
+class Gauge:
+
+    KIND = "gauge"
+
+    __slots__ = ("value", "fn")
+
+    def __init__(self, fn=None):
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.fn() if self.fn is not None else self.value
+
+##
+# Events per second over the trailing window_sec (reported as a gauge).
+#
+# Until window_sec has elapsed since the first tick, the rate is measured over
+# the time actually observed, so it isn't under-reported after a (re)start.
+class RateMeter:
+
+    KIND = "gauge"
+
+    __slots__ = ("window_sec", "ticks", "first_tick")
+
+    def __init__(self, window_sec=5):
+        self.window_sec = window_sec
+        self.ticks = deque()
+        self.first_tick = None
+
+    def tick(self):
+        now = monotonic()
+        if self.first_tick is None:
+            self.first_tick = now
+        ticks = self.ticks
+        ticks.append(now)
+        while ticks[0] < now - self.window_sec:
+            ticks.popleft()
+
+    def get(self):
+        now = monotonic()
+        first_tick = self.first_tick
+        if first_tick is None:
+            return 0
+
+        cutoff = now - self.window_sec
+        count = sum(1 for t in list(self.ticks) if t >= cutoff)
+        if first_tick >= cutoff:
+            # window not yet filled: count the intervals since the first tick
+            elapsed = now - first_tick
+            return (count - 1) / elapsed if count > 1 and elapsed > 0 else 0
+        return count / self.window_sec
+
+##
+# Process-wide registry of operational metrics, fed by the driver itself
+# (FeatureIdentificationDevice, WasatchDevice, WrapperWorker and
+# WasatchDeviceWrapper), keyed by metric name and device_id.
+#
+# Readers call snapshot(), or attach a MetricsWriter (Prometheus textfile or
+# statsd) to export periodically.
+#
+# @verbatim
+#   from wasatch.MetricsRegistry import MetricsRegistry
+#   MetricsRegistry.get_default().snapshot()
+#   {'USB:0x24aa:0x4000:1:5': {'spectra_acquired': 1207, 'acquisition_rate_hz': 9.8, ...}}
+# @endverbatim
+#
+# Devices run with WasatchDeviceWrapper(process=True) have their own
+# registry in the child process; only wrapper-level metrics (response queue
+# depth, dropped Readings) appear here.
+#
+# @par Metrics
+#
+# - spectra_acquired:           spectra read from the bulk endpoint(s)
+# - averaged_readings:          fully-averaged Readings produced
+# - bulk_read_timeouts:         failed bulk reads (internal triggering)
+# - disconnects_scheduled:      _schedule_disconnect events
+# - random_errors_injected:     (regression testing) injected USB errors
+# - throwaways_consumed:        stabilization spectra discarded
+# - acquisition_rate_hz:        spectra per second, trailing 5sec
+# - command_queue_depth:        commands waiting for the worker
+# - response_queue_depth:       responses waiting for the caller
+# - dropped_readings:           Readings evicted by the ResponseQueue policy
+# - memory_rss_bytes:           (process-wide) resident set size, from monitor_memory
+class MetricsRegistry:
+
+    default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls.default is None:
+            cls.default = MetricsRegistry()
+        return cls.default
+
+    def __init__(self):
+        self.metrics = {} # (name, device_id) -> Counter, Gauge or RateMeter
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"MetricsRegistry <{len(self.metrics)} metrics>"
+
+    def _get_or_create(self, cls, name, device_id, **kwargs):
+        key = (name, "" if device_id is None else str(device_id))
+        with self.lock:
+            metric = self.metrics.get(key)
+            if metric is None or kwargs.get("fn") is not None:
+                metric = cls(**kwargs)
+                self.metrics[key] = metric
+            return metric
+
+    def counter(self, name, device_id=None, fn=None):
+        """ @returns the Counter for (name, device_id), creating it if needed """
+        return self._get_or_create(Counter, name, device_id, fn=fn)
+
+    def gauge(self, name, device_id=None, fn=None):
+        """ @param fn (Input) optional callable evaluated whenever the gauge is read """
+        return self._get_or_create(Gauge, name, device_id, fn=fn)
+
+    def rate(self, name, device_id=None, window_sec=5):
+        return self._get_or_create(RateMeter, name, device_id, window_sec=window_sec)
+
+    def unregister(self, device_id):
+        """ forget every metric of a (disconnected) device """
+        device_id = str(device_id)
+        with self.lock:
+            for key in [ key for key in self.metrics if key[1] == device_id ]:
+                del self.metrics[key]
+
+    ##
+    # @returns list of (name, device_id, kind, value) for every metric, with
+    #          kind "counter" or "gauge"
+    def collect(self):
+        with self.lock:
+            items = list(self.metrics.items())
+
+        results = []
+        for (name, device_id), metric in items:
+            try:
+                value = metric.get()
+            except Exception as exc:
+                log.debug(f"collect: unable to read {name} ({device_id}): {exc}")
+                continue
+            results.append((name, device_id, metric.KIND, value))
+        return results
+
+    def snapshot(self):
+        """ @returns dict of device_id -> { name: value } ("" for process-wide metrics) """
+        snapshot = {}
+        for name, device_id, _, value in self.collect():
+            snapshot.setdefault(device_id, {})[name] = value
+        return snapshot
@@ -0,0 +1,142 @@
+import os
+import re
+import socket
+import logging
+import tempfile
+import threading
+
+from .MetricsRegistry import MetricsRegistry
+
+log = logging.getLogger(__name__)
+
+##
+# Periodically exports a MetricsRegistry from a daemon thread.  Subclasses
+# implement write(); both provided here work fully offline (a local file, or
+# fire-and-forget UDP).
+#
+# @verbatim
+#   writer = PrometheusTextfileWriter("/var/lib/node_exporter/wasatch.prom")
+#   writer.start()
+#   ...
+#   writer.stop()
+# @endverbatim
+class MetricsWriter(threading.Thread):
+
+    DEFAULT_PERIOD_SEC = 10
+
+    def __init__(self, registry=None, period_sec=DEFAULT_PERIOD_SEC, prefix="wasatch"):
+        threading.Thread.__init__(self, name=self.__class__.__name__, daemon=True)
+        self.registry = registry if registry is not None else MetricsRegistry.get_default()
+        self.period_sec = period_sec
+        self.prefix = prefix
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.period_sec):
+            self.write_once()
+        self.write_once()
+
+    def stop(self, timeout_sec=None):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=timeout_sec)
+
+    def write_once(self):
+        try:
+            self.write(self.registry.collect())
+        except Exception:
+            log.error(f"{self.name}: unable to export metrics", exc_info=1)
+
+    def write(self, metrics):
+        raise NotImplementedError
+
+##
+# Writes the Prometheus text exposition format to a file (e.g. for
+# node_exporter's textfile collector), replacing it atomically each period.
+class PrometheusTextfileWriter(MetricsWriter):
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def render(self, metrics):
+        by_name = {}
+        for name, device_id, kind, value in metrics:
+            by_name.setdefault((name, kind), []).append((device_id, value))
+
+        lines = []
+        for (name, kind), samples in sorted(by_name.items()):
+            full_name = f"{self.prefix}_{name}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for device_id, value in samples:
+                labels = ""
+                if device_id:
+                    escaped = device_id.replace("\\", "\\\\").replace('"', '\\"')
+                    labels = f'{{device_id="{escaped}"}}'
+                lines.append(f"{full_name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics):
+        text = self.render(metrics)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, prefix=".wasatch-metrics-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.chmod(tmp_path, 0o644) # mkstemp is 0600; the exporter may run as another user
+            os.replace(tmp_path, self.path)
+        except:
+            os.unlink(tmp_path)
+            raise
+
+##
+# Sends metrics as statsd datagrams over UDP.  Gauges are sent as-is;
+# counters are sent as the increment since the previous period.
+class StatsdWriter(MetricsWriter):
+
+    MAX_DATAGRAM_BYTES = 1400
+
+    def __init__(self, host="127.0.0.1", port=8125, **kwargs):
+        super().__init__(**kwargs)
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.last_counts = {}
+
+    def stop(self, timeout_sec=None):
+        super().stop(timeout_sec)
+        self.sock.close()
+
+    @staticmethod
+    def sanitize(s):
+        return re.sub(r"[^A-Za-z0-9_]", "_", s)
+
+    def render(self, metrics):
+        lines = []
+        for name, device_id, kind, value in metrics:
+            stat = f"{self.prefix}.{self.sanitize(device_id)}.{name}" if device_id else f"{self.prefix}.{name}"
+            if kind == "counter":
+                key = (name, device_id)
+                delta = value - self.last_counts.get(key, 0)
+                self.last_counts[key] = value
+                if delta:
+                    lines.append(f"{stat}:{delta}|c")
+            else:
+                lines.append(f"{stat}:{value}|g")
+        return lines
+
+    def write(self, metrics):
+        packet = ""
+        for line in self.render(metrics):
+            if packet and len(packet) + len(line) + 1 > self.MAX_DATAGRAM_BYTES:
+                self.send(packet)
+                packet = ""
+            packet = f"{packet}\n{line}" if packet else line
+        if packet:
+            self.send(packet)
+
+    def send(self, packet):
+        try:
+            self.sock.sendto(packet.encode("ascii"), self.address)
+        except OSError as exc:
+            log.debug(f"send: {exc}")
@@ -13,6 +13,7 @@ from .SpectrometerResponse        import SpectrometerResponse
 from .InterfaceDevice             import InterfaceDevice
 from .DeviceID                    import DeviceID
 from .Reading                     import Reading
+from .ScanAverager                import ScanAverager
 
 log = logging.getLogger(__name__)
 
@@ -62,8 +63,7 @@ class OceanDevice(InterfaceDevice):
         self.immediate_mode = False
 
         self.settings = SpectrometerSettings(self.device_id)
-        self.summed_spectra         = None
-        self.sum_count              = 0
+        self.averager               = ScanAverager()
         self.session_reading_count  = 0
         self.take_one               = False
         self.failure_count          = 0
@@ -104,7 +104,7 @@ class OceanDevice(InterfaceDevice):
             # slaved to parent process and doing exactly what is requested
             # "on command."  That means we can perform a big, heavy blocking
             # scan average all at once, because they requested it.
-            self.sum_count = 0
+            self.averager.reset()
             loop_count = self.settings.state.scans_to_average
         else:
             # we're in free-running mode
@@ -133,36 +133,28 @@ class OceanDevice(InterfaceDevice):
                 self.failure_count += 1
                 log.error(f"Ocean Device: encountered USB error in reading for device {self.device}")
 
-            if reading.spectrum is None or reading.spectrum == []:
+            if reading.spectrum is None or len(reading.spectrum) == 0:
                 if self.failure_count > 3:
                     return SpectrometerResponse(data=False,error_msg="failed to acquire spectra")
 
             if not reading.failure:
                 if averaging_enabled:
-                    if self.sum_count == 0:
-                        self.summed_spectra = [float(i) for i in reading.spectrum]
-                    else:
-                        log.debug("device.take_one_averaged_reading: summing spectra")
-                        for i in range(len(self.summed_spectra)):
-                            self.summed_spectra[i] += reading.spectrum[i]
-                    self.sum_count += 1
-                    log.debug("device.take_one_averaged_reading: summed_spectra : %s ...", self.summed_spectra[0:9])
+                    self.averager.add(reading.spectrum)
+                    log.debug(f"device.take_one_averaged_reading: summing spectra ({self.averager})")
 
             # count spectra
             self.session_reading_count += 1
             reading.session_count = self.session_reading_count
-            reading.sum_count = self.sum_count
+            reading.sum_count = self.averager.count
 
             # have we completed the averaged reading?
             if averaging_enabled:
-                if self.sum_count >= self.settings.state.scans_to_average:
-                    reading.spectrum = [ x / self.sum_count for x in self.summed_spectra ]
+                if self.averager.count >= self.settings.state.scans_to_average:
+                    self.averager.apply(reading)
                     log.debug("device.take_one_averaged_reading: averaged_spectrum : %s ...", reading.spectrum[0:9])
-                    reading.averaged = True
 
                     # reset for next average
-                    self.summed_spectra = None
-                    self.sum_count = 0
+                    self.averager.reset()
             else:
                 # if averaging isn't enabled...then a single reading is the
                 # "averaged" final measurement (check reading.sum_count to confirm)
@@ -174,7 +166,7 @@ class OceanDevice(InterfaceDevice):
                 self.change_setting("cancel_take_one", True)
 
         log.debug("device.take_one_averaged_reading: returning %s", reading)
-        if reading.spectrum is not None and reading.spectrum != []:
+        if reading.spectrum is not None and len(reading.spectrum) > 0:
             self.failure_count = 0
         # reading.dump_area_scan()
         return SpectrometerResponse(data=reading)
@@ -210,6 +202,6 @@ class OceanDevice(InterfaceDevice):
         return reading
 
     def scans_to_average(self, value: int): # -> SpectrometerResponse 
-        self.sum_count = 0
+        self.averager.reset()
         self.settings.state.scans_to_average = int(value)
         return SpectrometerResponse(True)
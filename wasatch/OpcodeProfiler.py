@@ -0,0 +1,126 @@
+import json
+import logging
+import threading
+
+from time import monotonic
+
+log = logging.getLogger(__name__)
+
+##
+# Running totals for one (bRequest, wValue, label).
+class OpcodeStats:
+
+    __slots__ = ("count", "sampled", "total_sec", "max_sec", "errors", "retries")
+
+    def __init__(self):
+        self.count     = 0   # every call
+        self.sampled   = 0   # calls actually timed
+        self.total_sec = 0.0 # over sampled calls
+        self.max_sec   = 0.0
+        self.errors    = 0
+        self.retries   = 0
+
+##
+# Measures how EP0 (control transfer) time is spent, per opcode.
+#
+# FeatureIdentificationDevice holds a profiler in self.opcode_profiler, which
+# is None unless profiling has been enabled (opcode_profiler_enable), so the
+# only cost to _send_code and _get_code when disabled is a None check.  Reads
+# satisfied by the RegisterCache aren't transfers and aren't counted.
+#
+# For long runs, sample_every=N times only every Nth transfer (every call is
+# still counted, along with any errors and retries); mean latency is then
+# estimated from the sampled calls, and total time extrapolated from that.
+#
+# @verbatim
+#   fid.set_opcode_profiler_enable(True)
+#   ...
+#   print(fid.opcode_profiler.to_table())
+# @endverbatim
+class OpcodeProfiler:
+
+    def __init__(self, sample_every=1):
+        self.sample_every = max(1, int(sample_every))
+        self.stats = {}  # (bRequest, wValue, label) -> OpcodeStats
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.start_time = monotonic()
+
+    def __repr__(self):
+        return f"OpcodeProfiler <{len(self.stats)} opcodes, {self.calls} calls, sample_every {self.sample_every}>"
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.calls = 0
+            self.start_time = monotonic()
+
+    ## @returns a start time if this call should be timed, else None
+    def start(self):
+        self.calls += 1
+        if self.calls % self.sample_every == 0:
+            return monotonic()
+        return None
+
+    ##
+    # @param start (Input) value returned by start()
+    # @param error (Input) the transfer failed
+    # @param retries (Input) how many times it was re-sent
+    def record(self, bRequest, wValue, label, start, error=False, retries=0):
+        key = (bRequest, wValue, label)
+        stats = self.stats.get(key)
+        if stats is None:
+            with self.lock:
+                stats = self.stats.setdefault(key, OpcodeStats())
+
+        stats.count += 1
+        if error:
+            stats.errors += 1
+        stats.retries += retries
+
+        if start is not None:
+            elapsed = monotonic() - start
+            stats.sampled += 1
+            stats.total_sec += elapsed
+            if elapsed > stats.max_sec:
+                stats.max_sec = elapsed
+
+    ##
+    # @returns list of dicts, one per (bRequest, wValue, label), ordered by
+    #          (estimated) total time
+    def get_stats(self):
+        with self.lock:
+            items = list(self.stats.items())
+
+        results = []
+        for (bRequest, wValue, label), stats in items:
+            mean_ms = 1000 * stats.total_sec / stats.sampled if stats.sampled else None
+            results.append({
+                "bRequest": bRequest,
+                "wValue":   wValue,
+                "label":    label,
+                "count":    stats.count,
+                "sampled":  stats.sampled,
+                "total_ms": None if mean_ms is None else mean_ms * stats.count,
+                "mean_ms":  mean_ms,
+                "max_ms":   1000 * stats.max_sec,
+                "errors":   stats.errors,
+                "retries":  stats.retries })
+        results.sort(key=lambda d: d["total_ms"] or 0, reverse=True)
+        return results
+
+    def to_json(self, indent=2):
+        return json.dumps({ "elapsed_sec":  monotonic() - self.start_time,
+                            "sample_every": self.sample_every,
+                            "opcodes":      self.get_stats() }, indent=indent)
+
+    def to_table(self):
+        lines = [ "%-8s %-8s %-36s %8s %10s %9s %9s %6s %7s" % (
+            "bRequest", "wValue", "label", "count", "total ms", "mean ms", "max ms", "errors", "retries") ]
+        for d in self.get_stats():
+            lines.append("0x%02x     0x%04x   %-36s %8d %10s %9s %9.3f %6d %7d" % (
+                d["bRequest"], d["wValue"], d["label"][:36], d["count"],
+                "-" if d["total_ms"] is None else "%.1f" % d["total_ms"],
+                "-" if d["mean_ms"]  is None else "%.3f" % d["mean_ms"],
+                d["max_ms"], d["errors"], d["retries"]))
+        return "\n".join(lines)
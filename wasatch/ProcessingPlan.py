@@ -0,0 +1,297 @@
+import logging
+import numpy as np
+
+from .SpectrometerState import SpectrometerState
+from .IMX385            import IMX385
+
+log = logging.getLogger(__name__)
+
+##
+# Encapsulates the "order of operations" applied by FeatureIdentificationDevice
+# to each spectrum read from the bulk endpoint(s).
+#
+# Rather than re-evaluating dozens of SpectrometerState / EEPROM flags and
+# is_ingaas(), is_imx385() etc predicates on every acquisition, the decision
+# tree is resolved once into an ordered list of (label, callable) stages, each
+# of which takes and returns a float64 ndarray.  Anything which can be
+# precomputed (InGaAs affine coefficients, bad-pixel interpolation indices,
+# linear pixel calibration slopes and offsets, SSC divisors) is computed here.
+#
+# The plan is only valid for the pixel count and settings from which it was
+# compiled.  FeatureIdentificationDevice discards its plan (via
+# invalidate_processing_plan) from any setter which changes those inputs, and
+# also re-compiles if a spectrum of unexpected length is received.
+#
+# It is VITALLY IMPORTANT that all drivers agree on the Order of Operations, so
+# any changes here should be reflected in Wasatch.NET (and vice-versa).
+class ProcessingPlan:
+
+    def __init__(self, settings, imx385, pixels):
+        self.settings = settings
+        self.imx385 = imx385
+        self.pixels = pixels
+
+        self.stages = []
+        self.compile()
+
+    def __repr__(self):
+        return f"ProcessingPlan <pixels {self.pixels}, stages {[ label for label, _ in self.stages ]}>"
+
+    ##
+    # Apply each stage in order.
+    #
+    # @param spectrum (Input) float64 ndarray (may be modified in-place)
+    # @returns processed spectrum, or None if a stage rejected the spectrum
+    def apply(self, spectrum):
+        for label, stage in self.stages:
+            spectrum = stage(spectrum)
+            if spectrum is None:
+                log.debug(f"ProcessingPlan: spectrum rejected by {label}")
+                return None
+        return spectrum
+
+    # ##########################################################################
+    # Compilation
+    # ##########################################################################
+
+    def compile(self):
+        settings = self.settings
+        state = settings.state
+        eeprom = settings.eeprom
+
+        self.stages = []
+
+        # (before x-axis inversion because this is where FPGA will do it)
+        if settings.is_ingaas() and not eeprom.hardware_even_odd:
+            self._compile_ingaas()
+
+        # everything else in the standard order-of-operations is bypassed
+        # during area scan
+        if not state.area_scan_enabled:
+
+            # (before x-axis inversion because optically masked pixels are physical)
+            if settings.is_imx385() and settings.fpga_firmware_version == "01.1.01":
+                self._compile_stomp(3, 2)
+            if settings.is_imx392() and state.detector_regions is None:
+                self._compile_stomp(3, 17)
+
+            if state.edc_enabled and settings.is_imx():
+                self._compile_edc()
+
+            if eeprom.invert_x_axis:
+                self.stages.append(("invert_x_axis", lambda spectrum: spectrum[::-1]))
+
+            # ignore isolated "flat" spectra on SiG
+            if settings.is_micro():
+                self.stages.append(("reject_flat", self._reject_flat))
+
+            # Note these are pre-horizontal binning...
+            if state.bad_pixel_mode == SpectrometerState.BAD_PIXEL_MODE_AVERAGE:
+                self._compile_bad_pixels()
+
+            # should be done AFTER detector inversion (because that's how
+            # calibration is generated) and AFTER bad pixel correction
+            if settings.linear_pixel_calibration:
+                self._compile_linear_pixel_calibration()
+
+        if eeprom.horiz_binning_enabled:
+            self._compile_horizontal_binning()
+
+        # Note: len(spectrum) may no longer == eeprom.actual_pixels_horizontal!
+
+        # Not important enough to update for DetectorRegions
+        if state.graph_alternating_pixels:
+            self.stages.append(("graph_alternating_pixels", self._graph_alternating_pixels))
+
+        log.debug(f"compiled {self}")
+
+    ##
+    # Until support for even/odd InGaAs gain and offset have been added to the
+    # firmware, apply the correction in software: back-out the incorrectly
+    # applied "even" gain and offset from each ODD pixel, then apply the correct
+    # "odd" gain and offset.  This collapses to a single per-pixel affine
+    # transform (identity on the even pixels).
+    def _compile_ingaas(self):
+        eeprom = self.settings.eeprom
+
+        # if even and odd pixels have the same settings, there's no point in doing anything
+        if eeprom.detector_gain_odd   == eeprom.detector_gain and \
+           eeprom.detector_offset_odd == eeprom.detector_offset:
+            return
+
+        if 0 == eeprom.detector_gain:
+            log.debug("declining to attempt division by zero")
+            return
+
+        log.debug("rescaling InGaAs odd pixels from even gain %.4f, offset %d to odd gain %.4f, offset %d",
+            eeprom.detector_gain, eeprom.detector_offset, eeprom.detector_gain_odd, eeprom.detector_offset_odd)
+
+        scale = eeprom.detector_gain_odd / eeprom.detector_gain
+
+        slopes = np.ones(self.pixels)
+        offsets = np.zeros(self.pixels)
+        slopes[1::2] = scale
+        offsets[1::2] = eeprom.detector_offset_odd - eeprom.detector_offset * scale
+
+        def correct_ingaas(spectrum):
+            spectrum *= slopes
+            spectrum += offsets
+            return spectrum
+
+        self.stages.append(("ingaas_even_odd", correct_ingaas))
+
+    ##
+    # Some detectors have "garbage" pixels at the front or end of every
+    # spectrum (sync bytes and what-not).
+    def _compile_stomp(self, first, last):
+        if self.pixels <= first + last:
+            return
+
+        def stomp(spectrum):
+            spectrum[:first] = spectrum[first]
+            spectrum[-last:] = spectrum[-(last + 1)]
+            return spectrum
+
+        self.stages.append((f"stomp_{first}_{last}", stomp))
+
+    ##
+    # Use optically black pixels for electrical dark correction (EDC).
+    #
+    # @par IMX385LQR-C datasheet (p8)
+    #
+    # @verbatim
+    # Pixels    Count Description
+    # 0-3       4     OB side ignored area                <-- using this
+    # 4-7       4     Effective pixel side ignored area
+    # 8-15      8     Effective margin for color processing
+    # 16-1935   1920  Recording pixel area
+    # 1936-1944 9     Effective margin for color processing
+    # 1945-1948 4     Effective pixel side ignored area
+    # 1949-1951 3     Dummy
+    # @endverbatim
+    #
+    # @note that this is applied BEFORE horizontal binning, so should still work
+    #       even with BIN_4X2
+    #
+    # @todo we might want to make buffer length configurable, either in spectra
+    #       or by time (consider 10ms vs 1sec integration time)
+    def _compile_edc(self):
+        if self.pixels != 1952:
+            log.error("IMX EDC hard-coded to expect 1952px")
+            return
+
+        def edc(spectrum):
+            # this averages electrical dark over SPACE
+            spectrum -= round(float(spectrum[0:4].mean()), 2)
+            return spectrum
+
+        self.stages.append(("edc", edc))
+
+    def _reject_flat(self, spectrum):
+        if (spectrum == spectrum[0]).all():
+            return None
+        return spectrum
+
+    ##
+    # If a spectrometer has bad_pixels configured in the EEPROM, then average
+    # over them in the driver.  Each bad pixel is linearly interpolated between
+    # the nearest good pixels on either side; runs of bad pixels at either end
+    # of the detector are filled with the nearest good pixel.
+    def _compile_bad_pixels(self):
+        eeprom = self.settings.eeprom
+        if eeprom.bad_pixels is None or \
+                len(eeprom.bad_pixels) == 0 or \
+                self.settings.state.detector_regions is not None:
+            return
+
+        bad = np.unique(np.asarray(eeprom.bad_pixels, dtype=np.int64))
+        bad = bad[(bad >= 0) & (bad < self.pixels)]
+        if len(bad) == 0:
+            return
+
+        is_good = np.ones(self.pixels, dtype=bool)
+        is_good[bad] = False
+        good = np.flatnonzero(is_good)
+        if len(good) == 0:
+            return
+
+        # For each bad pixel, precompute the indices of the bracketing good
+        # pixels and the fractional weight of the right-hand one (np.interp
+        # semantics, clamping to the first/last good value beyond either end).
+        right = np.clip(np.searchsorted(good, bad), 1, len(good) - 1) if len(good) > 1 else np.zeros(len(bad), dtype=np.int64)
+        left = np.maximum(right - 1, 0)
+        left_idx  = good[left]
+        right_idx = good[right]
+        span = (right_idx - left_idx).astype(np.float64)
+        weights = np.divide(bad - left_idx, span, out=np.zeros(len(bad)), where=span != 0)
+        weights = np.clip(weights, 0.0, 1.0)
+
+        def correct_bad_pixels(spectrum):
+            lo = spectrum[left_idx]
+            spectrum[bad] = lo + (spectrum[right_idx] - lo) * weights
+            return spectrum
+
+        self.stages.append(("bad_pixels", correct_bad_pixels))
+
+    def _compile_linear_pixel_calibration(self):
+        (slopes, offsets) = self.settings.linear_pixel_calibration
+        slopes  = np.asarray(slopes,  dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.float64)
+
+        if len(slopes) != self.pixels or len(offsets) != self.pixels:
+            log.error(f"linear pixel calibration length ({len(slopes)}, {len(offsets)}) != pixels {self.pixels}")
+            return
+
+        def apply_linear_pixel_calibration(spectrum):
+            return spectrum * slopes + offsets
+
+        self.stages.append(("linear_pixel_calibration", apply_linear_pixel_calibration))
+
+    def _compile_horizontal_binning(self):
+        imx385 = self.imx385
+        wavelengths = self.settings.wavelengths
+
+        mode = self.settings.eeprom.multi_wavelength_calibration.get("horiz_binning_mode")
+        if mode not in [ IMX385.BIN_2X2, IMX385.CORRECT_SSC, IMX385.CORRECT_SSC_BIN_2X2,
+                         IMX385.BIN_4X2, IMX385.BIN_4X2_INTERP, IMX385.BIN_4X2_AVG ]:
+            # there may be legacy units in the field where this byte is
+            # uninitialized to 0xff...treat as 0x00 for now
+            log.error(f"invalid horizontal binning mode {mode}...defaulting to bin_2x2")
+            mode = IMX385.BIN_2X2
+
+        ssc_divisors = None
+        if mode in [ IMX385.CORRECT_SSC, IMX385.CORRECT_SSC_BIN_2X2 ]:
+            if wavelengths is None or len(wavelengths) != self.pixels:
+                log.error("can't correct SSC without matching wavelengths")
+            else:
+                ssc_divisors = imx385.ssc_divisors(wavelengths)
+
+        if mode == IMX385.BIN_2X2:
+            binning = imx385.bin_2x2
+        elif mode == IMX385.CORRECT_SSC:
+            binning = lambda spectrum: spectrum if ssc_divisors is None else spectrum / ssc_divisors
+        elif mode == IMX385.CORRECT_SSC_BIN_2X2:
+            binning = lambda spectrum: imx385.bin_2x2(spectrum if ssc_divisors is None else spectrum / ssc_divisors)
+        elif mode == IMX385.BIN_4X2:
+            binning = imx385.bin_4x2
+        elif mode == IMX385.BIN_4X2_INTERP:
+            binning = lambda spectrum: imx385.bin_4x2_interp(spectrum, wavelengths)
+        elif mode == IMX385.BIN_4X2_AVG:
+            binning = imx385.bin_4x2_avg
+
+        self.stages.append((f"horiz_binning_{mode}", binning))
+
+    ##
+    # When integrating new sensors, or testing "interleaved" detectors like
+    # the InGaAs, sometimes we want to only look at "every other" pixel to
+    # flatten-out irregularities in Bayer filters or photodiode arrays.
+    # However, we don't want to disrupt the expected pixel-count, so just
+    # average-over the skipped pixels.
+    def _graph_alternating_pixels(self, spectrum):
+        spectrum = np.array(spectrum, dtype=np.float64)
+        pixels = len(spectrum)
+        if pixels > 2:
+            spectrum[1:pixels-1:2] = (spectrum[0:pixels-2:2] + spectrum[2:pixels:2]) / 2.0
+        if pixels > 1 and pixels % 2 == 0:
+            spectrum[-1] = spectrum[-2]
+        return spectrum
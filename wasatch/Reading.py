@@ -3,12 +3,155 @@ import logging
 
 log = logging.getLogger(__name__)
 
+##
+# Lazily-allocated holders for groups of rarely-populated Reading fields.
+# Most Readings never touch these, so they cost one (None) slot each until
+# a field in the group is assigned a non-default value.
+class _BatteryFields:
+    __slots__ = ("battery_raw", "battery_percentage", "battery_charging", "power_connection_state")
+
+    def __init__(self):
+        self.battery_raw            = None
+        self.battery_percentage     = None
+        self.battery_charging       = None
+        self.power_connection_state = None
+
+class _AreaScanFields:
+    __slots__ = ("area_scan_row_count", "area_scan_image", "image_format")
+
+    def __init__(self):
+        self.area_scan_row_count = -1
+        self.area_scan_image     = None
+        self.image_format        = None
+
+class _RequestFields:
+    __slots__ = ("take_one_request", "elapsed_from_request", "elapsed_since_last", "new_integration_time_ms", "new_gain_db", "dark")
+
+    def __init__(self):
+        self.take_one_request        = None
+        self.elapsed_from_request    = None
+        self.elapsed_since_last      = None
+        self.new_integration_time_ms = None
+        self.new_gain_db             = None
+        self.dark                    = None
+
+class _StatisticsFields:
+    __slots__ = ("stddev", "snr", "spectrum_min", "spectrum_max")
+
+    def __init__(self):
+        self.stddev       = None
+        self.snr          = None
+        self.spectrum_min = None
+        self.spectrum_max = None
+
+##
+# Descriptor exposing a field of a lazily-allocated group as an ordinary
+# Reading attribute.  Reading the field from an unallocated group returns the
+# default; assigning the default to an unallocated group is a no-op.
+class _GroupField:
+    __slots__ = ("group", "group_class", "name", "default")
+
+    def __init__(self, group, group_class, default=None):
+        self.group = group
+        self.group_class = group_class
+        self.default = default
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        fields = getattr(obj, self.group)
+        return self.default if fields is None else getattr(fields, self.name)
+
+    def __set__(self, obj, value):
+        fields = getattr(obj, self.group)
+        if fields is None:
+            if value is self.default:
+                return
+            fields = self.group_class()
+            setattr(obj, self.group, fields)
+        setattr(fields, self.name, value)
+
 ## 
 # A single set of data read from a device. This includes spectrum,
 # temperature, gain, offset, etc. Essentially a snapshot of the device
 # state in time. 
+#
+# Readings are created for every spectrum (potentially hundreds per second
+# when streaming), so the commonly-populated fields are __slots__, and the 
+# rarely-populated ones (battery, area scan, take-one / AutoRaman) live in 
+# lazily-allocated groups.  A __dict__ is retained so callers can still attach
+# ad-hoc attributes (integration_time_ms, processed etc).
 class Reading:
 
+    __slots__ = (
+        "device_id",
+        "timestamp",
+        "timestamp_complete",
+        "spectrum",
+        "laser_enabled",
+        "laser_temperature_raw",
+        "laser_temperature_degC",
+        "detector_temperature_raw",
+        "detector_temperature_degC",
+        "ambient_temperature_degC",
+        "secondary_adc_raw",
+        "secondary_adc_calibrated",
+        "laser_status",
+        "laser_power_perc",
+        "laser_power_mW",
+        "failure",
+        "averaged",
+        "sum_count",
+        "session_count",
+        "sequence",
+        "dropped_readings",
+        "averaging_path",
+        "laser_can_fire",
+        "laser_is_firing",
+        "laser_tec_enabled",
+        "keep_alive",
+        "protocol",
+        "marks",
+        "_battery",
+        "_area_scan",
+        "_request",
+        "_statistics",
+        "__dict__",
+    )
+
+    # battery (mostly BLE and portable units)
+    battery_raw             = _GroupField("_battery", _BatteryFields)
+    battery_percentage      = _GroupField("_battery", _BatteryFields)
+    battery_charging        = _GroupField("_battery", _BatteryFields)
+    power_connection_state  = _GroupField("_battery", _BatteryFields)
+
+    # area scan and imaging
+    area_scan_row_count     = _GroupField("_area_scan", _AreaScanFields, -1)
+    area_scan_image         = _GroupField("_area_scan", _AreaScanFields)
+    image_format            = _GroupField("_area_scan", _AreaScanFields)
+
+    # TakeOneRequest and AutoRaman
+    take_one_request        = _GroupField("_request", _RequestFields)
+    elapsed_from_request    = _GroupField("_request", _RequestFields)
+    elapsed_since_last      = _GroupField("_request", _RequestFields)
+    new_integration_time_ms = _GroupField("_request", _RequestFields) # only populated by AutoRaman
+    new_gain_db             = _GroupField("_request", _RequestFields) # only populated by AutoRaman
+
+    # for the rare case (BatchCollection with LaserMode "Spectrum") where the 
+    # driver is asked to collect a dark just before enabling the laser
+    dark                    = _GroupField("_request", _RequestFields)
+
+    # per-pixel statistics of the scans contributing to an averaged Reading
+    # (see ScanAverager)
+    stddev                  = _GroupField("_statistics", _StatisticsFields)
+    snr                     = _GroupField("_statistics", _StatisticsFields)
+    spectrum_min            = _GroupField("_statistics", _StatisticsFields)
+    spectrum_max            = _GroupField("_statistics", _StatisticsFields)
+
     def clear(self):
         """ 
         Many of these are (deliberately) historical duplicates of fields in 
@@ -33,29 +176,41 @@ class Reading:
         self.averaged                  = False
         self.sum_count                 = 0
         self.session_count             = 0      # can treat as reading_id
-        self.area_scan_row_count       = -1
-        self.area_scan_image           = None
-        self.battery_raw               = None
-        self.battery_percentage        = None
-        self.battery_charging          = None
-        self.power_connection_state    = None
+        self.sequence                  = None   # per-wrapper sequence number (set by WrapperWorker)
+        self.dropped_readings          = 0      # Readings evicted from the ResponseQueue since the previous one
+        self.averaging_path            = None   # "host" or "onboard" if averaged (see WasatchDevice.select_onboard_averaging)
         self.laser_can_fire            = False  # per interlock board
         self.laser_is_firing           = False  # per interlock board, not laser_enable
         self.laser_tec_enabled         = False
-        self.take_one_request          = None
-        self.elapsed_from_request      = None
-        self.elapsed_since_last        = None
         self.keep_alive                = False
-        self.image_format              = None
         self.protocol                  = None
+        self.marks                     = None   # LatencyMarks, where supported
+
+        # lazily-allocated groups (see class attributes)
+        self._battery                  = None
+        self._area_scan                = None
+        self._request                  = None
+        self._statistics               = None
 
-        # only populated by AutoRaman
-        self.new_integration_time_ms   = None
-        self.new_gain_db               = None
+    ## shallow copies shouldn't share (mutable) field groups
+    def __copy__(self):
+        cls = self.__class__
+        other = cls.__new__(cls)
+        for name in cls.__slots__[:-1]:
+            try:
+                setattr(other, name, getattr(self, name))
+            except AttributeError:
+                pass
+        other.__dict__.update(self.__dict__)
 
-        # for the rare case (BatchCollection with LaserMode "Spectrum") where the 
-        # driver is asked to collect a dark just before enabling the laser
-        self.dark                      = None
+        for group in ("_battery", "_area_scan", "_request", "_statistics"):
+            fields = getattr(self, group, None)
+            if fields is not None:
+                copied = fields.__class__.__new__(fields.__class__)
+                for name in fields.__slots__:
+                    setattr(copied, name, getattr(fields, name))
+                setattr(other, group, copied)
+        return other
 
     def is_auto_raman(self):
         return self.take_one_request and self.take_one_request.auto_raman_request
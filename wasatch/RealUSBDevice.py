@@ -39,6 +39,13 @@ class RealUSBDevice(AbstractUSBDevice):
         read_args = args[1:]
         return device.read(*read_args, **kwargs)
 
+    def read_into(self, device, endpoint, buffer, timeout=None):
+        """
+        pyusb reads directly into the passed array.array and returns the 
+        number of bytes received, without allocating a new array.
+        """
+        return device.read(endpoint, buffer, timeout=timeout)
+
     def send_code(self):
         pass
 
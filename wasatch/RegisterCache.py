@@ -0,0 +1,292 @@
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+##
+# Read-through cache of FeatureIdentificationDevice control-transfer reads
+# (_get_code / get_upper_code), keyed by (bRequest, wValue, wIndex).
+#
+# Each cacheable getter carries a policy: either STATIC (can't change during a
+# session, like firmware versions, FPGA compilation options and EEPROM pages)
+# or a TTL in seconds.  Opcodes without a policy (GET_ADC, GET_POLL_STATUS,
+# GET_LOG etc) are never cached.
+#
+# "Second-tier" opcodes (bRequest 0xff) are looked-up by (0xff, wValue), as
+# wValue is the actual sub-opcode; first-tier opcodes by bRequest alone.
+#
+# Whenever _send_code writes a register, any getters which read-back the same
+# register are invalidated via INVALIDATED_BY.  Writes which reset the device
+# state wholesale (RESET_FPGA, DFU) clear everything, as should connect,
+# disconnect and reset.
+#
+# The same class also provides write-suppression: the last value written via
+# each idempotent setter in SUPPRESSIBLE_WRITES is remembered, and _send_code
+# skips re-sending an identical value (unless forced).  Opcodes with side-
+# effects beyond storing a value (laser enable, ACQUIRE, EEPROM writes, FPGA 
+# reset, SELECT_ADC etc) are never suppressed.
+class RegisterCache:
+
+    STATIC = "static"
+
+    # TTL applied to registers the driver itself normally sets
+    SETTING_TTL_SEC = 1.0
+
+    POLICIES = {
+        # static for session
+        0xc0         : STATIC,          # GET_CODE_REVISION
+        0xb4         : STATIC,          # GET_FPGA_REV
+        (0xff, 0x01) : STATIC,          # GET_MODEL_CONFIG (EEPROM)
+        (0xff, 0x03) : STATIC,          # GET_LINE_LENGTH
+        (0xff, 0x04) : STATIC,          # READ_COMPILATION_OPTIONS
+        (0xff, 0x05) : STATIC,          # GET_OPT_INTEGRATION_TIME_RESOLUTION
+        (0xff, 0x06) : STATIC,          # GET_OPT_DATA_HEADER_TAB
+        (0xff, 0x07) : STATIC,          # GET_OPT_CF_SELECT
+        (0xff, 0x08) : STATIC,          # GET_OPT_HAS_LASER
+        (0xff, 0x09) : STATIC,          # GET_OPT_LASER_CONTROL
+        (0xff, 0x0a) : STATIC,          # GET_OPT_AREA_SCAN
+        (0xff, 0x0b) : STATIC,          # GET_OPT_ACT_INT_TIME
+        (0xff, 0x0c) : STATIC,          # GET_OPT_HORIZONTAL_BINNING
+        (0xff, 0x2c) : STATIC,          # GET_MICROCONTROLLER_SERIAL_NUMBER
+        (0xff, 0x2d) : STATIC,          # GET_BLE_FIRMWARE_VERSION
+
+        # acquisition parameters normally set by the driver
+        0xbf         : SETTING_TTL_SEC, # GET_INTEGRATION_TIME_MS
+        0xc5         : SETTING_TTL_SEC, # GET_DETECTOR_GAIN
+        0x9f         : SETTING_TTL_SEC, # GET_DETECTOR_GAIN_ODD
+        0xc4         : SETTING_TTL_SEC, # GET_DETECTOR_OFFSET
+        0x9e         : SETTING_TTL_SEC, # GET_DETECTOR_OFFSET_ODD
+        0xd3         : SETTING_TTL_SEC, # GET_TRIGGER_SOURCE
+        0xec         : SETTING_TTL_SEC, # GET_HIGH_GAIN_MODE_ENABLED
+        0xee         : SETTING_TTL_SEC, # GET_SELECTED_ADC
+        0xda         : SETTING_TTL_SEC, # GET_CCD_TEC_ENABLED
+        0x85         : SETTING_TTL_SEC, # GET_LASER_TEC_MODE
+        0xe8         : SETTING_TTL_SEC, # GET_LASER_TEC_SETPOINT
+        0x8b         : SETTING_TTL_SEC, # GET_LASER_WARNING_DELAY_SEC
+        0xe3         : SETTING_TTL_SEC, # GET_MOD_ENABLED
+        0xcb         : SETTING_TTL_SEC, # GET_MOD_PERIOD
+        0xdc         : SETTING_TTL_SEC, # GET_MOD_WIDTH
+        0xca         : SETTING_TTL_SEC, # GET_MOD_DELAY
+        0xc3         : SETTING_TTL_SEC, # GET_MOD_DURATION
+        0xde         : SETTING_TTL_SEC, # GET_MOD_LINKED_TO_INTEGRATION
+        0x37         : SETTING_TTL_SEC, # GET_ACCESSORY_ENABLED / GET_FAN_ENABLED
+        0x33         : SETTING_TTL_SEC, # GET_LAMP_ENABLED
+        0x31         : SETTING_TTL_SEC, # GET_SHUTTER_ENABLED
+        (0xff, 0x15) : SETTING_TTL_SEC, # GET_RAMAN_MODE_ENABLED
+        (0xff, 0x17) : SETTING_TTL_SEC, # GET_LASER_WATCHDOG_SEC
+        (0xff, 0x19) : SETTING_TTL_SEC, # GET_RAMAN_DELAY_MS
+        (0xff, 0x1a) : SETTING_TTL_SEC, # GET_ANALOG_OUT_STATE
+        (0xff, 0x63) : SETTING_TTL_SEC, # GET_ONBOARD_SCANS_TO_AVERAGE
+
+        # laser state can change underneath us (interlock, watchdog)
+        0xe2         : 0.1,             # GET_LASER_ENABLED
+        0xef         : 0.1,             # CAN_LASER_FIRE
+        (0xff, 0x0d) : 0.1,             # IS_LASER_FIRING
+
+        # sensors (formerly ad-hoc caches in the getters)
+        0xd7         : 0.1,             # GET_CCD_TEMP (don't poll faster than 10Hz on FX2)
+        (0xff, 0x13) : 1.0,             # GET_BATTERY_STATE
+    }
+
+    ## setter -> list of getters reading the same register
+    INVALIDATED_BY = {
+        0xb2         : [ 0xbf ],                        # SET_INTEGRATION_TIME_MS
+        0xb7         : [ 0xc5 ],                        # SET_DETECTOR_GAIN
+        0x9d         : [ 0x9f ],                        # SET_DETECTOR_GAIN_ODD
+        0xb6         : [ 0xc4 ],                        # SET_DETECTOR_OFFSET
+        0x9c         : [ 0x9e ],                        # SET_DETECTOR_OFFSET_ODD
+        0xd2         : [ 0xd3 ],                        # SET_TRIGGER_SOURCE
+        0xeb         : [ 0xec ],                        # SET_HIGH_GAIN_MODE_ENABLE / SET_AREA_SCAN_ENABLE
+        0xed         : [ 0xee ],                        # SELECT_ADC
+        0xd6         : [ 0xda ],                        # SET_DETECTOR_TEC_ENABLE
+        0xbe         : [ 0xe2, 0xef, (0xff, 0x0d) ],    # SET_LASER_ENABLE
+        0x84         : [ 0x85 ],                        # SET_LASER_TEC_MODE
+        0xe7         : [ 0xe8 ],                        # SET_LASER_TEC_SETPOINT
+        0x8a         : [ 0x8b ],                        # SET_LASER_WARNING_DELAY_SEC
+        0xbd         : [ 0xe3 ],                        # SET_MOD_ENABLE
+        0xc7         : [ 0xcb ],                        # SET_MOD_PERIOD
+        0xdb         : [ 0xdc ],                        # SET_MOD_WIDTH
+        0xc6         : [ 0xca ],                        # SET_MOD_DELAY
+        0xb9         : [ 0xc3 ],                        # SET_MOD_DURATION
+        0xdd         : [ 0xde ],                        # SET_MOD_LINKED_TO_INTEGRATION
+        0x22         : [ 0x37 ],                        # SET_ACCESSORY_ENABLE
+        0x36         : [ 0x37 ],                        # SET_FAN_ENABLE
+        0x32         : [ 0x33 ],                        # SET_LAMP_ENABLE
+        0x30         : [ 0x31 ],                        # SET_SHUTTER_ENABLE
+        0xa2         : [ (0xff, 0x01) ],                # WRITE_EEPROM (legacy)
+        (0xff, 0x02) : [ (0xff, 0x01) ],                # WRITE_EEPROM
+        (0xff, 0x11) : [ (0xff, 0x1a) ],                # SET_ANALOG_OUT_MODE
+        (0xff, 0x12) : [ (0xff, 0x1a) ],                # SET_ANALOG_OUT_VALUE
+        (0xff, 0x16) : [ (0xff, 0x15), 0xe2 ],          # SET_RAMAN_MODE_ENABLE
+        (0xff, 0x18) : [ (0xff, 0x17) ],                # SET_LASER_WATCHDOG_SEC
+        (0xff, 0x20) : [ (0xff, 0x19) ],                # SET_RAMAN_DELAY_MS
+        (0xff, 0x62) : [ (0xff, 0x63) ],                # SET_ONBOARD_SCANS_TO_AVERAGE
+    }
+
+    ## writes after which nothing previously read can be trusted
+    CLEARED_BY = { 0xb5, 0xfe } # RESET_FPGA, SET_DFU_ENABLE
+
+    ## setters which simply store a value, and can be skipped if unchanged
+    SUPPRESSIBLE_WRITES = {
+        0xb2,                   # SET_INTEGRATION_TIME_MS
+        0xb7,                   # SET_DETECTOR_GAIN
+        0x9d,                   # SET_DETECTOR_GAIN_ODD
+        0xb6,                   # SET_DETECTOR_OFFSET
+        0x9c,                   # SET_DETECTOR_OFFSET_ODD
+        0xd2,                   # SET_TRIGGER_SOURCE
+        0xd6,                   # SET_DETECTOR_TEC_ENABLE
+        0xd8,                   # SET_DETECTOR_TEC_SETPOINT
+        0x84,                   # SET_LASER_TEC_MODE
+        0xe7,                   # SET_LASER_TEC_SETPOINT
+        0x8a,                   # SET_LASER_WARNING_DELAY_SEC
+        0xbd,                   # SET_MOD_ENABLE
+        0xc7,                   # SET_MOD_PERIOD
+        0xdb,                   # SET_MOD_WIDTH
+        0xc6,                   # SET_MOD_DELAY
+        0xb9,                   # SET_MOD_DURATION
+        0xdd,                   # SET_MOD_LINKED_TO_INTEGRATION
+        0x22,                   # SET_ACCESSORY_ENABLE
+        0x36,                   # SET_FAN_ENABLE
+        0x32,                   # SET_LAMP_ENABLE
+        0x30,                   # SET_SHUTTER_ENABLE
+        (0xff, 0x11),           # SET_ANALOG_OUT_MODE
+        (0xff, 0x12),           # SET_ANALOG_OUT_VALUE
+        (0xff, 0x16),           # SET_RAMAN_MODE_ENABLE
+        (0xff, 0x18),           # SET_LASER_WATCHDOG_SEC
+        (0xff, 0x20),           # SET_RAMAN_DELAY_MS
+        (0xff, 0x62),           # SET_ONBOARD_SCANS_TO_AVERAGE
+    }
+
+    ## writes after which firmware may have changed other (suppressible) registers
+    FORGETS_WRITES = {
+        0xbe         : [ 0xbd, 0xc7, 0xdb, 0xc6, 0xb9, 0xdd ],  # SET_LASER_ENABLE (modulation)
+        0xeb         : None,                                    # SET_AREA_SCAN_ENABLE / SET_HIGH_GAIN_MODE_ENABLE (all)
+        (0xff, 0x25) : None,                                    # SET_DETECTOR_ROI (all)
+    }
+
+    def __init__(self):
+        self.enabled = True
+        self.entries = {} # (bRequest, wValue, wIndex) -> (timestamp, result)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self.suppress_writes = True
+        self.last_written = {} # policy key -> (wValue, wIndex, data)
+        self.suppressed = 0
+
+    def __repr__(self):
+        return f"RegisterCache <entries {len(self.entries)}, hits {self.hits}, misses {self.misses}, invalidations {self.invalidations}, suppressed {self.suppressed}>"
+
+    @staticmethod
+    def _policy_key(bRequest, wValue):
+        return (bRequest, wValue) if bRequest == 0xff else bRequest
+
+    def clear(self):
+        if self.entries or self.last_written:
+            log.debug(f"clearing {self}")
+        self.entries = {}
+        self.last_written = {}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.suppressed = 0
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return { "enabled"       : self.enabled,
+                 "entries"       : len(self.entries),
+                 "hits"          : self.hits,
+                 "misses"        : self.misses,
+                 "invalidations" : self.invalidations,
+                 "suppressed"    : self.suppressed,
+                 "hit_rate"      : (self.hits / total) if total else 0.0 }
+
+    ##
+    # @returns a copy of the cached result, or None on miss (or if uncacheable)
+    def get(self, bRequest, wValue, wIndex):
+        if not self.enabled:
+            return None
+
+        policy = self.POLICIES.get(self._policy_key(bRequest, wValue))
+        if policy is None:
+            return None
+
+        entry = self.entries.get((bRequest, wValue, wIndex))
+        if entry is not None:
+            timestamp, result = entry
+            if policy == self.STATIC or time.monotonic() - timestamp < policy:
+                self.hits += 1
+                return result[:]
+
+        self.misses += 1
+        return None
+
+    def put(self, bRequest, wValue, wIndex, result):
+        if not self.enabled or result is None:
+            return
+        if self._policy_key(bRequest, wValue) not in self.POLICIES:
+            return
+        self.entries[(bRequest, wValue, wIndex)] = (time.monotonic(), result[:])
+
+    ## called by _send_code before every write
+    def invalidate_for_write(self, bRequest, wValue):
+        if bRequest in self.CLEARED_BY:
+            self.clear()
+            return
+
+        getters = self.INVALIDATED_BY.get(self._policy_key(bRequest, wValue))
+        if not getters or not self.entries:
+            return
+
+        for key in list(self.entries.keys()):
+            if self._policy_key(key[0], key[1]) in getters:
+                del self.entries[key]
+                self.invalidations += 1
+
+    # ##########################################################################
+    # write suppression
+    # ##########################################################################
+
+    @staticmethod
+    def _write_value(wValue, wIndex, data):
+        if isinstance(data, (list, tuple, bytes, bytearray)):
+            data = tuple(data)
+        return (wValue, wIndex, data)
+
+    def is_suppressible(self, bRequest, wValue=0):
+        return self._policy_key(bRequest, wValue) in self.SUPPRESSIBLE_WRITES
+
+    ## @returns True if this write would re-send the value last written
+    def is_redundant_write(self, bRequest, wValue, wIndex, data):
+        if not self.suppress_writes:
+            return False
+
+        key = self._policy_key(bRequest, wValue)
+        if key not in self.SUPPRESSIBLE_WRITES:
+            return False
+
+        if self.last_written.get(key) == self._write_value(wValue, wIndex, data):
+            self.suppressed += 1
+            return True
+        return False
+
+    ## called by _send_code after every successful write
+    def record_write(self, bRequest, wValue, wIndex, data):
+        key = self._policy_key(bRequest, wValue)
+        if key in self.FORGETS_WRITES:
+            forgotten = self.FORGETS_WRITES[key]
+            if forgotten is None:
+                self.last_written = {}
+            else:
+                for k in forgotten:
+                    self.last_written.pop(k, None)
+
+        if key in self.SUPPRESSIBLE_WRITES:
+            self.last_written[key] = self._write_value(wValue, wIndex, data)
+
+    ## called by _send_code when a write fails (leaving the register unknown)
+    def forget_write(self, bRequest, wValue=0):
+        self.last_written.pop(self._policy_key(bRequest, wValue), None)
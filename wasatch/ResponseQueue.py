@@ -0,0 +1,176 @@
+import logging
+import threading
+
+from collections import deque
+from queue       import Full, Empty
+
+from .SpectrometerResponse import SpectrometerResponse
+from .Reading              import Reading
+from .LatencyMarks         import LatencyHistogram
+
+log = logging.getLogger(__name__)
+
+##
+# A bounded, thread-safe replacement for the Queue carrying SpectrometerResponses
+# from WrapperWorker up to WasatchDeviceWrapper, with an explicit policy for
+# what happens when the consumer falls behind.
+#
+# Provides the subset of the queue.Queue interface used by Wasatch.PY (put,
+# put_nowait, get, get_nowait, qsize, empty, full).
+#
+# Poison-pills and error responses are never evicted by any policy (though they
+# still count against maxsize).  Whenever Readings are evicted, the number
+# dropped since the last dequeued Reading is stamped into the next Reading
+# dequeued, as Reading.dropped_readings.  DROP_OLDEST evicts from the head in
+# O(1); the KEEP_LATEST policies scan what little they leave queued.
+#
+# Each dequeued Reading's LatencyMarks are stamped "dequeued" and added to
+# self.latency (see WasatchDeviceWrapper.get_latency_stats).
+class ResponseQueue:
+
+    KEEP_LATEST          = "keep_latest"            # only the newest Reading is retained
+    KEEP_LATEST_AVERAGED = "keep_latest_averaged"   # newest Reading, plus newest fully-averaged Reading
+    KEEP_ALL_BLOCKING    = "keep_all_blocking"      # nothing dropped; producer blocks when full
+    DROP_OLDEST          = "drop_oldest"            # when full, oldest Readings are evicted
+
+    POLICIES = [ KEEP_LATEST, KEEP_LATEST_AVERAGED, KEEP_ALL_BLOCKING, DROP_OLDEST ]
+
+    DEFAULT_MAXSIZE = 1000
+
+    def __init__(self, policy=DROP_OLDEST, maxsize=DEFAULT_MAXSIZE):
+        if policy not in self.POLICIES:
+            raise ValueError(f"unsupported ResponseQueue policy {policy}")
+
+        self.policy = policy
+        self.maxsize = max(1, maxsize)
+
+        self.items = deque()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+
+        self.dropped = 0          # total Readings evicted this session
+        self.pending_dropped = 0  # evicted since the last Reading was dequeued
+        self.latency = LatencyHistogram()
+
+    def __repr__(self):
+        return f"ResponseQueue <policy {self.policy}, size {len(self.items)} of {self.maxsize}, dropped {self.dropped}>"
+
+    def qsize(self):
+        with self.lock:
+            return len(self.items)
+
+    def empty(self):
+        with self.lock:
+            return len(self.items) == 0
+
+    def full(self):
+        with self.lock:
+            return len(self.items) >= self.maxsize
+
+    def put_nowait(self, item):
+        return self.put(item, block=False)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            if self.policy == self.KEEP_ALL_BLOCKING:
+                if len(self.items) >= self.maxsize:
+                    if not block:
+                        raise Full
+                    if not self.not_full.wait_for(lambda: len(self.items) < self.maxsize, timeout):
+                        raise Full
+            else:
+                if self.is_evictable(item):
+                    if self.policy == self.KEEP_LATEST:
+                        self._evict(lambda old: True)
+                    elif self.policy == self.KEEP_LATEST_AVERAGED:
+                        if self._is_averaged(item):
+                            self._evict(lambda old: True)
+                        else:
+                            self._evict(lambda old: not self._is_averaged(old))
+
+                # applies to every non-blocking policy, as a backstop
+                while len(self.items) >= self.maxsize:
+                    if not self._evict_oldest():
+                        break # nothing evictable...errors will be delivered regardless
+
+            self.items.append(item)
+            self.not_empty.notify()
+
+    def get(self, block=True, timeout=None):
+        with self.not_empty:
+            if not self.items:
+                if not block:
+                    raise Empty
+                if not self.not_empty.wait_for(lambda: len(self.items) > 0, timeout):
+                    raise Empty
+
+            item = self.items.popleft()
+            self.not_full.notify()
+
+            if self.pending_dropped and isinstance(item, SpectrometerResponse) and isinstance(item.data, Reading):
+                item.data.dropped_readings = self.pending_dropped
+                self.pending_dropped = 0
+
+        self.record_latency(item)
+        return item
+
+    ## stamp and record a Reading's LatencyMarks as it is handed to the consumer
+    def record_latency(self, item):
+        if isinstance(item, SpectrometerResponse) and isinstance(item.data, Reading) and item.data.marks is not None:
+            item.data.marks.mark("dequeued")
+            self.latency.add(item.data.marks)
+
+    ## 
+    # Return evictions reported on a Reading the caller then discarded (see
+    # WasatchDeviceWrapper.get_final_item), so they're stamped on the next one.
+    def restore_dropped(self, count):
+        if count:
+            with self.lock:
+                self.pending_dropped += count
+
+    ## 
+    # Evict the oldest evictable item.  That's almost always the head, so 
+    # this is O(1) unless errors or poison-pills are queued ahead of it.
+    #
+    # @returns count of items evicted (lock must be held)
+    def _evict_oldest(self):
+        if self.items and self.is_evictable(self.items[0]):
+            self._dropped(self.items.popleft())
+            log.debug("evicted oldest response (%s)", self)
+            return 1
+        return self._evict(lambda old: True, count=1)
+
+    ## @returns count of items evicted (lock must be held)
+    def _evict(self, predicate, count=None):
+        kept = deque()
+        evicted = 0
+        for old in self.items:
+            if (count is None or evicted < count) and self.is_evictable(old) and predicate(old):
+                evicted += 1
+                self._dropped(old)
+            else:
+                kept.append(old)
+
+        if evicted:
+            self.items = kept
+            log.debug("evicted %d responses (%s)", evicted, self)
+        return evicted
+
+    def _dropped(self, item):
+        if isinstance(item.data, Reading):
+            self.dropped += 1
+            self.pending_dropped += 1
+
+    ## poison-pills and error responses are never evicted (also used by AsyncSpectrometer)
+    @staticmethod
+    def is_evictable(item):
+        return isinstance(item, SpectrometerResponse) and \
+               not item.poison_pill and \
+               not item.error_msg
+
+    def _is_averaged(self, item):
+        return isinstance(item.data, Reading) and item.data.averaged
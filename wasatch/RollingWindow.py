@@ -0,0 +1,70 @@
+import logging
+
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+##
+# A bounded window of the most recent samples, kept separately per key, from
+# which quantiles can be drawn.
+#
+# FeatureIdentificationDevice uses one of these to track the observed
+# acquire-to-data latency of each (integration time, onboard scans) setting,
+# so that bulk-read timeouts can follow what the spectrometer actually does
+# rather than a worst-case formula (see generate_timeout_ms).
+#
+# Windows are small (a few hundred floats), so quantile() simply sorts a
+# copy; it's called once per acquisition, not per pixel.
+class RollingWindow:
+
+    DEFAULT_SIZE = 200
+    DEFAULT_MIN_SAMPLES = 20
+
+    ##
+    # @param size (Input) samples retained per key
+    # @param min_samples (Input) quantile() returns None until a key has this many
+    # @param max_keys (Input) least-recently-updated keys are forgotten beyond this
+    def __init__(self, size=DEFAULT_SIZE, min_samples=DEFAULT_MIN_SAMPLES, max_keys=32):
+        self.size = size
+        self.min_samples = min_samples
+        self.max_keys = max_keys
+        self.windows = {}
+
+    def __repr__(self):
+        return f"RollingWindow <{len(self.windows)} keys, size {self.size}>"
+
+    def add(self, key, value):
+        window = self.windows.pop(key, None)
+        if window is None:
+            window = deque(maxlen=self.size)
+            if len(self.windows) >= self.max_keys:
+                del self.windows[next(iter(self.windows))]
+        window.append(value)
+        self.windows[key] = window # re-insert as most recent
+
+    def count(self, key):
+        window = self.windows.get(key)
+        return 0 if window is None else len(window)
+
+    ##
+    # @param q (Input) quantile in [0, 1] (e.g. 0.99)
+    # @returns the (nearest-rank) q-quantile of key's window, or None if it
+    #          has fewer than min_samples
+    def quantile(self, key, q):
+        window = self.windows.get(key)
+        if window is None or len(window) < self.min_samples:
+            return None
+        values = sorted(window)
+        index = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+        return values[index]
+
+    def clear(self, key=None):
+        if key is None:
+            self.windows = {}
+        else:
+            self.windows.pop(key, None)
+
+    def get_stats(self):
+        """ @returns dict of key -> (count, p50, p99) for logging / diagnostics """
+        return { key: (len(window), self.quantile(key, 0.5), self.quantile(key, 0.99))
+                 for key, window in self.windows.items() }
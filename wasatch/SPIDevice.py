@@ -28,6 +28,7 @@ from .SpectrometerResponse        import ErrorLevel
 from .DeviceID                    import DeviceID
 from .InterfaceDevice             import InterfaceDevice
 from .Reading                     import Reading
+from .ScanAverager                import ScanAverager
 from .EEPROM                      import EEPROM
 
 import crcmod.predefined
@@ -141,8 +142,7 @@ class SPIDevice(InterfaceDevice):
         self.immediate_mode = False
 
         self.settings = SpectrometerSettings(self.device_id)
-        self.summed_spectra         = None
-        self.sum_count              = 0
+        self.averager               = ScanAverager()
         self.session_reading_count  = 0
         self.take_one               = False
         self.failure_count          = 0
@@ -285,14 +285,8 @@ class SPIDevice(InterfaceDevice):
 
         if not reading.failure:
             if averaging_enabled:
-                if self.sum_count == 0:
-                    self.summed_spectra = [float(i) for i in reading.spectrum]
-                else:
-                    log.debug("device.take_one_averaged_reading: summing spectra")
-                    for i in range(len(self.summed_spectra)):
-                        self.summed_spectra[i] += reading.spectrum[i]
-                self.sum_count += 1
-                log.debug("device.take_one_averaged_reading: summed_spectra : %s ...", self.summed_spectra[0:9])
+                self.averager.add(reading.spectrum)
+                log.debug(f"device.take_one_averaged_reading: summing spectra ({self.averager})")
 
         if self.settings.eeprom.horiz_binning_enabled:
             # perform the 2x2 bin software side
@@ -304,17 +298,15 @@ class SPIDevice(InterfaceDevice):
 
         self.session_reading_count += 1
         reading.session_count = self.session_reading_count
-        reading.sum_count = self.sum_count
+        reading.sum_count = self.averager.count
 
         if averaging_enabled:
-            if self.sum_count >= self.settings.state.scans_to_average:
-                reading.spectrum = [ x / self.sum_count for x in self.summed_spectra ]
+            if self.averager.count >= self.settings.state.scans_to_average:
+                self.averager.apply(reading)
                 log.debug("spi device acquire data: averaged_spectrum : %s ...", reading.spectrum[0:9])
-                reading.averaged = True
 
                 # reset for next average
-                self.summed_spectra = None
-                self.sum_count = 0
+                self.averager.reset()
         else:
             # if averaging isn't enabled...then a single reading is the
             # "averaged" final measurement (check reading.sum_count to confirm)
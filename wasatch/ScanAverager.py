@@ -0,0 +1,134 @@
+import logging
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+##
+# Accumulates a series of spectra into a running per-pixel mean, variance,
+# minimum and maximum (Welford's online algorithm), so that scan averaging
+# yields noise statistics from the same pass.
+#
+# All buffers are float64 ndarrays allocated on the first spectrum (and only
+# re-allocated if the pixel count changes); add() updates them in-place, so
+# averaging many scans costs a handful of vectorized operations per scan and
+# no per-pixel Python.
+#
+# Shared by WasatchDevice, SPIDevice, OceanDevice and IDSDevice.  Each device
+# owns one averager, calls add() for each spectrum and reset() whenever
+# scans_to_average (or anything else invalidating the average) changes.
+class ScanAverager:
+
+    def __init__(self):
+        self.pixels  = 0
+        self.mean    = None
+        self.m2      = None  # sum of squared differences from the running mean
+        self.min     = None
+        self.max     = None
+        self.delta   = None  # scratch
+        self.scratch = None
+        self.reset()
+
+    def __repr__(self):
+        return f"ScanAverager <count {self.count}, pixels {self.pixels}>"
+
+    def reset(self):
+        """ start a new average (buffers are retained) """
+        self.count = 0
+
+    def _allocate(self, pixels):
+        log.debug(f"allocating {pixels}-pixel buffers")
+        self.pixels  = pixels
+        self.mean    = np.zeros(pixels, dtype=np.float64)
+        self.m2      = np.zeros(pixels, dtype=np.float64)
+        self.min     = np.zeros(pixels, dtype=np.float64)
+        self.max     = np.zeros(pixels, dtype=np.float64)
+        self.delta   = np.zeros(pixels, dtype=np.float64)
+        self.scratch = np.zeros(pixels, dtype=np.float64)
+
+    ##
+    # Add one spectrum to the running statistics.
+    #
+    # @param spectrum (Input) list or ndarray
+    # @returns the number of spectra now averaged
+    def add(self, spectrum):
+        spectrum = np.asarray(spectrum, dtype=np.float64)
+        if len(spectrum) != self.pixels:
+            if self.count:
+                log.error(f"spectrum length changed from {self.pixels} to {len(spectrum)}...restarting average")
+            self._allocate(len(spectrum))
+            self.count = 0
+
+        if self.count == 0:
+            self.mean[:] = spectrum
+            self.m2.fill(0)
+            self.min[:] = spectrum
+            self.max[:] = spectrum
+            self.count = 1
+            return self.count
+
+        self.count += 1
+
+        # delta = x - mean; mean += delta / n; m2 += delta * (x - mean)
+        delta, scratch = self.delta, self.scratch
+        np.subtract(spectrum, self.mean, out=delta)
+        np.divide(delta, self.count, out=scratch)
+        self.mean += scratch
+        np.subtract(spectrum, self.mean, out=scratch)
+        delta *= scratch
+        self.m2 += delta
+
+        np.minimum(self.min, spectrum, out=self.min)
+        np.maximum(self.max, spectrum, out=self.max)
+        return self.count
+
+    def get_mean(self):
+        """ @returns a copy of the per-pixel mean (None if nothing added) """
+        if not self.count:
+            return None
+        return self.mean.copy()
+
+    def get_variance(self):
+        """ @returns per-pixel sample variance (zeros until 2 spectra are added) """
+        if not self.count:
+            return None
+        if self.count < 2:
+            return np.zeros(self.pixels)
+        return self.m2 / (self.count - 1)
+
+    def get_stddev(self):
+        variance = self.get_variance()
+        return None if variance is None else np.sqrt(variance)
+
+    def get_min(self):
+        return None if not self.count else self.min.copy()
+
+    def get_max(self):
+        return None if not self.count else self.max.copy()
+
+    ##
+    # Per-pixel signal-to-noise ratio of the individual scans (mean / stddev).
+    # Pixels with no measured noise report 0.
+    def get_snr(self):
+        if self.count < 2:
+            return None
+        stddev = self.get_stddev()
+        return np.divide(self.mean, stddev, out=np.zeros(self.pixels), where=stddev > 0)
+
+    ##
+    # Store the completed average and its statistics into the Reading.
+    #
+    # @param decimals (Input) optionally round the averaged spectrum
+    def apply(self, reading, decimals=None):
+        mean = self.get_mean()
+        if mean is None:
+            return
+        if decimals is not None:
+            mean = np.round(mean, decimals)
+
+        reading.spectrum     = mean
+        reading.averaged     = True
+        reading.sum_count    = self.count
+        reading.stddev       = self.get_stddev()
+        reading.snr          = self.get_snr()
+        reading.spectrum_min = self.get_min()
+        reading.spectrum_max = self.get_max()
@@ -0,0 +1,194 @@
+import copy
+import logging
+import multiprocessing
+import numpy as np
+
+from multiprocessing import shared_memory
+
+log = logging.getLogger(__name__)
+
+##
+# The small, picklable part of a Reading published through a
+# SharedSpectrumRing: which slot holds the spectrum, the sequence number the
+# slot must still carry for the spectrum to be valid, and the Reading itself
+# (all metadata, but with spectrum=None).
+class SharedSpectrumHeader:
+
+    def __init__(self, slot, sequence, pixels, reading):
+        self.slot     = slot
+        self.sequence = sequence
+        self.pixels   = pixels
+        self.reading  = reading
+
+    def __repr__(self):
+        return f"SharedSpectrumHeader <slot {self.slot}, sequence {self.sequence}, pixels {self.pixels}>"
+
+##
+# An optional transport for streaming spectra to consumers in OTHER processes,
+# without pickling each spectrum through a multiprocessing queue.
+#
+# Spectra are written into a multiprocessing.shared_memory ring of fixed-size
+# slots (float64 by default, or e.g. uint16 for raw counts); only a
+# SharedSpectrumHeader is sent over header_queue (a multiprocessing.Queue).
+# Readers get zero-copy NumPy views into the ring.
+#
+# The shared block starts with one int64 per slot holding the sequence number
+# of the spectrum currently in that slot (-1 while being written), so readers
+# can confirm a view hasn't been overwritten.  The header_queue is bounded at
+# (slots - 2), so the writer blocks (see WrapperWorker.enqueue) rather than
+# overwriting a slot whose header is still queued; consumers wishing to retain
+# a spectrum beyond the next few reads should request a copy.
+#
+# The ring is created by WasatchDeviceWrapper (shared_memory=True).  To use it
+# from another process, pass the wrapper's transport object as an argument to
+# multiprocessing.Process: pickling it carries the attachment parameters and
+# header_queue, and it re-attaches (without ownership) on the other side.
+#
+# @verbatim
+#   def consumer(ring):
+#       while True:
+#           header = ring.header_queue.get()
+#           reading = ring.get_reading(header)  # None if overwritten
+# @endverbatim
+class SharedSpectrumRing:
+
+    DEFAULT_SLOTS = 64
+    DEFAULT_MAX_PIXELS = 4096
+
+    ##
+    # @param context (Input) multiprocessing context in which to create the
+    #        header_queue (must match that of any Process it's passed to)
+    def __init__(self, slots=DEFAULT_SLOTS, max_pixels=DEFAULT_MAX_PIXELS, dtype="float64", name=None, header_queue=None, context=None):
+        self.slots      = max(3, slots)
+        self.max_pixels = max_pixels
+        self.dtype      = np.dtype(dtype)
+        self.owner      = name is None
+        self.closed     = False
+
+        header_bytes = self.slots * 8
+        if self.owner:
+            size = header_bytes + self.slots * self.max_pixels * self.dtype.itemsize
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            # (child processes share the owner's resource tracker, so 
+            # attaching doesn't risk the block being unlinked when they exit)
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.name = self.shm.name
+        self.sequences = np.ndarray((self.slots,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        self.data = np.ndarray((self.slots, self.max_pixels), dtype=self.dtype, buffer=self.shm.buf, offset=header_bytes)
+
+        if self.owner:
+            self.sequences[:] = -1
+            header_queue = (context or multiprocessing).Queue(maxsize=self.slots - 2)
+        self.header_queue = header_queue
+
+        self.next_sequence = 0
+
+        log.debug(f"{'created' if self.owner else 'attached'} {self}")
+
+    def __repr__(self):
+        return f"SharedSpectrumRing <name {self.name}, slots {self.slots}, max_pixels {self.max_pixels}, dtype {self.dtype}>"
+
+    ##
+    # Only the attachment parameters are pickled; the receiving process
+    # re-attaches to the existing block (see class notes).
+    def __getstate__(self):
+        return { "slots"        : self.slots,
+                 "max_pixels"   : self.max_pixels,
+                 "dtype"        : self.dtype.str,
+                 "name"         : self.name,
+                 "header_queue" : self.header_queue }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    # ##########################################################################
+    # writer
+    # ##########################################################################
+
+    ##
+    # Copy the Reading's spectrum into the next slot.
+    #
+    # @returns SharedSpectrumHeader to be sent over header_queue (None on error)
+    def write(self, reading):
+        if self.closed:
+            return None
+
+        pixels = len(reading.spectrum)
+        if pixels > self.max_pixels:
+            log.error(f"write: spectrum of {pixels} pixels exceeds max_pixels {self.max_pixels}")
+            return None
+
+        sequence = self.next_sequence
+        slot = sequence % self.slots
+        self.next_sequence += 1
+
+        self.sequences[slot] = -1
+        self.data[slot, :pixels] = reading.spectrum
+        self.sequences[slot] = sequence
+
+        metadata = copy.copy(reading)
+        metadata.spectrum = None
+        return SharedSpectrumHeader(slot, sequence, pixels, metadata)
+
+    # ##########################################################################
+    # reader
+    # ##########################################################################
+
+    def is_current(self, header):
+        """ whether the header's slot still holds its spectrum """
+        return not self.closed and self.sequences[header.slot] == header.sequence
+
+    ##
+    # @param copy (Input) if False, return a zero-copy view into the ring
+    #        (valid until the writer wraps around to this slot; confirm with
+    #        is_current() after use if in doubt)
+    # @returns spectrum as ndarray, or None if the slot has been overwritten
+    def read(self, header, copy=False):
+        if not self.is_current(header):
+            return None
+
+        spectrum = self.data[header.slot, :header.pixels]
+        if copy:
+            spectrum = spectrum.copy()
+            if not self.is_current(header):
+                return None
+        return spectrum
+
+    ## @returns the header's Reading with spectrum populated (None if overwritten)
+    def get_reading(self, header, copy=False):
+        spectrum = self.read(header, copy=copy)
+        if spectrum is None:
+            log.debug(f"get_reading: {header} was overwritten")
+            return None
+
+        reading = header.reading
+        reading.spectrum = spectrum
+        return reading
+
+    # ##########################################################################
+    # cleanup
+    # ##########################################################################
+
+    ##
+    # Release this process's mapping (the owner also unlinks the block). Any
+    # outstanding zero-copy views must be released first.
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        self.sequences = None
+        self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            log.error(f"close: {self.name} still has exported views", exc_info=1)
+
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            log.debug(f"unlinked {self.name}")
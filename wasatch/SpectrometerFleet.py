@@ -0,0 +1,196 @@
+import time
+import logging
+import threading
+
+from queue import Queue, Full, Empty
+
+from .SpectrometerResponse import SpectrometerResponse
+from .WasatchDeviceWrapper import WasatchDeviceWrapper
+from .WasatchBus           import WasatchBus
+
+log = logging.getLogger(__name__)
+
+##
+# Connects and operates many spectrometers (e.g. a rack of 8-16 units) as a
+# group.
+#
+# Each spectrometer still gets its own WasatchDeviceWrapper and WrapperWorker
+# thread, so acquisitions on different units proceed independently.  What the
+# fleet adds is:
+#
+# - parallel connection: every wrapper's worker is started before any is
+#   waited on, so USB enumeration, EEPROM reads and initialization overlap
+#   rather than running one-per-tick
+# - one merged stream: a relay thread per device forwards each response from
+#   that device's response_queue onto a single bounded queue, read with
+#   get_next() as (device_id, SpectrometerResponse) pairs; every Reading
+#   also carries its device_id and per-device Reading.sequence
+# - fleet-wide commands: change_setting() sends to every device (or a subset)
+#   in one call
+#
+# The merged queue blocks its relays when full, so backpressure reaches each
+# wrapper's own ResponseQueue, whose queue_policy then decides what (if
+# anything) is dropped.
+#
+# @verbatim
+#   fleet = SpectrometerFleet(streaming=True)
+#   fleet.connect()
+#   fleet.change_setting("integration_time_ms", 10)
+#   while True:
+#       (device_id, response) = fleet.get_next(timeout_sec=1)
+# @endverbatim
+class SpectrometerFleet:
+
+    DEFAULT_CONNECT_TIMEOUT_SEC = 30
+    DEFAULT_MERGED_QUEUE_SIZE = 1000
+    RELAY_POLL_SEC = 0.1 # how often an idle relay checks for shutdown
+
+    def __init__(self, log_level="INFO", streaming=False, queue_size=WasatchDeviceWrapper.DEFAULT_QUEUE_SIZE, queue_policy=None, merged_queue_size=DEFAULT_MERGED_QUEUE_SIZE):
+        self.log_level = log_level
+        self.streaming = streaming
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
+
+        self.wrappers = {}  # str(device_id) -> WasatchDeviceWrapper
+        self.relays = {}    # str(device_id) -> threading.Thread
+        self.merged_queue = Queue(maxsize=merged_queue_size)
+        self.stop_event = threading.Event()
+
+    def __repr__(self):
+        return f"SpectrometerFleet <{len(self.wrappers)} devices, {self.merged_queue.qsize()} queued>"
+
+    def discover(self):
+        """ @returns list of DeviceIDs currently visible on the bus """
+        return WasatchBus().device_ids
+
+    ##
+    # Connect to the given devices (default: everything discoverable) in
+    # parallel.
+    #
+    # @param timeout_sec (Input) how long to wait for ALL devices to initialize
+    # @returns list of device_id strings which connected
+    def connect(self, device_ids=None, timeout_sec=DEFAULT_CONNECT_TIMEOUT_SEC):
+        if device_ids is None:
+            device_ids = self.discover()
+
+        self.stop_event.clear()
+
+        # start every worker before waiting on any
+        pending = {}
+        for device_id in device_ids:
+            key = str(device_id)
+            if key in self.wrappers:
+                log.debug(f"connect: {key} already connected")
+                continue
+
+            wrapper = WasatchDeviceWrapper(device_id, self.log_level, streaming=self.streaming, queue_size=self.queue_size, queue_policy=self.queue_policy)
+            try:
+                wrapper.connect()
+            except:
+                log.error(f"connect: unable to start {key}", exc_info=1)
+                continue
+            pending[key] = wrapper
+
+        log.debug(f"connect: waiting on {len(pending)} devices")
+        deadline = time.monotonic() + timeout_sec
+        while pending:
+            remaining_sec = deadline - time.monotonic()
+            if remaining_sec <= 0:
+                break
+
+            # wait briefly on each in turn, so a slow unit doesn't hold up the rest
+            for key, wrapper in list(pending.items()):
+                response = wrapper.poll_settings(timeout_sec=min(remaining_sec, self.RELAY_POLL_SEC) / len(pending))
+                if response is None:
+                    continue
+
+                del pending[key]
+                if response.error_msg:
+                    log.error(f"connect: {key} failed ({response.error_msg})")
+                    wrapper.disconnect()
+                else:
+                    log.info(f"connect: {key} connected")
+                    self.wrappers[key] = wrapper
+                    self._start_relay(key, wrapper)
+
+        for key, wrapper in pending.items():
+            log.error(f"connect: {key} timed-out after {timeout_sec}sec")
+            wrapper.disconnect()
+
+        return list(self.wrappers.keys())
+
+    def disconnect(self, device_ids=None):
+        keys = list(self.wrappers.keys()) if device_ids is None else [ str(device_id) for device_id in device_ids ]
+        for key in keys:
+            wrapper = self.wrappers.pop(key, None)
+            if wrapper is not None:
+                wrapper.disconnect()
+
+        if not self.wrappers:
+            self.stop_event.set()
+
+        for key in keys:
+            relay = self.relays.pop(key, None)
+            if relay is not None:
+                relay.join(timeout=self.RELAY_POLL_SEC * 2)
+
+    def get_settings(self):
+        """ @returns dict of device_id -> SpectrometerSettings """
+        return { key: wrapper.settings for key, wrapper in self.wrappers.items() }
+
+    ##
+    # Send a setting to every connected device (or those in device_ids).
+    def change_setting(self, setting, value=None, device_ids=None):
+        keys = self.wrappers.keys() if device_ids is None else [ str(device_id) for device_id in device_ids ]
+        for key in keys:
+            wrapper = self.wrappers.get(key)
+            if wrapper is None:
+                log.error(f"change_setting: unknown device {key}")
+                continue
+            wrapper.change_setting(setting, value)
+
+    ##
+    # @returns the oldest (device_id, SpectrometerResponse) from any device, or
+    #          None if nothing arrives within timeout_sec
+    def get_next(self, timeout_sec=None):
+        try:
+            if timeout_sec is None:
+                return self.merged_queue.get_nowait()
+            return self.merged_queue.get(timeout=timeout_sec)
+        except Empty:
+            return None
+
+    # ##########################################################################
+    # relay threads
+    # ##########################################################################
+
+    def _start_relay(self, key, wrapper):
+        relay = threading.Thread(target=self._relay, args=(key, wrapper), name=f"FleetRelay-{key}", daemon=True)
+        self.relays[key] = relay
+        relay.start()
+
+    ## Forward one device's responses onto the merged queue (runs in its own thread).
+    def _relay(self, key, wrapper):
+        while not self.stop_event.is_set():
+            try:
+                response = wrapper.response_queue.get(timeout=self.RELAY_POLL_SEC)
+            except Empty:
+                if not wrapper.connected:
+                    break
+                continue
+
+            if not isinstance(response, SpectrometerResponse):
+                continue
+
+            while not self.stop_event.is_set():
+                try:
+                    self.merged_queue.put((key, response), timeout=self.RELAY_POLL_SEC)
+                    break
+                except Full:
+                    pass
+
+            if response.poison_pill:
+                log.critical(f"relay: {key} sent poison-pill")
+                break
+
+        log.debug(f"relay: {key} exiting")
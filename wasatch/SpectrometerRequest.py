@@ -1,11 +1,26 @@
 from typing import Any
-from dataclasses import dataclass, field
 
-@dataclass
+##
+# Slotted rather than a dataclass, as one is created for every command (the
+# constructor signature, equality and repr are unchanged).
 class SpectrometerRequest:
-    cmd: str = ''
-    args: list[Any] = field(default_factory=list)
-    kwargs: dict[Any, Any] = field(default_factory=dict)
+
+    __slots__ = ("cmd", "args", "kwargs")
+
+    def __init__(self, cmd: str = '', args: list[Any] = None, kwargs: dict[Any, Any] = None):
+        self.cmd = cmd
+        self.args = [] if args is None else args
+        self.kwargs = {} if kwargs is None else kwargs
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.cmd, self.args, self.kwargs) == (other.cmd, other.args, other.kwargs)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"SpectrometerRequest(cmd={self.cmd!r}, args={self.args!r}, kwargs={self.kwargs!r})"
 
     def __str__(self):
         return f"<SpectrometerResponse cmd {self.cmd}, args {self.args}, kwargs {self.kwargs}>"
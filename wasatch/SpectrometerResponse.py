@@ -1,6 +1,5 @@
 from typing import Any
 from enum import Enum
-from dataclasses import dataclass
 
 class ErrorLevel(Enum):
     ok = 0
@@ -8,15 +7,39 @@ class ErrorLevel(Enum):
     medium = 2
     high = 3
 
-@dataclass
+##
+# Created for every request and every Reading, so slotted (this was
+# previously a dataclass; the constructor signature, equality and repr are
+# unchanged).
 class SpectrometerResponse:
-    data: Any           = None
-    error_msg: str      = ''
-    error_lvl: int      = ErrorLevel.ok
-    poison_pill: bool   = False
-    keep_alive: bool    = False
-    incomplete: bool    = False
-    progress: int       = 0
+
+    __slots__ = ("data", "error_msg", "error_lvl", "poison_pill", "keep_alive", "incomplete", "progress")
+
+    def __init__(self,
+            data: Any = None,
+            error_msg: str = '',
+            error_lvl: int = ErrorLevel.ok,
+            poison_pill: bool = False,
+            keep_alive: bool = False,
+            incomplete: bool = False,
+            progress: int = 0):
+        self.data = data
+        self.error_msg = error_msg
+        self.error_lvl = error_lvl
+        self.poison_pill = poison_pill
+        self.keep_alive = keep_alive
+        self.incomplete = incomplete
+        self.progress = progress
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"SpectrometerResponse(data={self.data!r}, error_msg={self.error_msg!r}, error_lvl={self.error_lvl!r}, poison_pill={self.poison_pill!r}, keep_alive={self.keep_alive!r}, incomplete={self.incomplete!r}, progress={self.progress!r})"
 
     def transfer_response(self, old_response):
         self.data = old_response.data
@@ -19,6 +19,11 @@ class SpectrometerState:
     BAD_PIXEL_MODE_NONE     = 0
     BAD_PIXEL_MODE_AVERAGE  = 1
 
+    AVERAGING_POLICY_AUTO    = "auto"    # onboard for atomic (TakeOneRequest) averages where supported
+    AVERAGING_POLICY_HOST    = "host"    # always average in WasatchDevice
+    AVERAGING_POLICY_ONBOARD = "onboard" # onboard whenever supported (no partial progress)
+    AVERAGING_POLICIES = [ AVERAGING_POLICY_AUTO, AVERAGING_POLICY_HOST, AVERAGING_POLICY_ONBOARD ]
+
     def __init__(self):
 
         # detector
@@ -30,7 +35,6 @@ class SpectrometerState:
         self.tec_setpoint_degC = 15 # that's a very strange default...
         self.tec_enabled = False
         self.detector_temperature_raw = None
-        self.detector_temperature_raw_last_refreshed = None
         self.ambient_temperature_deg_c = None
 
         # high gain mode (InGaAs only)
@@ -60,9 +64,17 @@ class SpectrometerState:
 
         # triggering
         self.trigger_source = self.TRIGGER_SOURCE_INTERNAL
+        self.pipelined_trigger_enabled = False # send next ACQUIRE before processing current spectrum
 
         # area scan mode
         self.area_scan_enabled = False
+
+        # 2048px FX2 detectors: read 0x82 and 0x86 simultaneously (opt-in until
+        # validated on hardware; libusb0 doesn't guarantee thread-safety)
+        self.concurrent_endpoint_reads_enabled = False
+
+        # bulk-read timeouts follow observed latency (see FID.generate_timeout_ms)
+        self.adaptive_timeout_enabled = True
         self.area_scan_fast = True # now the default
         self.area_scan_first_trigger_sent = False
         self.area_scan_line_step = 1
@@ -120,6 +132,8 @@ class SpectrometerState:
         # scan averaging
         self.scans_to_average = 1
         self.onboard_averaging = False # whether averaging occurs in HW or SW
+        self.onboard_scans_to_average = 1 # last value sent to firmware
+        self.averaging_policy = self.AVERAGING_POLICY_HOST # onboard averaging not yet validated on hardware
 
         # boxcar 
         self.boxcar_half_width = 0
@@ -237,8 +251,11 @@ class SpectrometerState:
         log.debug("  Laser Temp Setpoint:    0x%04x", self.laser_temperature_setpoint_raw)
         log.debug("  Selected ADC:           %s", self.selected_adc)
         log.debug("  Trigger Source:         %s", self.stringify_trigger_source())
+        log.debug("  Pipelined Trigger:      %s", self.pipelined_trigger_enabled)
+        log.debug("  Adaptive Timeout:       %s", self.adaptive_timeout_enabled)
         log.debug("  Area Scan Enabled:      %s", self.area_scan_enabled)
         log.debug("  Scans to Average:       %d", self.scans_to_average)
+        log.debug("  Onboard Averaging:      %s (%d, policy %s)", self.onboard_averaging, self.onboard_scans_to_average, self.averaging_policy)
         log.debug("  Boxcar Half-Width:      %d", self.boxcar_half_width)
         log.debug("  Background Subtraction: %d", self.background_subtraction_half_width)
         log.debug("  Bad Pixel Mode:         %s", self.stringify_bad_pixel_mode())
@@ -0,0 +1,67 @@
+import array
+import logging
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+##
+# One set of preallocated bulk-read buffers, one per endpoint.
+#
+# Each buffer is an array.array('B') (which is what pyusb requires in order to
+# read into a caller-supplied buffer), with a persistent little-endian uint16
+# NumPy view onto the same memory, so received bytes are never copied or
+# re-materialized before being demarshalled.
+class SpectrumRingSlot:
+
+    def __init__(self, block_lens):
+        self.buffers = [ array.array('B', bytes(block_len)) for block_len in block_lens ]
+        self.views = [ np.frombuffer(buf, dtype="<u2") for buf in self.buffers ]
+        self.bytes_read = [ 0 ] * len(block_lens)
+
+    def pixels_read(self):
+        return sum(n // 2 for n in self.bytes_read)
+
+    ##
+    # Demarshal the received pixels from all endpoints into a single float64
+    # spectrum.  This is the one unavoidable per-spectrum allocation, as the
+    # returned array is handed off to the caller (and ultimately the Reading).
+    def to_spectrum(self):
+        spectrum = np.empty(self.pixels_read(), dtype=np.float64)
+        start = 0
+        for view, n in zip(self.views, self.bytes_read):
+            count = min(n, 2 * len(view)) // 2
+            spectrum[start:start+count] = view[:count]
+            start += count
+        return spectrum
+
+##
+# A per-device ring of preallocated SpectrumRingSlots, into which
+# FeatureIdentificationDevice.get_spectrum reads each endpoint directly.
+#
+# Slots are recycled round-robin, so a slot's buffers remain valid until
+# len(slots) further acquisitions have been read.  The ring is only valid for
+# the endpoint layout and block length from which it was created (callers
+# should check matches() and re-create on detector ROI changes etc).
+class SpectrumRing:
+
+    DEFAULT_SLOTS = 4
+
+    def __init__(self, endpoints, block_len_bytes, slots=DEFAULT_SLOTS):
+        self.endpoints = list(endpoints)
+        self.block_len_bytes = block_len_bytes
+        self.slots = [ SpectrumRingSlot([block_len_bytes] * len(self.endpoints)) for i in range(max(1, slots)) ]
+        self.index = 0
+
+        log.debug(f"allocated {self}")
+
+    def __repr__(self):
+        return f"SpectrumRing <endpoints {[ hex(ep) for ep in self.endpoints ]}, block_len_bytes {self.block_len_bytes}, slots {len(self.slots)}>"
+
+    def matches(self, endpoints, block_len_bytes):
+        return self.endpoints == list(endpoints) and self.block_len_bytes == block_len_bytes
+
+    def next_slot(self):
+        slot = self.slots[self.index]
+        self.index = (self.index + 1) % len(self.slots)
+        slot.bytes_read = [ 0 ] * len(slot.buffers)
+        return slot
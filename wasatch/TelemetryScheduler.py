@@ -0,0 +1,101 @@
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+##
+# Decides which hardware "telemetry" channels (laser state, temperatures,
+# battery etc) are due to be polled after a given spectrum, and retains the
+# latest value of every polled attribute so that each Reading can be populated
+# from the snapshot whether or not its channels were refreshed this time.
+#
+# Historically WasatchDevice.acquire_spectrum_standard issued the full chain of
+# metadata control transfers after every spectrum, which at short integration
+# times could take longer than the acquisition itself.  With the scheduler,
+# each channel is only re-read when its period has elapsed.
+#
+# This class doesn't communicate with the spectrometer itself, and has no
+# thread of its own: FeatureIdentificationDevice is not thread-safe, so all
+# polling is still performed from the acquisition thread (i.e. WrapperWorker),
+# between spectra.
+#
+# A period of 0 means "poll after every spectrum" (the legacy behavior).  A
+# period of None disables the channel.
+class TelemetryScheduler:
+
+    LASER_STATE          = "laser_state"          # laser_enabled, interlock, laser TEC, ambient
+    LASER_TEMPERATURE    = "laser_temperature"
+    SECONDARY_ADC        = "secondary_adc"
+    DETECTOR_TEMPERATURE = "detector_temperature"
+    BATTERY              = "battery"
+    FIRMWARE_LOG         = "firmware_log"
+
+    DEFAULT_PERIODS_SEC = {
+        LASER_STATE          : 0.1,
+        LASER_TEMPERATURE    : 0.5,
+        SECONDARY_ADC        : 0.5,
+        DETECTOR_TEMPERATURE : 0.5,
+        BATTERY              : 5.0,
+        FIRMWARE_LOG         : 1.0,
+    }
+
+    def __init__(self, periods_sec=None):
+        self.periods_sec = dict(self.DEFAULT_PERIODS_SEC)
+        if periods_sec:
+            self.set_periods(periods_sec)
+        self.reset()
+
+    def reset(self):
+        """ forget all timestamps and values (e.g. on connect) """
+        self.last_polled = {}
+        self.snapshot = {}
+
+    def set_period(self, channel, sec):
+        if channel not in self.DEFAULT_PERIODS_SEC:
+            log.error(f"TelemetryScheduler: unknown channel {channel}")
+            return False
+        self.periods_sec[channel] = None if sec is None else max(0, float(sec))
+        log.debug(f"TelemetryScheduler: {channel} period now {self.periods_sec[channel]} sec")
+        return True
+
+    ##
+    # @param periods_sec (Input) dict of channel -> seconds
+    def set_periods(self, periods_sec):
+        ok = True
+        for channel, sec in periods_sec.items():
+            ok = self.set_period(channel, sec) and ok
+        return ok
+
+    def force(self, *channels):
+        """ ensure the given channels (default all) are polled next time """
+        for channel in channels or list(self.last_polled.keys()):
+            self.last_polled.pop(channel, None)
+
+    def is_due(self, channel, now=None):
+        period = self.periods_sec.get(channel)
+        if period is None:
+            return False
+
+        last = self.last_polled.get(channel)
+        if last is None:
+            return True
+
+        if now is None:
+            now = time.monotonic()
+        return now - last >= period
+
+    def mark_polled(self, channel, now=None):
+        self.last_polled[channel] = time.monotonic() if now is None else now
+
+    def update(self, attr, value):
+        self.snapshot[attr] = value
+
+    def get(self, attr, default=None):
+        return self.snapshot.get(attr, default)
+
+    def apply(self, reading):
+        """ copy the latest value of every polled attribute into the Reading """
+        if reading is None:
+            return
+        for attr, value in self.snapshot.items():
+            setattr(reading, attr, value)
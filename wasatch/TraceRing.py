@@ -0,0 +1,164 @@
+import struct
+import logging
+import weakref
+import threading
+
+from time import monotonic_ns
+
+log = logging.getLogger(__name__)
+
+##
+# An always-on, fixed-size, per-thread ring of binary trace records, used in
+# place of log.debug on per-spectrum and per-transfer hot paths.
+#
+# Each record is (event_id, monotonic_ns, a, b, c): five int64s packed into
+# a preallocated bytearray, so tracing costs well under a microsecond and no
+# string formatting, regardless of log level.  Nothing is rendered to text
+# until someone asks (render(), or a crash dump from
+# FeatureIdentificationDevice._schedule_disconnect).
+#
+# Event ids are allocated once, at import, with a format string naming the
+# three integer arguments:
+#
+# @verbatim
+#   EV_SEND_CODE = TraceRing.event("_send_code", "request 0x{a:02x} value 0x{b:04x} index 0x{c:04x}")
+#   ...
+#   TraceRing.trace(EV_SEND_CODE, bRequest, wValue, wIndex)
+#   ...
+#   print(TraceRing.render(last=100))
+# @endverbatim
+#
+# Each thread gets its own ring on first use, so writers never contend or
+# lock; render() merges every thread's ring by timestamp.  Rings of exited
+# threads are kept (up to MAX_RINGS in all, oldest evicted first) so their
+# final events can be dumped; a live thread's ring is never evicted.
+class TraceRing:
+
+    DEFAULT_SIZE = 4096 # records per thread (power of 2)
+    RECORD = struct.Struct("<5q")
+    RECORD_BYTES = RECORD.size
+    MAX_RINGS = 64
+
+    events = [] # event_id -> (name, fmt)
+    rings = []  # every TraceRing created, oldest first
+    rings_lock = threading.Lock()
+    local = threading.local()
+
+    # ##########################################################################
+    # class API
+    # ##########################################################################
+
+    @classmethod
+    def event(cls, name, fmt=""):
+        """ @returns a new event_id, rendered as "name: fmt" with fmt.format(a=, b=, c=) """
+        cls.events.append((name, fmt))
+        return len(cls.events) - 1
+
+    @classmethod
+    def trace(cls, event_id, a=0, b=0, c=0):
+        """ record an event in the calling thread's ring (int arguments only) """
+        try:
+            ring = cls.local.ring
+        except AttributeError:
+            ring = cls.for_current_thread()
+        ring.record(event_id, a, b, c)
+
+    @classmethod
+    def for_current_thread(cls):
+        ring = getattr(cls.local, "ring", None)
+        if ring is None:
+            thread = threading.current_thread()
+            ring = cls(thread_name=thread.name)
+            ring.thread = weakref.ref(thread)
+            cls.local.ring = ring
+            with cls.rings_lock:
+                cls.rings.append(ring)
+                excess = len(cls.rings) - cls.MAX_RINGS
+                if excess > 0:
+                    dead = [ r for r in cls.rings if not r.is_alive() ][:excess]
+                    cls.rings[:] = [ r for r in cls.rings if r not in dead ]
+        return ring
+
+    ##
+    # @param last (Input) only the newest this-many records (across all threads)
+    # @returns list of (monotonic_ns, thread_name, event_id, a, b, c), oldest first
+    @classmethod
+    def collect(cls, last=None):
+        with cls.rings_lock:
+            rings = list(cls.rings)
+        records = []
+        for ring in rings:
+            records.extend((t, ring.thread_name, event_id, a, b, c) for (event_id, t, a, b, c) in ring.get_records())
+        records.sort(key=lambda r: r[0])
+        if last is not None:
+            records = records[-last:]
+        return records
+
+    @classmethod
+    def render(cls, last=None):
+        """ @returns the merged trace as text, one event per line """
+        records = cls.collect(last)
+        if not records:
+            return ""
+        t0 = records[0][0]
+        lines = []
+        for (t, thread_name, event_id, a, b, c) in records:
+            if 0 <= event_id < len(cls.events):
+                (name, fmt) = cls.events[event_id]
+                try:
+                    text = fmt.format(a=a, b=b, c=c)
+                except (ValueError, IndexError):
+                    text = f"{a} {b} {c}"
+            else:
+                (name, text) = (f"event {event_id}", f"{a} {b} {c}")
+            lines.append(f"{(t - t0) / 1e6:12.3f}ms [{thread_name}] {name}: {text}")
+        return "\n".join(lines)
+
+    @classmethod
+    def clear_all(cls):
+        with cls.rings_lock:
+            for ring in cls.rings:
+                ring.clear()
+
+    # ##########################################################################
+    # per-thread ring
+    # ##########################################################################
+
+    def __init__(self, size=DEFAULT_SIZE, thread_name=None):
+        if size & (size - 1):
+            raise ValueError(f"TraceRing size {size} must be a power of 2")
+        self.size = size
+        self.mask = size - 1
+        self.thread_name = thread_name
+        self.thread = None # weakref to the writing thread (see for_current_thread)
+        self.buffer = bytearray(self.RECORD.size * size)
+        self.pack_into = self.RECORD.pack_into
+        self.count = 0 # records ever written
+
+    def __repr__(self):
+        return f"TraceRing <{self.thread_name}, {min(self.count, self.size)} of {self.size} records>"
+
+    def is_alive(self):
+        thread = self.thread() if self.thread is not None else None
+        return thread is not None and thread.is_alive()
+
+    def record(self, event_id, a=0, b=0, c=0):
+        count = self.count
+        offset = (count & self.mask) * self.RECORD_BYTES
+        try:
+            self.pack_into(self.buffer, offset, event_id, monotonic_ns(), a, b, c)
+        except struct.error:
+            # never let a bad argument (None, float, overflow) break the caller
+            self.pack_into(self.buffer, offset, event_id, monotonic_ns(), -1, -1, -1)
+        self.count = count + 1
+
+    def clear(self):
+        self.count = 0
+
+    ## @returns list of (event_id, monotonic_ns, a, b, c), oldest first
+    def get_records(self):
+        count = self.count
+        n = min(count, self.size)
+        start = count - n
+        unpack_from = self.RECORD.unpack_from
+        return [ unpack_from(self.buffer, (k & self.mask) * self.RECORD_BYTES) for k in range(start, count) ]
@@ -1,7 +1,6 @@
 import re
 import os
 import time
-import numpy as np
 import psutil
 import logging
 import datetime
@@ -19,11 +18,23 @@ from .BalanceAcquisition          import BalanceAcquisition
 from .SpectrometerState           import SpectrometerState
 from .ControlObject               import ControlObject
 from .AutoRaman                   import AutoRaman
+from .TelemetryScheduler          import TelemetryScheduler
+from .ScanAverager                import ScanAverager
+from .MetricsRegistry             import MetricsRegistry
+from .TraceRing                   import TraceRing
 from .DeviceID                    import DeviceID
 from .Reading                     import Reading
 
 log = logging.getLogger(__name__)
 
+trace = TraceRing.trace
+EV_ACQUIRE_DATA  = TraceRing.event("acquire_data")
+EV_TAKE_ONE      = TraceRing.event("take_one_averaged_reading", "scans_to_average {a} loop_count {b} sum_locally {c}")
+EV_GOT_SPECTRUM  = TraceRing.event("take_one_averaged_reading got", "pixels {a} first {b}")
+EV_SUM_COUNT     = TraceRing.event("take_one_averaged_reading sum", "sum_count {a} of {b}, session_count {c}")
+EV_AVERAGED      = TraceRing.event("take_one_averaged_reading averaged", "sum_count {a} path {b} (0 none, 1 host, 2 onboard)")
+EV_ACQUIRED      = TraceRing.event("acquire_spectrum returning", "session_count {a} averaged {b} keep_alive {c}")
+
 class WasatchDevice(InterfaceDevice):
     """
     This is the top-level interface for controlling and communicating with
@@ -80,6 +91,10 @@ class WasatchDevice(InterfaceDevice):
     Wasatch.PY and ENLIGHTEN were via pickled queues :-(
     """
 
+    # settings which change what the detector sees, so that spectra from 
+    # either side of them must not be averaged together
+    AVERAGE_RESTART_SETTINGS = re.compile(r"^(laser_enable|laser_power_.*|selected_laser|trigger_source)$")
+
     def __init__(self, device_id, message_queue=None, alert_queue=None):
         """
         @param device_id      a DeviceID instance OR string label thereof
@@ -111,20 +126,29 @@ class WasatchDevice(InterfaceDevice):
         self.settings = SpectrometerSettings()
 
         # Any particular reason these aren't in FeatureIdentificationDevice?
-        self.summed_spectra         = None
-        self.sum_count              = 0
+        self.averager               = ScanAverager()
         self.session_reading_count  = 0
         self.take_one_request       = None
         self.last_complete_acquisition = None
 
         self.process_id = os.getpid()
         self.last_memory_check = datetime.datetime.now()
+
+        metrics = MetricsRegistry.get_default()
+        self.metric_averaged_readings = metrics.counter("averaged_readings", device_id)
+        self.metric_memory_rss_bytes  = metrics.gauge("memory_rss_bytes")
         self.last_battery_percentage = 0
 
+        # decides which metadata to re-read after each spectrum
+        self.telemetry = TelemetryScheduler()
+
         self.process_f = self._init_process_funcs()
 
         self.auto_raman = AutoRaman(self)
 
+        # see InterfaceDevice.check_priority_commands
+        self.priority_callback = None
+
     # ######################################################################## #
     #                                                                          #
     #                               Connection                                 #
@@ -139,6 +163,7 @@ class WasatchDevice(InterfaceDevice):
             if result.data:
                 log.debug("Connected to FeatureIdentificationDevice")
                 self.connected = True
+                self.telemetry.reset()
                 self.initialize_settings()
                 return SpectrometerResponse(True)
             else:
@@ -180,6 +205,7 @@ class WasatchDevice(InterfaceDevice):
                 return response
 
             self.hardware = dev
+            self.hardware.priority_callback = self.check_priority_commands
         except:
             log.critical(f"Problem connecting to {self.device_id}", exc_info=1)
             return SpectrometerResponse(False)
@@ -227,7 +253,7 @@ class WasatchDevice(InterfaceDevice):
 
         @see Controller.acquire_reading
         """
-        log.debug("acquire_data: start")
+        trace(EV_ACQUIRE_DATA)
 
         if self.hardware.shutdown_requested:
             log.critical("acquire_data: hardware shutdown requested")
@@ -401,7 +427,6 @@ class WasatchDevice(InterfaceDevice):
         # Take a Reading (possibly averaged)
         ########################################################################
 
-        log.debug("taking averaged reading")
         take_one_response = self.take_one_averaged_reading(label="sample (possibly Raman)")
         reading = take_one_response.data
         if take_one_response.poison_pill:
@@ -418,8 +443,6 @@ class WasatchDevice(InterfaceDevice):
         # with the averaged reading
         if dark_reading.data is not None and not reading.keep_alive:
             reading.dark = dark_reading.data.spectrum
-            log.debug(f"attaching dark to reading (mean {np.mean(reading.dark)}, min {min(reading.dark)}, max {max(reading.dark)})")
-            log.debug(f"reading spectrum          (mean {np.mean(reading.spectrum)}, min {min(reading.spectrum)}, max {max(reading.spectrum)})")
 
         ########################################################################
         # provide early exit-ramp if we've been asked to return bare Readings
@@ -442,56 +465,72 @@ class WasatchDevice(InterfaceDevice):
         # ated if we took them AFTER the laser was off.
         ########################################################################
 
+        # Telemetry channels are only re-read when their period has elapsed
+        # (see TelemetryScheduler); every Reading is populated from the latest
+        # snapshot regardless. Anything measured while the laser is on must be
+        # refreshed when we've auto-enabled the laser for this Reading.
+        telemetry = self.telemetry
+        if auto_enable_laser:
+            telemetry.force(TelemetryScheduler.LASER_STATE, 
+                            TelemetryScheduler.LASER_TEMPERATURE, 
+                            TelemetryScheduler.SECONDARY_ADC)
+        now = time.monotonic()
+
         # only read laser temperature if we have a laser
         if self.settings.eeprom.has_laser:
             try:
                 # MZ: we might want to do these for auto_enable_laser as well...
-                func_attr = [ ('get_laser_enabled', 'laser_enabled'),
-                              ('can_laser_fire',    'laser_can_fire'),
-                              ('is_laser_firing',   'laser_is_firing') ]
-                if self.settings.is_xs() and self.settings.eeprom.sig_laser_tec:
-                    func_attr.append( ('get_laser_tec_mode', 'laser_tec_enabled') )
-                    func_attr.append( ('get_ambient_temperature_degC', 'ambient_temperature_degC') )
-
-                for (func, attr) in func_attr:
-                    req = SpectrometerRequest(func)
-                    res = self.hardware.handle_requests([req])[0]
-                    if res is None:
-                        log.debug(f"WasatchDevice.acquire_spectrum: ignoring None {func} response")
-                    else:
-                        if res.error_msg != '':
-                            return res
-                        value = res.data
-                        # log.debug(f"WasatchDevice.acquire_spectrum: storing {attr} = {value}")
-                        setattr(reading, attr, value)
+                if telemetry.is_due(TelemetryScheduler.LASER_STATE, now):
+                    func_attr = [ ('get_laser_enabled', 'laser_enabled'),
+                                  ('can_laser_fire',    'laser_can_fire'),
+                                  ('is_laser_firing',   'laser_is_firing') ]
+                    if self.settings.is_xs() and self.settings.eeprom.sig_laser_tec:
+                        func_attr.append( ('get_laser_tec_mode', 'laser_tec_enabled') )
+                        func_attr.append( ('get_ambient_temperature_degC', 'ambient_temperature_degC') )
+
+                    for (func, attr) in func_attr:
+                        req = SpectrometerRequest(func)
+                        res = self.hardware.handle_requests([req])[0]
+                        if res is None:
+                            log.debug(f"WasatchDevice.acquire_spectrum: ignoring None {func} response")
+                        else:
+                            if res.error_msg != '':
+                                return res
+                            value = res.data
+                            # log.debug(f"WasatchDevice.acquire_spectrum: storing {attr} = {value}")
+                            telemetry.update(attr, value)
+                    telemetry.mark_polled(TelemetryScheduler.LASER_STATE, now)
 
-                if self.hardware.shutdown_requested:
-                    return disable_laser(shutdown=True, label=f"loading laser attributes")
+                    if self.hardware.shutdown_requested:
+                        return disable_laser(shutdown=True, label=f"loading laser attributes")
 
                 # laser temperature
-                count = 2 if self.settings.state.secondary_adc_enabled else 1
-                for throwaway in range(count):
-                    req = SpectrometerRequest('get_laser_temperature_raw')
+                if telemetry.is_due(TelemetryScheduler.LASER_TEMPERATURE, now):
+                    count = 2 if self.settings.state.secondary_adc_enabled else 1
+                    for throwaway in range(count):
+                        req = SpectrometerRequest('get_laser_temperature_raw')
+                        res = self.hardware.handle_requests([req])[0]
+                        if res.error_msg != '':
+                            return res
+                        laser_temperature_raw = res.data
+                        if self.hardware.shutdown_requested:
+                            return disable_laser(shutdown=True, label=f"reading laser temperature (throwaway {throwaway} of {count})")
+
+                    req = SpectrometerRequest('get_laser_temperature_degC', args=[laser_temperature_raw])
                     res = self.hardware.handle_requests([req])[0]
                     if res.error_msg != '':
                         return res
-                    reading.laser_temperature_raw  = res.data
+                    telemetry.update('laser_temperature_raw',  laser_temperature_raw)
+                    telemetry.update('laser_temperature_degC', res.data)
+                    telemetry.mark_polled(TelemetryScheduler.LASER_TEMPERATURE, now)
                     if self.hardware.shutdown_requested:
-                        return disable_laser(shuttdown=True, label=f"reading laser temperature (throwaway {throwaway} of {count})")
-
-                req = SpectrometerRequest('get_laser_temperature_degC', args=[reading.laser_temperature_raw])
-                res = self.hardware.handle_requests([req])[0]
-                if res.error_msg != '':
-                    return res
-                reading.laser_temperature_degC = res.data
-                if self.hardware.shutdown_requested:
-                    return disable_laser(shutdown=True, label=f"reading laser temperature")
+                        return disable_laser(shutdown=True, label=f"reading laser temperature")
 
             except:
                 log.debug("Error reading laser temperature", exc_info=1)
 
         # read secondary ADC if requested
-        if self.settings.state.secondary_adc_enabled:
+        if self.settings.state.secondary_adc_enabled and telemetry.is_due(TelemetryScheduler.SECONDARY_ADC, now):
             try:
                 req = SpectrometerRequest("select_adc", args=[1])
                 self.hardware.handle_requests([req])
@@ -503,15 +542,18 @@ class WasatchDevice(InterfaceDevice):
                     res = self.hardware.handle_requests([req])[0]
                     if res.error_msg != '':
                         return res
-                    reading.secondary_adc_raw = res.data
+                    secondary_adc_raw = res.data
                     if self.hardware.shutdown_requested:
                         return disable_laser(shutdown=True, label="get_secondary_adc_raw")
 
-                req = SpectrometerRequest("get_secondary_adc_calibrated", args =[reading.secondary_adc_raw])
+                req = SpectrometerRequest("get_secondary_adc_calibrated", args =[secondary_adc_raw])
                 res = self.hardware.handle_requests([req])[0]
                 if res.error_msg != '':
                     return res
-                reading.secondary_adc_calibrated = res.data 
+                telemetry.update('secondary_adc_raw',        secondary_adc_raw)
+                telemetry.update('secondary_adc_calibrated', res.data)
+                telemetry.mark_polled(TelemetryScheduler.SECONDARY_ADC, now)
+
                 req = SpectrometerRequest("select_adc", args=[0])
                 res = self.hardware.handle_requests([req])[0]
                 if res.error_msg != '':
@@ -534,23 +576,25 @@ class WasatchDevice(InterfaceDevice):
         ########################################################################
 
         # read detector temperature if applicable
-        if self.settings.eeprom.has_cooling:
+        if self.settings.eeprom.has_cooling and telemetry.is_due(TelemetryScheduler.DETECTOR_TEMPERATURE, now):
             try:
                 req = SpectrometerRequest("get_detector_temperature_raw")
                 res = self.hardware.handle_requests([req])[0]
                 if res.error_msg != '':
                     return res
-                reading.detector_temperature_raw  = res.data
+                detector_temperature_raw = res.data
                 if self.hardware.shutdown_requested:
                     log.debug("detector_temperature_raw shutdown")
                     acquire_response.poison_pill = True
                     return acquire_response
 
-                req = SpectrometerRequest("get_detector_temperature_degC", args=[reading.detector_temperature_raw])
+                req = SpectrometerRequest("get_detector_temperature_degC", args=[detector_temperature_raw])
                 res = self.hardware.handle_requests([req])[0]
                 if res.error_msg != '':
                     return res
-                reading.detector_temperature_degC = res.data
+                telemetry.update('detector_temperature_raw',  detector_temperature_raw)
+                telemetry.update('detector_temperature_degC', res.data)
+                telemetry.mark_polled(TelemetryScheduler.DETECTOR_TEMPERATURE, now)
                 if self.hardware.shutdown_requested:
                     log.debug("detector_temperature_degC shutdown")
                     acquire_response.poison_pill = True
@@ -567,49 +611,52 @@ class WasatchDevice(InterfaceDevice):
             except:
                 log.debug("Error reading ambient temperature", exc_info=1)
 
-        # read battery every 5sec
-        if self.settings.eeprom.has_battery:
-            if self.settings.state.battery_timestamp is None or (datetime.datetime.now() - self.settings.state.battery_timestamp).total_seconds() > 5:
+        # read battery (every 5sec by default)
+        if self.settings.eeprom.has_battery and telemetry.is_due(TelemetryScheduler.BATTERY, now):
 
-                # note that the following 3 requests should actually only generate 
-                # one USB transaction as raw is cached internally
-                req = SpectrometerRequest("get_battery_state_raw")
-                res = self.hardware.handle_requests([req])[0]
-                if res.error_msg != '':
-                   return res
-                reading.battery_raw = res.data
-                if self.hardware.shutdown_requested:
-                    log.debug("battery_raw shutdown")
-                    acquire_response.poison_pill = True
-                    return acquire_response
+            # note that the following 3 requests should actually only generate 
+            # one USB transaction as raw is cached internally
+            req = SpectrometerRequest("get_battery_state_raw")
+            res = self.hardware.handle_requests([req])[0]
+            if res.error_msg != '':
+               return res
+            telemetry.update('battery_raw', res.data)
+            if self.hardware.shutdown_requested:
+                log.debug("battery_raw shutdown")
+                acquire_response.poison_pill = True
+                return acquire_response
 
-                req = SpectrometerRequest("get_battery_percentage")
-                res = self.hardware.handle_requests([req])[0]
-                if res.error_msg != '':
-                   return res
-                reading.battery_percentage = res.data
-                if self.hardware.shutdown_requested:
-                    log.debug("battery_perc shutdown")
-                    acquire_response.poison_pill = True
-                    return acquire_response
-                self.last_battery_percentage = reading.battery_percentage
+            req = SpectrometerRequest("get_battery_percentage")
+            res = self.hardware.handle_requests([req])[0]
+            if res.error_msg != '':
+               return res
+            telemetry.update('battery_percentage', res.data)
+            if self.hardware.shutdown_requested:
+                log.debug("battery_perc shutdown")
+                acquire_response.poison_pill = True
+                return acquire_response
+            self.last_battery_percentage = res.data
 
-                req = SpectrometerRequest("get_battery_percentage")
-                res = self.hardware.handle_requests([req])[0]
-                if res.error_msg != '':
-                    return res
-                reading.battery_charging = res.data
-                if self.hardware.shutdown_requested:
-                    log.debug("battery_charging shutdown")
-                    acquire_response.poison_pill = True
-                    return acquire_response
+            req = SpectrometerRequest("get_battery_charging")
+            res = self.hardware.handle_requests([req])[0]
+            if res.error_msg != '':
+                return res
+            telemetry.update('battery_charging', res.data)
+            telemetry.mark_polled(TelemetryScheduler.BATTERY, now)
+            if self.hardware.shutdown_requested:
+                log.debug("battery_charging shutdown")
+                acquire_response.poison_pill = True
+                return acquire_response
 
-                log.debug("battery: %.2f%% (%s)", reading.battery_percentage, "charging" if reading.battery_charging else "discharging")
-            else:
-                if reading is not None:
-                    reading.battery_percentage = self.last_battery_percentage
+            log.debug("battery: %.2f%% (%s)", telemetry.get('battery_percentage'), "charging" if telemetry.get('battery_charging') else "discharging")
+
+        if telemetry.is_due(TelemetryScheduler.FIRMWARE_LOG, now):
+            self.hardware.update_firmware_log()
+            telemetry.mark_polled(TelemetryScheduler.FIRMWARE_LOG, now)
 
-        self.hardware.update_firmware_log()
+        telemetry.apply(reading)
+        if reading.marks is not None:
+            reading.marks.mark("telemetry_done")
 
         if auto_enable_laser:
             log.debug(f"AUTO-RAMAN ==> done")
@@ -625,7 +672,8 @@ class WasatchDevice(InterfaceDevice):
                 log.debug(f"completed {tor}")
                 self.take_one_request = None
 
-        log.debug("device.acquire_spectrum: returning %s", reading)
+        if reading is not None:
+            trace(EV_ACQUIRED, reading.session_count, int(bool(reading.averaged)), int(bool(reading.keep_alive)))
         acquire_response.data = reading
         self.last_complete_acquisition = datetime.datetime.now()
         return acquire_response
@@ -698,19 +746,20 @@ class WasatchDevice(InterfaceDevice):
             scans_to_average = self.take_one_request.scans_to_average   # how many (for completion test / division)
             loop_count = scans_to_average                               # how many to take NOW
             sum_locally = scans_to_average > 1                          # whether we should be summing at all
-            self.sum_count = 0                                          # whether we should reset previous sums
+            self.averager.reset()                                       # whether we should reset previous sums
         else:
             scans_to_average = self.settings.state.scans_to_average     # how many (for completion test / division)
             sum_locally = scans_to_average > 1                          # whether we should be summing at all
             loop_count = 1                                              # how many to take NOW
 
-        if False:
-            log.debug(f"take_one_averaged_reading[{label}]:")
-            log.debug(f"  self.sum_count        = {self.sum_count}")
-            log.debug(f"  scans_to_average      = {scans_to_average}")
-            log.debug(f"  loop_count            = {loop_count}")
-            log.debug(f"  sum_locally           = {sum_locally}")
-            log.debug(f"  remaining_throwaways  = {self.hardware.remaining_throwaways}")
+        # let the firmware do the averaging if we can (one bulk transfer 
+        # rather than scans_to_average)
+        onboard = self.select_onboard_averaging(scans_to_average, atomic=self.take_one_request is not None)
+        if onboard:
+            loop_count = 1
+            sum_locally = False
+
+        trace(EV_TAKE_ONE, scans_to_average, loop_count, int(sum_locally))
 
         # clear any pending throwaways
         while self.hardware.remaining_throwaways > 0:
@@ -724,10 +773,25 @@ class WasatchDevice(InterfaceDevice):
         # either take one measurement (normal), or a bunch (sum_locally)
         reading = None
         tried_reset = False
-        for loop_index in range(loop_count):
+        loop_index = 0
+        while loop_index < loop_count:
 
             # log.debug(f"take_one_averaged_reading: loop_index {loop_index+1} of {loop_count}")
 
+            # don't make laser / trigger commands wait for a long average
+            if loop_index > 0:
+                sum_count = self.averager.count
+                if self.check_priority_commands():
+                    log.debug("take_one_averaged_reading: aborting averaged reading per shutdown request")
+                    return SpectrometerResponse(keep_alive=True)
+
+                # a laser / trigger change restarts the average (see 
+                # change_setting), so take a full set of scans from here
+                if sum_locally and self.averager.count < sum_count:
+                    log.debug(f"take_one_averaged_reading: restarting average at loop_index {loop_index}")
+                    loop_count = loop_index + scans_to_average
+            loop_index += 1
+
             # start a new reading
             # NOTE: reading.timestamp is when reading STARTED, not FINISHED!
             reading = Reading(self.device_id)
@@ -799,7 +863,9 @@ class WasatchDevice(InterfaceDevice):
                     reading.spectrum = None
                 else:
                     reading.spectrum = spectrum_and_row.spectrum
-                    log.debug(f"take_one_averaged_reading: got {reading.spectrum[0:9]}")
+                    reading.marks = spectrum_and_row.marks
+                    if reading.spectrum is not None and len(reading.spectrum):
+                        trace(EV_GOT_SPECTRUM, len(reading.spectrum), int(reading.spectrum[0]))
 
                 reading.timestamp_complete  = datetime.datetime.now()
 
@@ -821,8 +887,8 @@ class WasatchDevice(InterfaceDevice):
             ####################################################################
 
             # It's important to note here that the scan averaging "sum" buffer
-            # here (self.summed_spectra) and counter (self.sum_count) are
-            # attributes of this WasatchDevice object: they are not part of the
+            # here (self.averager, which also tracks per-pixel noise) is an
+            # attribute of this WasatchDevice object: they are not part of the
             # Reading being sent back to the caller.
             #
             # The current architecture in Wasatch.PY, which is a little different
@@ -857,45 +923,78 @@ class WasatchDevice(InterfaceDevice):
             if not reading.failure and not reading.keep_alive:
                 # log.debug("take_one_averaged_reading: not failure")
                 if sum_locally:
-                    log.debug("take_one_averaged_reading: summing locally")
-                    if self.sum_count == 0:
-                        log.debug("take_one_averaged_reading: first spectrum (initializing)")
-                        self.summed_spectra = [float(i) for i in reading.spectrum]
-                    else:
-                        log.debug("take_one_averaged_reading: adding to previous")
-                        for i in range(len(self.summed_spectra)):
-                            self.summed_spectra[i] += reading.spectrum[i]
-                    self.sum_count += 1
-                    log.debug("take_one_averaged_reading: summed_spectra : %s ...", self.summed_spectra[0:9])
+                    self.averager.add(reading.spectrum)
 
             # count spectra
             if not reading.keep_alive:
                 self.session_reading_count += 1
             reading.session_count = self.session_reading_count
-            reading.sum_count = self.sum_count
-            log.debug(f"take_one_averaged_reading: reading.sum_count now {reading.sum_count}, session_count {reading.session_count}")
+            reading.sum_count = self.averager.count
+            trace(EV_SUM_COUNT, reading.sum_count, scans_to_average, reading.session_count)
 
             # have we completed the averaged reading?
             if not reading.keep_alive:
                 if sum_locally: 
-                    log.debug(f"take_one_averaged_reading: checking for completion self.sum_count {self.sum_count} >?= scans_to_average {scans_to_average}")
-                    if self.sum_count >= scans_to_average:
-                        reading.spectrum = [ x / self.sum_count for x in self.summed_spectra ]
-                        log.debug("take_one_averaged_reading: averaged_spectrum : %s ...", reading.spectrum[0:9])
-                        reading.averaged = True
+                    if self.averager.count >= scans_to_average:
+                        self.averager.apply(reading)
+                        reading.averaging_path = "host"
+                        self.metric_averaged_readings.inc()
+                        trace(EV_AVERAGED, reading.sum_count, 1)
 
                         # reset for next average
-                        self.summed_spectra = None
-                        self.sum_count = 0
+                        self.averager.reset()
+                elif onboard:
+                    # the firmware already averaged this one
+                    reading.averaged = True
+                    reading.sum_count = scans_to_average
+                    reading.averaging_path = "onboard"
+                    self.metric_averaged_readings.inc()
+                    trace(EV_AVERAGED, reading.sum_count, 2)
                 else:
                     # if averaging isn't enabled...then a single reading is the
                     # "averaged" final measurement (check reading.sum_count to confirm)
                     reading.averaged = True
 
-        log.debug("device.take_one_averaged_reading: returning %s", reading)
         take_one_response.data = reading
         return take_one_response
 
+    def select_onboard_averaging(self, scans_to_average, atomic):
+        """
+        Decide (per SpectrometerState.averaging_policy) whether the next 
+        averaged Reading should be averaged in firmware or here, and make sure
+        the firmware's onboard scans_to_average agrees.
+
+        Onboard averaging moves one spectrum over USB rather than 
+        scans_to_average, but yields no intermediate spectra, so under the 
+        "auto" policy it is only used for atomic (TakeOneRequest) averages; 
+        free-running averages still stream partial progress.  
+
+        Under "auto" and "onboard" the policy owns the firmware setting, so any
+        onboard_scans_to_average sent by the caller is overridden here.  The
+        default "host" policy (as onboard averaging has yet to be validated on
+        hardware) never touches the firmware, leaving onboard_scans_to_average
+        entirely to the caller.
+
+        @returns True if the firmware will average
+        """
+        state = self.settings.state
+        policy = state.averaging_policy
+        if policy == SpectrometerState.AVERAGING_POLICY_HOST:
+            return False
+
+        onboard = scans_to_average > 1 and \
+                  (atomic or policy == SpectrometerState.AVERAGING_POLICY_ONBOARD) and \
+                  self.hardware.supports_onboard_averaging()
+
+        wanted = scans_to_average if onboard else 1
+        if wanted != state.onboard_scans_to_average:
+            log.debug(f"select_onboard_averaging: onboard scans_to_average {state.onboard_scans_to_average} -> {wanted}")
+            res = self.hardware.set_onboard_scans_to_average(wanted)
+            if res.data is False or res.error_msg:
+                log.error(f"select_onboard_averaging: unable to set onboard averaging ({res.error_msg})...averaging on host")
+                return False
+        return onboard
+
     def monitor_memory(self):
         now = datetime.datetime.now()
         if (now - self.last_memory_check).total_seconds() < 5:
@@ -903,6 +1002,7 @@ class WasatchDevice(InterfaceDevice):
 
         self.last_memory_check = now
         size_in_bytes = psutil.Process(self.process_id).memory_info().rss
+        self.metric_memory_rss_bytes.set(size_in_bytes)
         log.info("monitor_memory: PID %d memory = %d bytes", self.process_id, size_in_bytes)
 
     ##
@@ -1078,20 +1178,37 @@ class WasatchDevice(InterfaceDevice):
         # Since scan averaging lives in WasatchDevice, handle commands which affect
         # averaging at this level
         if setting == "scans_to_average":
-            self.sum_count = 0
+            self.averager.reset()
             self.settings.state.scans_to_average = int(value)
             return
         elif setting == "reset_scan_averaging":
-            self.sum_count = 0
+            self.averager.reset()
             return
         elif setting == "take_one_request":
-            self.sum_count = 0
+            self.averager.reset()
             self.take_one_request = value
             return
         elif setting == "cancel_take_one":
-            self.sum_count = 0
+            self.averager.reset()
             self.take_one_request = None
             return
+        elif setting == "averaging_policy":
+            if value not in SpectrometerState.AVERAGING_POLICIES:
+                log.error(f"unsupported averaging_policy {value}")
+                return
+            self.averager.reset()
+            if value == SpectrometerState.AVERAGING_POLICY_HOST and self.settings.state.averaging_policy != value and \
+                    self.settings.state.onboard_averaging and self.hardware is not None:
+                # don't leave behind onboard averaging the previous policy selected
+                self.hardware.set_onboard_scans_to_average(1)
+            self.settings.state.averaging_policy = value
+            return
+        elif setting == "telemetry_periods_sec":
+            self.telemetry.set_periods(value)
+            return
+        elif self.AVERAGE_RESTART_SETTINGS.match(setting):
+            # restart any average in progress (but still send the setting)
+            self.averager.reset()
 
         control_object = ControlObject(setting, value)
         self.command_queue.append(control_object)
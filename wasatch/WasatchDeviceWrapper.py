@@ -1,15 +1,22 @@
-import time
+import re
 import random
 import logging
 import datetime
+import threading
+import multiprocessing
 
-from queue import Queue
+from queue import Queue, Full, Empty
 
 from .SpectrometerResponse import SpectrometerResponse
 from .SpectrometerSettings import SpectrometerSettings
 from .InterfaceDevice      import InterfaceDeviceClassUnavailable
 from .ControlObject        import ControlObject
 from .WrapperWorker        import WrapperWorker
+from .ResponseQueue        import ResponseQueue
+from .SharedSpectrumRing   import SharedSpectrumRing
+from .WorkerProcess        import run_worker_process
+from .MetricsRegistry      import MetricsRegistry
+from .                     import applog
 
 log = logging.getLogger(__name__)
 
@@ -89,10 +96,55 @@ log = logging.getLogger(__name__)
 # faster than 20 per second through this (as ENLIGHTEN was designed as a real-time
 # visualization tool, not a high-speed data collection tool).
 #
-# Now, if you set ACQUISITION_MODE_KEEP_ALL, then you should still get every
-# spectrum (whatever the spectrometer achieved through its scan-rate, potentially
-# 220/sec or so) -- but you'll get them in chunks (e.g., scan rate of 220/sec
-# polled at 20Hz = 20 chunks of 11 ea).
+# If you need every spectrum at the sensor's native scan-rate (potentially
+# hundreds per second), instantiate the wrapper with streaming=True. In that 
+# mode WrapperWorker doesn't sleep between acquisitions: it keeps the bulk
+# endpoint busy back-to-back, applies any pending commands between transfers,
+# and pushes every Reading (tagged with Reading.sequence) into a bounded
+# response_queue (queue_size), blocking the acquisition loop rather than
+# dropping spectra if the caller falls behind. Dequeue them in order with 
+# acquire_data(ACQUISITION_MODE_KEEP_ALL), which is the default for streaming
+# wrappers.
+#
+# In either mode the response_queue is a bounded ResponseQueue, so a stalled
+# caller can't grow it without limit. Its queue_policy decides what happens 
+# when the caller falls behind: KEEP_ALL_BLOCKING (streaming default) applies
+# backpressure, DROP_OLDEST (otherwise the default) evicts the oldest Readings,
+# and KEEP_LATEST / KEEP_LATEST_AVERAGED retain only what get_final_item would 
+# return anyway. Any evictions are reported in the next Reading's 
+# dropped_readings.
+#
+# If the spectra are consumed in ANOTHER process, pickling every spectrum
+# through a multiprocessing queue can cost more than acquiring it.  With
+# shared_memory=True, WrapperWorker instead copies each spectrum into a
+# SharedSpectrumRing (self.transport) and sends only a small 
+# SharedSpectrumHeader over transport.header_queue; consumers get zero-copy
+# NumPy views (see SharedSpectrumRing for usage).  Keep-alives, errors and 
+# poison-pills still arrive on response_queue.
+#
+# @par Process-per-device
+#
+# All WrapperWorker threads normally share one interpreter, so with several
+# devices streaming, USB demarshalling, processing and averaging for all of
+# them contend for the GIL.  With process=True, the WrapperWorker (and 
+# everything beneath it) instead runs in a child process (see WorkerProcess).
+# The API is unchanged: change_setting() and friends send commands over a
+# Pipe, spectra come back through a SharedSpectrumRing, and a relay thread in
+# this process copies each one out of the ring onto response_queue (or to
+# the callback), so acquire_data() works as before.
+#
+# @par Latency
+#
+# Readings from FID-based spectrometers carry LatencyMarks (Reading.marks):
+# monotonic stamps from the ACQUIRE through the bulk read, processing, 
+# telemetry and queueing to the moment the caller dequeued it (or it was 
+# passed to the callback).  get_latency_stats() reports p50/p95/p99 of each
+# segment over the last LatencyHistogram.DEFAULT_SIZE Readings.
+#
+# Operational counters and gauges (spectra acquired, bulk-read timeouts, 
+# queue depths, dropped Readings, acquisition rate etc) are kept in the 
+# process-wide MetricsRegistry; get_metrics() returns this device's, and a
+# MetricsWriter can export them all to Prometheus or statsd.
 #
 # @par Responsiveness
 #
@@ -104,10 +156,13 @@ log = logging.getLogger(__name__)
 #
 # What we'd really like is two threads running in the child, one handling
 # acquisitions and most commands, and another handling high-priority events like
-# laser_enable.  I'm not sure the pipes are designed for multiple readers, but
-# a SEPARATE pipe (or queue) could be setup for high-priority commands, and
-# EXCLUSIVELY read by the secondary thread.  That just leaves open the question
-# of synchronization on WasatchDevice's USBDevice.
+# laser_enable.  That leaves open the question of synchronization on 
+# WasatchDevice's USBDevice, so instead there is a SEPARATE priority_queue for
+# high-priority commands (anything matching PRIORITY_SETTINGS, plus the 
+# shutdown poison-pill).  WrapperWorker drains it before the regular 
+# command_queue, and the device also drains it (via 
+# InterfaceDevice.check_priority_commands) between scans of an averaged
+# acquisition and between timeouts while waiting on an external trigger.
 #
 class WasatchDeviceWrapper:
 
@@ -119,6 +174,9 @@ class WasatchDeviceWrapper:
                                        # frame IS a partial summation contributor, then send it on.
 
     MAX_SETTINGS_POLL_SEC = 2
+    DISCONNECT_TIMEOUT_SEC = 5 # how long disconnect waits for the worker to finish its reset
+    PRIORITY_SETTINGS = re.compile(r"trigger|laser") # routed to priority_queue
+    DEFAULT_QUEUE_SIZE = ResponseQueue.DEFAULT_MAXSIZE
     UNAVAILABLE_CLASS_NAMES = set()
 
     # ##########################################################################
@@ -146,20 +204,57 @@ class WasatchDeviceWrapper:
     # could include "FILE:/path/to/dir", etc. However, device_id is just
     # a string scalar to this class, and actually parsing / using it should be
     # entirely encapsulated within WasatchDevice and lower using DeviceID.
-    def __init__(self, device_id, log_level, callback=None):
+    #
+    # @param streaming (Input) if True, acquire spectra back-to-back into a 
+    #        bounded queue (see "Throughput Considerations" above)
+    # @param queue_size (Input) maximum responses buffered in response_queue
+    # @param queue_policy (Input) a ResponseQueue policy (defaults to 
+    #        KEEP_ALL_BLOCKING when streaming, otherwise DROP_OLDEST)
+    # @param shared_memory (Input) if True, publish spectra through a 
+    #        SharedSpectrumRing rather than response_queue
+    # @param shared_memory_slots (Input) ring depth
+    # @param shared_memory_pixels (Input) maximum pixels per spectrum
+    # @param process (Input) run the device in a child process (see 
+    #        "Process-per-device" above)
+    def __init__(self, device_id, log_level, callback=None, streaming=False, queue_size=DEFAULT_QUEUE_SIZE, queue_policy=None,
+            shared_memory=False, shared_memory_slots=SharedSpectrumRing.DEFAULT_SLOTS, shared_memory_pixels=SharedSpectrumRing.DEFAULT_MAX_PIXELS,
+            process=False):
         self.device_id = device_id
         self.log_level = log_level
         self.callback = callback
+        self.streaming = streaming
+        self.shared_memory = shared_memory
+        self.shared_memory_slots = shared_memory_slots
+        self.shared_memory_pixels = shared_memory_pixels
+        self.transport = None # SharedSpectrumRing, created on connect
+        self.process = process
+
+        if queue_policy is None:
+            queue_policy = ResponseQueue.KEEP_ALL_BLOCKING if streaming else ResponseQueue.DROP_OLDEST
 
         self.settings_queue = Queue() # spectrometer -> GUI (SpectrometerSettings, one-time)
-        self.response_queue = Queue() # spectrometer -> GUI (Readings)
+        self.response_queue = ResponseQueue(queue_policy, queue_size) # spectrometer -> GUI (Readings)
         self.message_queue  = Queue() # spectrometer -> GUI (StatusMessages)
         self.command_queue  = Queue() # GUI -> spectrometer (ControlObjects)
         self.alert_queue    = Queue() # GUI -> spectrometer (ControlObjects)
+        self.priority_queue = Queue() # GUI -> spectrometer (laser / trigger ControlObjects, poison-pill)
 
         self.connected    = False
         self.closing      = False   # Don't permit new acquires during close
         self.poller       = None    # a handle to the child thread
+        self.stop_event   = threading.Event() # unblocks a streaming WrapperWorker on disconnect
+        self.wakeup_event = threading.Event() # wakes an idle WrapperWorker when commands are queued
+
+        # process=True
+        self.context        = multiprocessing.get_context("spawn") if process else None
+        self.worker_process = None
+        self.command_conn   = None # parent end of the command Pipe
+        self.command_lock   = threading.Lock()
+        self.upstream       = None # child -> parent (tag, item) queue
+        self.relay_thread   = None
+        self.log_listener   = None # forwards the child's log records (see applog)
+        if process:
+            self.stop_event = self.context.Event()
 
         if   '0x136e'  in str(device_id) and '0x0001' not in str(device_id): self.class_name = "AndorDevice"
         elif '0x24aa'  in str(device_id): self.class_name = "WasatchDevice"
@@ -228,16 +323,46 @@ class WasatchDeviceWrapper:
 
         # instantiate thread
         self.closing = False # needed if doing reset and closing previously was True
+        self.stop_event.clear()
+        if (self.shared_memory or self.process) and (self.transport is None or self.transport.closed):
+            self.transport = SharedSpectrumRing(slots=self.shared_memory_slots, max_pixels=self.shared_memory_pixels, context=self.context)
+
+        metrics = MetricsRegistry.get_default()
+        metrics.gauge  ("response_queue_depth", self.device_id, fn=self.response_queue.qsize)
+        metrics.counter("dropped_readings",     self.device_id, fn=lambda: self.response_queue.dropped)
+
+        if self.process:
+            self.connect_process()
+        else:
+            self.connect_thread()
+
+        # expect to read a single post-initialization SpectrometerSettings object off the queue
+        self.connect_start_time = datetime.datetime.now()
+        self.settings = None
+        log.debug("connect: setup connection, returning to controller for settings polling")
+
+        if self.callback:
+            log.debug("connect: waiting for settings")
+            self.wait_for_settings()
+
+        return True
+
+    def connect_thread(self):
         self.wrapper_worker = WrapperWorker(
             device_id      = self.device_id,
             command_queue  = self.command_queue,  # Main --> child (dedupable single-threaded spectrometer commands)
+            priority_queue = self.priority_queue, # Main --> child (dedupable laser / trigger / shutdown commands)
             alert_queue    = self.alert_queue,    # Main --> child (real-time hints and interrupts relating to ongoing commands)
             response_queue = self.response_queue, # Main <-- child \
             settings_queue = self.settings_queue, # Main <-- child  | consolidate into 
             message_queue  = self.message_queue,  # Main <-- child /  SpectrometerMessage?
             class_name     = self.class_name,
             log_level      = self.log_level,
-            callback       = self.callback)
+            callback       = self.deliver if self.callback else None,
+            streaming      = self.streaming,
+            stop_event     = self.stop_event,
+            wakeup_event   = self.wakeup_event,
+            transport      = self.transport)
         log.debug("device wrapper: Instance created for worker")
 
         self.wrapper_worker.daemon = True
@@ -245,27 +370,103 @@ class WasatchDeviceWrapper:
         log.debug("device wrapper: starting WrapperWorker thread")
         self.wrapper_worker.start()
 
-        # expect to read a single post-initialization SpectrometerSettings object off the queue
-        self.connect_start_time = datetime.datetime.now()
-        self.settings = None
-        log.debug("connect: setup connection, returning to controller for settings polling")
+    def connect_process(self):
+        self.upstream = self.context.Queue(maxsize=self.transport.slots - 2)
+        (self.command_conn, child_conn) = self.context.Pipe()
 
-        if self.callback:
-            log.debug("connect: waiting for settings")
-            self.wait_for_settings()
+        log_queue = self.context.Queue(maxsize=applog.MainLogger.QUEUE_SIZE)
+        self.log_listener = applog.start_child_listener(log_queue)
 
-        return True
+        self.worker_process = self.context.Process(
+            target = run_worker_process,
+            args   = (self.device_id, self.class_name, self.log_level, self.streaming,
+                      self.transport, child_conn, self.upstream, self.stop_event, log_queue),
+            name   = f"WorkerProcess-{self.device_id}",
+            daemon = True)
 
-    def wait_for_settings(self):
+        log.debug("device wrapper: starting worker process")
+        self.worker_process.start()
+        child_conn.close()
+
+        self.relay_thread = threading.Thread(target=self.relay_upstream, name="WorkerProcessRelay", daemon=True)
+        self.relay_thread.start()
+
+    ##
+    # (process=True) Runs in a thread of this process, routing everything the
+    # child sends upstream onto the same queues (or callback) a WrapperWorker
+    # thread would have used.  Spectra are copied out of the ring as they 
+    # arrive, freeing the slot for re-use.
+    def relay_upstream(self):
+        upstream = self.upstream
+        process = self.worker_process
         while True:
-            if self.poll_settings():
+            try:
+                (tag, item) = upstream.get(timeout=WrapperWorker.BLOCKED_PUT_TIMEOUT_SEC)
+            except Empty:
+                if not process.is_alive():
+                    break
+                continue
+            except (EOFError, OSError):
                 break
-            if (datetime.datetime.now() - self.connect_start_time).total_seconds() > self.MAX_SETTINGS_POLL_SEC:
+
+            if tag == "settings":
+                self.settings_queue.put(item)
+                continue
+            elif tag == "message":
+                self.message_queue.put(item)
+                continue
+            elif tag == "spectrum":
+                reading = self.transport.get_reading(item.data, copy=True)
+                if reading is None:
+                    log.error(f"relay_upstream: lost spectrum {item.data}")
+                    continue
+                item = SpectrometerResponse(data=reading)
+
+            if self.callback:
+                self.deliver(item)
+                continue
+
+            while not self.stop_event.is_set():
+                try:
+                    self.response_queue.put(item, timeout=WrapperWorker.BLOCKED_PUT_TIMEOUT_SEC)
+                    break
+                except Full:
+                    pass
+
+        log.debug("relay_upstream: done")
+
+    ##
+    # Route a ControlObject to the worker's command, priority or alert queue
+    # (over the Pipe, if the worker is in a child process).
+    def send_command(self, lane, control_object):
+        if self.process:
+            with self.command_lock:
+                try:
+                    self.command_conn.send((lane, control_object))
+                except (OSError, AttributeError):
+                    log.error(f"send_command: unable to send {control_object} to worker process")
+        elif lane == "priority":
+            self.priority_queue.put(control_object)
+        elif lane == "alert":
+            self.alert_queue.put(control_object)
+        else:
+            self.command_queue.put(control_object)
+
+        # don't wait out WrapperWorker's poll interval
+        self.wakeup_event.set()
+
+    def wait_for_settings(self):
+        while True:
+            remaining_sec = self.MAX_SETTINGS_POLL_SEC - (datetime.datetime.now() - self.connect_start_time).total_seconds()
+            if remaining_sec <= 0:
                 raise Exception("Failed to read SpectrometerSettings")
-            time.sleep(0.1)
+            if self.poll_settings(timeout_sec=remaining_sec):
+                break
 
-    def poll_settings(self): 
+    def poll_settings(self, timeout_sec=None): 
         """ 
+        @param timeout_sec if provided, block up to this long for the settings
+               to arrive (otherwise return immediately)
         @returns
             - SpectrometerResponse(data=truthy) if SpectrometerSettings received (stop polling)
             - SpectrometerResponse(data=None/False, error_msg) to communicate error condition (stop polling)
@@ -285,10 +486,14 @@ class WasatchDeviceWrapper:
           initialized), then this will be called in a loop from WDW.wait_for_settings
         """
         log.debug("polling device settings")
-        if self.settings_queue.empty():
+        try:
+            if timeout_sec is None:
+                result = self.settings_queue.get_nowait()
+            else:
+                result = self.settings_queue.get(timeout=timeout_sec)
+        except Empty:
             return
 
-        result = self.settings_queue.get_nowait()
         log.debug(f"poll_setttings: received result {result}")
         
         # we read something from downstream (error or success), so we're going to tell our upstream listener to stop polling, no matter what
@@ -320,17 +525,40 @@ class WasatchDeviceWrapper:
     def reset(self):
         if "USB" in str(self.device_id):
             self.reset_tries += 1
-            self.command_queue.put(ControlObject("reset", None))
+            self.send_command("command", ControlObject("reset", None))
 
     def disconnect(self):
         # send poison pill to the child
         self.closing = True
         log.debug("disconnect: sending poison pill downstream")
         try:
-            self.command_queue.put(None) 
+            self.send_command("priority", None)
         except:
             pass
-        time.sleep(0.1)
+        self.stop_event.set()
+        self.wakeup_event.set()
+
+        worker = self.worker_process if self.process else self.wrapper_worker
+        if worker is not None and worker.is_alive():
+            worker.join(timeout=self.DISCONNECT_TIMEOUT_SEC)
+
+        # the worker writes into the shared block (and logs) right up until it
+        # exits, so only release them once it has; if it's hung, leave them 
+        # for a closer thread rather than pulling them out from under it
+        if worker is None or not worker.is_alive():
+            self.release_worker(worker, self.transport, self.log_listener)
+        else:
+            log.error(f"disconnect: worker still running after {self.DISCONNECT_TIMEOUT_SEC}sec, deferring cleanup")
+            threading.Thread(target=self.release_worker, args=(worker, self.transport, self.log_listener), name="WorkerCloser", daemon=True).start()
+            self.transport = None # a reconnect gets a fresh ring
+        self.log_listener = None
+
+        if self.command_conn is not None:
+            self.command_conn.close()
+            self.command_conn = None
+
+        MetricsRegistry.get_default().unregister(self.device_id)
+
         log.debug("disconnect: done")
         del self.wrapper_worker
 
@@ -338,6 +566,18 @@ class WasatchDeviceWrapper:
 
         return True
 
+    ## Wait for the worker (and relay thread) to exit, then release the 
+    #  transport and stop forwarding the child's log records.
+    def release_worker(self, worker, transport, log_listener):
+        if worker is not None:
+            worker.join()
+        if self.relay_thread is not None:
+            self.relay_thread.join(timeout=self.DISCONNECT_TIMEOUT_SEC)
+        if transport is not None:
+            transport.close()
+        if log_listener is not None:
+            log_listener.stop()
+
     ##
     # Similar to acquire_data, this method is called by the Controller in
     # MainProcess to dequeue a StatusMessage from the spectrometer child
@@ -346,11 +586,13 @@ class WasatchDeviceWrapper:
         if self.closing or not self.connected:
             return None
 
-        if not self.message_queue.empty():
+        try:
             return self.message_queue.get_nowait()
+        except Empty:
+            return None
 
     def send_alert(self, setting, value):
-        self.alert_queue.put(ControlObject(setting, value))
+        self.send_command("alert", ControlObject(setting, value))
 
     ##
     # This method is called by the Controller.  It checks the response_queue it 
@@ -366,7 +608,10 @@ class WasatchDeviceWrapper:
     #       ACQUISITION_MODE_KEEP_COMPLETE have been well-tested,
     #       especially in the context of multiple spectrometers,
     #       BatchCollection etc.
-    def acquire_data(self, mode=None): # -> SpectrometerResponse 
+    #
+    # @param timeout_sec (Input) with ACQUISITION_MODE_KEEP_ALL, optionally 
+    #        block up to this long for the next Reading to arrive
+    def acquire_data(self, mode=None, timeout_sec=None): # -> SpectrometerResponse 
         if self.closing or not self.connected:
             log.critical(f"acquire_data: closing {self.closing} (sending poison-pill upstream) and connected {self.connected}")
             return SpectrometerResponse(False, poison_pill=True)
@@ -380,8 +625,42 @@ class WasatchDeviceWrapper:
         # If we're not doing scan averaging, then take the NEWEST spectrum
         # and purge the queue.
         #
-        if mode is None or mode == self.ACQUISITION_MODE_KEEP_COMPLETE:
+        if mode is None:
+            mode = self.ACQUISITION_MODE_KEEP_ALL if self.streaming else self.ACQUISITION_MODE_KEEP_COMPLETE
+
+        if mode == self.ACQUISITION_MODE_KEEP_COMPLETE:
             return self.get_final_item(keep_averaged=True)
+        elif mode == self.ACQUISITION_MODE_LATEST:
+            return self.get_final_item(keep_averaged=False)
+        elif mode == self.ACQUISITION_MODE_KEEP_ALL:
+            return self.get_next_item(timeout_sec)
+
+    ## Pass a response to the caller's callback, recording its latency.
+    def deliver(self, response):
+        self.response_queue.record_latency(response)
+        self.callback(response)
+
+    ##
+    # @returns dict of metric name -> value for this device (see MetricsRegistry)
+    def get_metrics(self):
+        return MetricsRegistry.get_default().snapshot().get(str(self.device_id), {})
+
+    ##
+    # @returns dict of segment -> { "count", "p50", "p95", "p99" } (ms) over
+    #          recently delivered Readings (see LatencyMarks.SEGMENTS)
+    def get_latency_stats(self):
+        return self.response_queue.latency.get_stats()
+
+    ## 
+    # Return the OLDEST queued response (every Reading is returned, in order).
+    # If nothing is queued (within timeout_sec, if given), return a keep_alive.
+    def get_next_item(self, timeout_sec=None): # -> SpectrometerResponse
+        try:
+            if timeout_sec is None:
+                return self.response_queue.get_nowait()
+            return self.response_queue.get(timeout=timeout_sec)
+        except Empty:
+            return SpectrometerResponse(keep_alive=True)
 
     ## Read from the response queue until empty (or we find an averaged item)
     #
@@ -391,14 +670,14 @@ class WasatchDeviceWrapper:
         last_response = SpectrometerResponse()
         last_averaged_response = SpectrometerResponse()
         dequeue_count = 0
+        dropped_readings = 0 # evictions reported on any Reading we dequeue
 
         while True:
             # without waiting (don't block), just get the first item off the
             # queue if there is one
-            wrapper_response = SpectrometerResponse()
-            if not self.response_queue.empty():
+            try:
                 wrapper_response = self.response_queue.get_nowait()
-            else:
+            except Empty:
                 # If there is nothing more to read, then we've emptied the queue
                 # log.debug("get_final has nothing more to read, sending up readings")
                 break
@@ -418,12 +697,14 @@ class WasatchDeviceWrapper:
             # game-over, we're done
             if wrapper_response.poison_pill:
                 log.critical("get_final_item: poison-pill!")
+                self.response_queue.restore_dropped(dropped_readings)
                 return wrapper_response
 
             # apparently we read a Reading
             log.debug(f"get_final_item: read Reading {wrapper_response.data}")
             last_response = wrapper_response
             dequeue_count += 1
+            dropped_readings += getattr(wrapper_response.data, "dropped_readings", 0)
 
             # Was this the final spectrum in an averaged sequence?
             #
@@ -438,6 +719,7 @@ class WasatchDeviceWrapper:
                 last_averaged_response = wrapper_response
 
         if last_response.data is None:
+            self.response_queue.restore_dropped(dropped_readings)
             log.debug("wrapper worker floating up keep alive last reading")
             # apparently we didn't read anything...just pass up a keepalive
             last_averaged_response = None
@@ -454,6 +736,7 @@ class WasatchDeviceWrapper:
         if last_averaged_response.data is not None:
             # log.debug("returning latest averaged reading")
             last_response = None
+            last_averaged_response.data.dropped_readings = dropped_readings
             return last_averaged_response
 
         # We've had every opportunity short-cut the process: we could have
@@ -462,6 +745,7 @@ class WasatchDeviceWrapper:
         # Return the latest of those.
 
         # log.debug("returning last_response")
+        last_response.data.dropped_readings = dropped_readings
         return last_response
 
     ##
@@ -483,7 +767,10 @@ class WasatchDeviceWrapper:
             log.debug("change_setting: %s => %s", setting, value)
             control_object = ControlObject(setting, value)
 
-            self.command_queue.put(control_object)
+            if self.PRIORITY_SETTINGS.search(setting):
+                self.send_command("priority", control_object)
+            else:
+                self.send_command("command", control_object)
 
             return
         except Exception as e:
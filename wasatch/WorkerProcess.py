@@ -0,0 +1,98 @@
+import logging
+import threading
+
+from queue import Queue
+
+from .WrapperWorker import WrapperWorker
+from .              import applog
+
+log = logging.getLogger(__name__)
+
+##
+# Presents one lane of the (multiprocessing) upstream queue to WrapperWorker
+# and the device classes as if it were an ordinary Queue, by tagging each
+# item with the lane it belongs to.
+class TaggedQueue:
+
+    def __init__(self, upstream, tag):
+        self.upstream = upstream
+        self.tag = tag
+
+    def put(self, item, block=True, timeout=None):
+        self.upstream.put((self.tag, item), block, timeout)
+
+    def put_nowait(self, item):
+        self.put(item, block=False)
+
+##
+# Entry-point of the child process used by WasatchDeviceWrapper(process=True).
+#
+# Runs an ordinary WrapperWorker (and therefore WasatchDevice, FID etc) in
+# this process, so that USB demarshalling, processing and averaging for each
+# spectrometer run under their own interpreter lock.
+#
+# Downstream, (lane, ControlObject) tuples arrive over the command pipe and
+# are routed onto the worker's command, priority or alert queue; a None
+# ControlObject (the usual poison-pill) or a closed pipe shuts us down.
+#
+# Upstream, everything goes over a single bounded multiprocessing queue as
+# (tag, item) tuples: "settings", "message" and "response" carry what would
+# have gone on the wrapper's settings, message and response queues, while
+# "spectrum" carries SpectrometerResponses wrapping a SharedSpectrumHeader,
+# the spectrum itself having been written into the SharedSpectrumRing.
+#
+# @param ring (Input) SharedSpectrumRing (re-attached on unpickling)
+# @param conn (Input) child end of the command Pipe
+# @param upstream (Input) bounded multiprocessing Queue
+# @param stop_event (Input) multiprocessing Event unblocking upstream puts on shutdown
+# @param log_queue (Input) bounded multiprocessing Queue carrying this process's
+#        log records to the parent (see applog.start_child_listener)
+def run_worker_process(device_id, class_name, log_level, streaming, ring, conn, upstream, stop_event, log_queue):
+    applog.configure_child_process(log_queue, log_level)
+
+    command_queue  = Queue()
+    priority_queue = Queue()
+    alert_queue    = Queue()
+    wakeup_event   = threading.Event()
+
+    lanes = { "command"  : command_queue,
+              "priority" : priority_queue,
+              "alert"    : alert_queue }
+
+    ring.header_queue = TaggedQueue(upstream, "spectrum")
+
+    worker = WrapperWorker(
+        device_id      = device_id,
+        command_queue  = command_queue,
+        priority_queue = priority_queue,
+        alert_queue    = alert_queue,
+        response_queue = TaggedQueue(upstream, "response"),
+        settings_queue = TaggedQueue(upstream, "settings"),
+        message_queue  = TaggedQueue(upstream, "message"),
+        class_name     = class_name,
+        log_level      = log_level,
+        streaming      = streaming,
+        stop_event     = stop_event,
+        wakeup_event   = wakeup_event,
+        transport      = ring)
+    worker.daemon = True
+    worker.start()
+
+    while worker.is_alive():
+        try:
+            if not conn.poll(WrapperWorker.POLLER_WAIT_SEC):
+                continue
+            (lane, control_object) = conn.recv()
+        except (EOFError, OSError):
+            log.critical("run_worker_process: command pipe closed")
+            (lane, control_object) = ("priority", None)
+
+        lanes.get(lane, command_queue).put(control_object)
+        wakeup_event.set()
+
+        if control_object is None:
+            break
+
+    worker.join()
+    ring.close()
+    log.debug("run_worker_process: done")
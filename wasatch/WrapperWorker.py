@@ -1,8 +1,7 @@
 import threading
 import platform
 import logging
-import time
-from queue import Queue
+from queue import Queue, Full, Empty
 from datetime import datetime
 
 from .SpectrometerResponse import SpectrometerResponse
@@ -15,6 +14,8 @@ from .SPIDevice            import SPIDevice
 from .BLEDevice            import BLEDevice
 from .TCPDevice            import TCPDevice
 from .Reading              import Reading
+from .MetricsRegistry      import MetricsRegistry
+from .TraceRing            import TraceRing
 
 DEVICE_CLASSES = { "AndorDevice":   AndorDevice,
                    "OceanDevice":   OceanDevice,
@@ -29,6 +30,10 @@ if "windows" in platform.platform().lower():
 
 log = logging.getLogger(__name__)
 
+trace = TraceRing.trace
+EV_RELAY = TraceRing.event("WrapperWorker relay", "session_count {a} pixels {b} (-1 none) via callback {c}")
+EV_WAIT  = TraceRing.event("WrapperWorker wait", "up to {a}ms")
+
 ##
 # Continuously process in background thread. While waiting forever for the None 
 # poison pill on the command queue, continuously read from the device and post 
@@ -54,8 +59,12 @@ class WrapperWorker(threading.Thread):
     # well on "slower" computers. Temporarily dropping back to 20Hz for testing.
     POLLER_WAIT_SEC = 0.05    # .05sec = 50ms = update from hardware device at 20Hz 
 
+    IDLE_WAIT_SEC = 1.0 # when the device has nothing to report (e.g. no integration time yet)
+
     DEBUG_SEC = 20 # enforce debug logging for the 1st 20sec after connecting a new spectrometer
 
+    BLOCKED_PUT_TIMEOUT_SEC = 0.1 # how often a blocked put checks for shutdown
+
     def __init__(
             self,
             device_id,
@@ -66,7 +75,12 @@ class WrapperWorker(threading.Thread):
             class_name,
             log_level,
             callback=None,
-            alert_queue=None):
+            alert_queue=None,
+            streaming=False,
+            stop_event=None,
+            priority_queue=None,
+            wakeup_event=None,
+            transport=None):
 
         threading.Thread.__init__(self)
 
@@ -76,19 +90,38 @@ class WrapperWorker(threading.Thread):
         self.settings_queue = settings_queue
         self.message_queue  = message_queue
         self.alert_queue    = alert_queue  
+        self.priority_queue = priority_queue
         self.log_level      = log_level
         self.callback       = callback
         self.class_name     = class_name
+        self.streaming      = streaming
+        self.stop_event     = stop_event if stop_event is not None else threading.Event()
+        self.wakeup_event   = wakeup_event if wakeup_event is not None else threading.Event()
+        self.transport      = transport # optional SharedSpectrumRing
+
+        # every Reading relayed upstream is tagged with a sequence number, so
+        # streaming consumers can confirm they received them all (in order)
+        self.next_sequence = 0
 
         self.connected_device = None
+        self.received_poison_pill_command = False
+        self.num_connected_devices = 1
 
         self.thread_start = datetime.now()
         self.initial_connection_logging = True
 
+        MetricsRegistry.get_default().gauge("command_queue_depth", device_id, fn=self.get_command_queue_depth)
+
         # enforce debug logging around ENLIGHTEN connections
         if not self.callback:
             logging.getLogger().setLevel("DEBUG") 
 
+    def get_command_queue_depth(self):
+        depth = self.command_queue.qsize()
+        if self.priority_queue is not None:
+            depth += self.priority_queue.qsize()
+        return depth
+
     ##
     # This is essentially the main() loop in a thread.
     # All communications with the parent thread are routed through
@@ -140,51 +173,22 @@ class WrapperWorker(threading.Thread):
         self.settings_queue.put_nowait(SpectrometerResponse(self.connected_device.settings))
 
         log.debug("entering loop")
-        received_poison_pill_command  = False # from ENLIGHTEN
+        self.received_poison_pill_command = False # from ENLIGHTEN
+
+        # let long-running acquisitions apply laser / trigger commands (and
+        # notice shutdown requests) without waiting for the next loop
+        self.connected_device.priority_callback = self.process_priority_commands
 
-        num_connected_devices = 1
         while True:
-            dedupped = self.dedupe(self.command_queue)
-
-            # apply dedupped commands
-            if dedupped:
-                for record in dedupped:
-                    if record is None:
-                        # We have received a "poison pill" (shutdown command) 
-                        # from ENLIGHTEN.
-                        #
-                        # Reminder, poison_pills moving DOWNSTREAM from ENLIGHTEN
-                        # are None, while poison_pills moving UPSTREAM from WasatchDevice
-                        # are indicated with SpectrometerResponse.poison_pill.
-                        received_poison_pill_command = True
-                        #
-                        # Do NOT put a 'break' here just yet -- if caller is in process of
-                        # cleaning shutting things down, let them switch off the
-                        # laser etc in due sequence.  We can break AFTER relaying
-                        # applying the queued settings.
-                    else:
-                        try:
-                            log.debug("processing command queue: %s", record.setting)
-
-                            # basically, this simply moves each de-dupped command from
-                            # WasatchDeviceWrapper.command_queue to WasatchDevice.command_queue,
-                            # where it gets read during the next call to
-                            # WasatchDevice.acquire_data.
-                            if record.setting == "reset":
-                                log.debug(f"calling reset from command queue")
-                            req = SpectrometerRequest(record.setting, args=[record.value])
-                            self.connected_device.handle_requests([req])
-     
-                            # peek in some settings locally
-                            if record.setting == "num_connected_devices":
-                                num_connected_devices = record.value
-                        except:
-                            log.error("failed to process record {record}, treating as poison pill", exc_info=1)
-                            received_poison_pill_command = True
-            else:
-                log.debug("command queue empty")
+            # anything queued after this point will cut short our next wait
+            self.wakeup_event.clear()
 
-            if received_poison_pill_command:
+            # high-priority commands (laser, triggering, shutdown) first
+            if self.priority_queue is not None:
+                self.apply_commands(self.priority_queue)
+            self.apply_commands(self.command_queue)
+
+            if self.received_poison_pill_command:
                 # ...NOW we can break
                 log.critical("exiting per command queue (poison pill received)")
                 req = SpectrometerRequest("disconnect")
@@ -201,7 +205,6 @@ class WrapperWorker(threading.Thread):
                 # Note: this is a BLOCKING CALL.  If integration time is longer
                 # than subprocess_timeout_sec, this call itself will trigger
                 # shutdown.
-                log.debug("acquiring data")
                 req = SpectrometerRequest("acquire_data")
                 (reading_response,) = self.connected_device.handle_requests([req])
                 #log.debug("continuous_poll: acquire_data returned %s", str(reading))
@@ -213,46 +216,48 @@ class WrapperWorker(threading.Thread):
                 log.error(f"Reading is not type ReadingResponse. Should not get naked responses. Happened with request {req}")
                 continue
 
-            log.debug(f"response {reading_response} data is {reading_response.data}")
+            idle = False
+
+            if isinstance(reading_response.data, Reading):
+                reading = reading_response.data
+                if reading.spectrum is not None:
+                    reading.sequence = self.next_sequence
+                    self.next_sequence += 1
+                trace(EV_RELAY, reading.session_count, -1 if reading.spectrum is None else len(reading.spectrum), int(self.callback is not None))
 
             if self.callback:
-                log.debug("worker returning response via callback")
                 self.callback(reading_response)
 
             elif reading_response.keep_alive:
                 log.debug("worker is flowing up keep_alive")
-                self.response_queue.put(reading_response) 
+                self.enqueue(reading_response) 
 
             elif reading_response.error_msg != "":
                 if reading_response.data is None:
                     reading_response.data = Reading()
-                self.response_queue.put(reading_response)
+                self.enqueue(reading_response)
 
             elif reading_response.data is None:
                 log.debug("worker saw no reading (but not error, either)")
+                idle = True
 
             elif not reading_response.data:
                 log.critical(f"hardware level error...exiting because data False")
                 reading_response.poison_pill = True
-                self.response_queue.put(reading_response)
+                self.enqueue(reading_response)
 
             elif reading_response.data.failure is not None:
                 log.critical(f"hardware level error...exiting because failure {reading_response.data.failure}")
                 reading_response.poison_pill = True
-                self.response_queue.put(reading_response)
+                self.enqueue(reading_response)
 
             elif reading_response.poison_pill:
                 log.critical(f"hardware level error...exiting because poison-pill")
-                self.response_queue.put(reading_response)
+                self.enqueue(reading_response)
 
             elif reading_response.data.spectrum is not None or reading_response.data.keep_alive: # playing
-                if reading_response.data.spectrum is not None:
-                    log.debug("sending Reading %d back to GUI thread (%s)", reading_response.data.session_count, reading_response.data.spectrum[0:5])
-                else:
-                    log.debug("sending Reading %d back to GUI thread WITH NO SPECTRA", reading_response.data.session_count)
-
                 try:
-                    self.response_queue.put_nowait(reading_response) 
+                    self.enqueue(reading_response)
                 except:
                     log.error("unable to push Reading %d to GUI", reading_response.data.session_count, exc_info=1)
 
@@ -268,43 +273,132 @@ class WrapperWorker(threading.Thread):
             else:
                 log.error("received non-failure Reading without spectrum...ignoring?")
 
-            # only poll hardware buses at 200Hz
-            sleep_sec = WrapperWorker.POLLER_WAIT_SEC * num_connected_devices
-            log.debug("sleeping %.3f sec", sleep_sec)
-            time.sleep(sleep_sec)
+            # In streaming mode, go straight back to the bulk endpoint (pending
+            # commands are applied at the top of the loop, between transfers).
+            # Otherwise, only poll hardware buses at 20Hz...or less, if the 
+            # device had nothing to report. Either way, a new command (see 
+            # WasatchDeviceWrapper.change_setting) ends the wait immediately.
+            if not self.streaming:
+                if idle:
+                    sleep_sec = WrapperWorker.IDLE_WAIT_SEC
+                else:
+                    sleep_sec = WrapperWorker.POLLER_WAIT_SEC * self.num_connected_devices
+                trace(EV_WAIT, int(sleep_sec * 1000))
+                self.wakeup_event.wait(sleep_sec)
 
         ########################################################################
         # we have exited the loop
         ########################################################################
 
-        if received_poison_pill_command:
+        if self.received_poison_pill_command:
             log.critical("exiting because of downstream poison-pill command from ENLIGHTEN")
         else:
             log.critical("exiting for no reason?!")
 
         log.critical("done")
 
+    ##
+    # Relay a SpectrometerResponse upstream.
+    #
+    # The response_queue is bounded, and its policy decides what happens when
+    # the caller falls behind (see ResponseQueue). Under KEEP_ALL_BLOCKING
+    # (the streaming default) we'd rather apply backpressure to the acquisition
+    # loop than drop spectra. However, don't block indefinitely if the caller
+    # has stopped reading because they're trying to shut us down.
+    #
+    # If a shared-memory transport is configured, spectra are instead written
+    # into the ring and only the header is queued (on transport.header_queue,
+    # which is bounded so that queued headers are never overwritten).
+    def enqueue(self, response):
+        q = self.response_queue
+        if isinstance(response.data, Reading) and response.data.marks is not None:
+            response.data.marks.mark("enqueued")
+        if self.transport is not None and isinstance(response.data, Reading) and response.data.spectrum is not None:
+            header = self.transport.write(response.data)
+            if header is not None:
+                q = self.transport.header_queue
+                response = SpectrometerResponse(data=header)
+
+        while not self.stop_event.is_set():
+            try:
+                q.put(response, timeout=self.BLOCKED_PUT_TIMEOUT_SEC)
+                return
+            except Full:
+                pass
+        log.debug("enqueue: dropping response during shutdown")
+
+    ##
+    # Apply every (de-dupped) command currently on the given queue to the
+    # connected device.
+    def apply_commands(self, q: Queue):
+        dedupped = self.dedupe(q)
+        if not dedupped:
+            return
+
+        for record in dedupped:
+            if record is None:
+                # We have received a "poison pill" (shutdown command) 
+                # from ENLIGHTEN.
+                #
+                # Reminder, poison_pills moving DOWNSTREAM from ENLIGHTEN
+                # are None, while poison_pills moving UPSTREAM from WasatchDevice
+                # are indicated with SpectrometerResponse.poison_pill.
+                self.received_poison_pill_command = True
+                #
+                # Do NOT break here just yet -- if caller is in process of
+                # cleaning shutting things down, let them switch off the
+                # laser etc in due sequence.  run() will break AFTER
+                # applying the queued settings.
+            else:
+                try:
+                    log.debug("processing command queue: %s", record.setting)
+
+                    # basically, this simply moves each de-dupped command from
+                    # WasatchDeviceWrapper.command_queue to WasatchDevice.command_queue,
+                    # where it gets read during the next call to
+                    # WasatchDevice.acquire_data.
+                    if record.setting == "reset":
+                        log.debug(f"calling reset from command queue")
+                    req = SpectrometerRequest(record.setting, args=[record.value])
+                    self.connected_device.handle_requests([req])
+
+                    # peek in some settings locally
+                    if record.setting == "num_connected_devices":
+                        self.num_connected_devices = record.value
+                except:
+                    log.error(f"failed to process record {record}, treating as poison pill", exc_info=1)
+                    self.received_poison_pill_command = True
+
+    ##
+    # Called by the connected device between scans, and while waiting on
+    # external triggers, so that laser and triggering commands have bounded
+    # latency even during long (or averaged) acquisitions.
+    #
+    # @returns True if shutdown has been requested
+    def process_priority_commands(self):
+        if self.priority_queue is not None:
+            self.apply_commands(self.priority_queue)
+        return self.received_poison_pill_command
+
+    ##
+    # Drain the queue, keeping only the latest value of each setting.
+    #
+    # Settings are kept in order of their LAST occurrence (a re-sent setting
+    # moves to the end), so that e.g. "laser_power_perc" sent after 
+    # "laser_enable" is still applied after it.
     def dedupe(self, q: Queue):
-        keep = [] # list, not a set, because we want to keep it ordered
+        keep = {} # insertion-ordered, keyed on setting (None for poison pills)
         try:
             while True:
-                if not q.empty():
-                    control_object = q.get_nowait() 
-
-                    # treat None elements (poison pills) same as everything else
-                    setting = None if control_object is None else control_object.setting
+                control_object = q.get_nowait()
 
-                    # remove previous setting if duplicate
-                    new_keep = []
-                    for co in keep:
-                        if co and co.setting != setting:
-                            new_keep.append(co)
-                    keep = new_keep
+                # treat None elements (poison pills) same as everything else
+                setting = None if control_object is None else control_object.setting
 
-                    # append the setting to the de-dupped list and track index
-                    keep.append(control_object)
-                else:
-                    break
+                keep.pop(setting, None)
+                keep[setting] = control_object
+        except Empty:
+            pass
         except:
             log.error("failed to dedupe command queue", exc_info=1)
-        return keep
+        return list(keep.values())
@@ -19,10 +19,13 @@
 
 import os
 import sys
+import atexit
 import logging
 import platform
-from . import utils
-from queue import Queue
+
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue            import Queue, Full, Empty
+from time             import monotonic
 
 # ##############################################################################
 #                                                                              #
@@ -89,6 +92,7 @@ def delete_log_file_if_exists():
         os.remove(pathname)
     return not os.path.exists(pathname)
 
+## Closing a DroppingQueueHandler also stops (and flushes) its QueueListener.
 def explicit_log_close():
     root_log = logging.getLogger()
     root_log.debug("applog.explicit_log_close: closing and removing all handlers")
@@ -97,31 +101,188 @@ def explicit_log_close():
         handler.close()
         root_log.removeHandler(handler)
 
+# ##############################################################################
+#                                                                              #
+#                         Non-blocking queue logging                           #
+#                                                                              #
+# ##############################################################################
+
+##
+# A QueueHandler which never blocks the logging thread.  If the queue is full
+# (e.g. the listener is stalled on a slow network drive) the record is
+# dropped and counted, and a single warning reporting the number lost is
+# queued once there is room again.
+class DroppingQueueHandler(QueueHandler):
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+        self.reported = 0
+        self.listener = None # stopped on close()
+
+    def enqueue(self, record):
+        try:
+            dropped = self.dropped
+            if dropped != self.reported:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": __name__,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": "applog: dropped %d log records (queue full)" % (dropped - self.reported)}))
+                self.reported = dropped
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def close(self):
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+        super().close()
+
+##
+# A QueueListener which flushes its handlers whenever the queue goes idle for
+# flush_interval_sec, so that BatchedRotatingFileHandler output never lags
+# by more than that.
+class FlushingQueueListener(QueueListener):
+
+    def __init__(self, queue, *handlers, flush_interval_sec=1.0):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.flush_interval_sec = flush_interval_sec
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval_sec)
+            except Empty:
+                self.flush()
+
+    def flush(self):
+        for handler in self.handlers:
+            try:
+                handler.flush_now() if hasattr(handler, "flush_now") else handler.flush()
+            except Exception:
+                pass
+
+    def enqueue_sentinel(self):
+        # the queue is bounded, so wait for the listener to make room
+        try:
+            self.queue.put(self._sentinel, timeout=5)
+        except Full:
+            pass
+
+##
+# A RotatingFileHandler which flushes in batches (at most every
+# flush_interval_sec, or immediately for ERROR and above) rather than after
+# every record.
+class BatchedRotatingFileHandler(RotatingFileHandler):
+
+    def __init__(self, filename, flush_interval_sec=1.0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.flush_interval_sec = flush_interval_sec
+        self.last_flush = monotonic()
+
+    def emit(self, record):
+        super().emit(record)
+        if record.levelno >= logging.ERROR:
+            self.flush_now()
+
+    ## called by StreamHandler.emit after every record
+    def flush(self):
+        if monotonic() - self.last_flush >= self.flush_interval_sec:
+            self.flush_now()
+
+    def flush_now(self):
+        super().flush()
+        self.last_flush = monotonic()
+
+    def close(self):
+        self.flush_now()
+        super().close()
+
+# ##############################################################################
+#                                                                              #
+#                          Child-process forwarding                            #
+#                                                                              #
+# ##############################################################################
+
+##
+# Re-dispatches records received from a child process to the same-named 
+# logger in this process, so they reach whatever handlers (e.g. MainLogger's)
+# are configured here.
+class ForwardingHandler(logging.Handler):
+
+    def handle(self, record):
+        logging.getLogger(record.name).handle(record)
+        return True
+
+##
+# Forward every record from a child process's log_queue (see 
+# configure_child_process) to this process's loggers.
+#
+# @param log_queue (Input) bounded multiprocessing Queue shared with the child
+# @returns started QueueListener (call stop() once the child has exited)
+def start_child_listener(log_queue):
+    listener = QueueListener(log_queue, ForwardingHandler())
+    listener.start()
+    return listener
+
+##
+# Called at the beginning of a spawned child process, which otherwise has no 
+# handlers at all: route the root logger through a non-blocking queue to the
+# parent's start_child_listener.
+def configure_child_process(log_queue, log_level):
+    root_log = logging.getLogger()
+    for handler in root_log.handlers[:]:
+        root_log.removeHandler(handler)
+    root_log.addHandler(DroppingQueueHandler(log_queue))
+    root_log.setLevel(log_level)
+
 # ##############################################################################
 #                                                                              #
 #                                MainLogger                                    #
 #                                                                              #
 # ##############################################################################
 
+##
+# Every handler (file and console) runs on a background QueueListener thread.
+# Application threads only format their record and put it on a bounded queue,
+# so a slow disk or console can never stall acquisition; if the queue fills,
+# records are dropped (and counted) rather than blocking.
+#
+# The log file rotates once it reaches max_bytes, keeping backup_count old
+# files, and is flushed in batches rather than per record.
 class MainLogger:
     FORMAT = u'%(asctime)s [0x%(thread)08x] %(name)s %(levelname)-8s %(message)s'
 
+    QUEUE_SIZE = 10000
+    MAX_BYTES = 300*1024*1024
+    BACKUP_COUNT = 1
+    FLUSH_INTERVAL_SEC = 1.0
+
     def __init__(self, 
             log_level=logging.DEBUG, 
             enable_stdout=True,
             logfile=None,
             timeout_sec=5,
-            append_arg="True"):
-        self.log_queue     = Queue() 
+            append_arg="True",
+            queue_size=QUEUE_SIZE,
+            backup_count=BACKUP_COUNT,
+            flush_interval_sec=FLUSH_INTERVAL_SEC):
+        self.log_queue     = Queue(maxsize=queue_size) 
         self.log_level     = log_level
         self.enable_stdout = enable_stdout
         self.logfile       = logfile            
         self.timeout_sec   = timeout_sec
+        self.backup_count  = backup_count
+        self.flush_interval_sec = flush_interval_sec
+        self.queue_handler = None
+        self.listener      = None
 
         if self.logfile is not None:
             set_location(self.logfile)
 
-        # append file size limits are enforced upon program restart
+        # append file size limits are enforced by rotation
         if append_arg.lower() == "true":
             # limit to 300mb if --log-append is explicitly set to "True"
             append = True
@@ -129,7 +290,7 @@ class MainLogger:
             # when append is a falsy value, the log file is always reset on reboot
             append = False
         if append_arg.lower() == "limit":
-            # the default --log-append keeps up to 2mb between sessions
+            # the default --log-append keeps up to 2mb (plus backups)
             append = 2*1024*1024
 
         root_log = logging.getLogger()
@@ -137,8 +298,11 @@ class MainLogger:
         root_log.setLevel(self.log_level)
         root_log.debug("Top level log configuration (%d handlers, get_location %s)", len(root_log.handlers), get_location())
 
-    ## Setup file handler and command window stream handlers. Every log
-    #  message received on the queue handler will use these log configurers. 
+    ## Setup file handler and command window stream handlers, serviced by a 
+    #  QueueListener. The root logger itself only gets the queue handler.
+    #
+    # @param append (Input) False to start a new log; True to append (rotating
+    #        at MAX_BYTES); or an int byte limit at which to rotate
     def log_configurer(self, logfile=None, append=False):
         if logfile is not None:
             pathname = logfile
@@ -147,31 +311,63 @@ class MainLogger:
         else:
             pathname = get_location()
 
-        try:
-            if isinstance(append, int):
-                utils.resize_file(path=pathname, nbytes=append)
-        except (IOError, FileNotFoundError):
-            print("Unable to truncate log file.")
+        if append is True or append is False:
+            max_bytes = self.MAX_BYTES
+        else:
+            max_bytes = append
+
+        # RotatingFileHandler always appends, so start a new log explicitly
+        if append is False:
+            try:
+                open(pathname, "w").close()
+            except IOError:
+                print("Unable to truncate log file.")
 
-        root_logger = logging.getLogger()
-        fh = logging.FileHandler(pathname, mode='a' if append else 'w', encoding='utf-8') 
         formatter = logging.Formatter(self.FORMAT)
+        handlers = []
+
+        fh = BatchedRotatingFileHandler(pathname, 
+            flush_interval_sec = self.flush_interval_sec,
+            maxBytes = max_bytes, 
+            backupCount = self.backup_count, 
+            encoding = 'utf-8')
         fh.setFormatter(formatter)
-        root_logger.addHandler(fh) 
+        handlers.append(fh)
 
         if self.enable_stdout and sys.stdout is not None:
             sys.stdout.reconfigure(encoding='utf-8')
             stream_handler = logging.StreamHandler(sys.stdout)
             stream_handler.setFormatter(formatter)
-            root_logger.addHandler(stream_handler)
+            handlers.append(stream_handler)
+
+        self.listener = FlushingQueueListener(self.log_queue, *handlers, flush_interval_sec=self.flush_interval_sec)
+        self.queue_handler = DroppingQueueHandler(self.log_queue)
+        self.queue_handler.listener = self.listener
+        self.listener.start()
 
+        root_logger = logging.getLogger()
+        root_logger.addHandler(self.queue_handler)
         self.root = root_logger
 
-    ## Wrapper to add a None poison pill to the listener process queue to
-    #  ensure it exits. 
+        # don't lose batched records if the caller never calls close()
+        atexit.register(self.close)
+
+    ## @returns number of log records dropped because the queue was full
+    def get_dropped_count(self):
+        return 0 if self.queue_handler is None else self.queue_handler.dropped
+
+    ## Stop the listener thread, flushing everything still queued, and close
+    #  the file and console handlers.
     def close(self):
-        self.log_queue.put_nowait(None)
-        try:
-            self.listener.join()
-        except:
-            pass
+        queue_handler, self.queue_handler = self.queue_handler, None
+        if queue_handler is None:
+            return
+
+        self.root.removeHandler(queue_handler)
+        queue_handler.close() # stops the listener
+
+        for handler in self.listener.handlers:
+            try:
+                handler.close()
+            except:
+                pass